@@ -1,3 +1,26 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import ExecucaoTarefa, Exportacao, TarefaAgendada
+
+
+@admin.register(TarefaAgendada)
+class TarefaAgendadaAdmin(admin.ModelAdmin):
+    list_display = ('nome', 'comando', 'ativa', 'horario', 'proxima_execucao',
+                    'ultima_execucao', 'ultima_duracao', 'ultimo_sucesso', 'em_execucao_desde')
+    list_filter = ('ativa', 'ultimo_sucesso')
+    readonly_fields = ('em_execucao_desde', 'trabalhador', 'ultima_execucao', 'ultima_duracao', 'ultimo_sucesso')
+
+
+@admin.register(ExecucaoTarefa)
+class ExecucaoTarefaAdmin(admin.ModelAdmin):
+    list_display = ('tarefa', 'inicio', 'duracao', 'sucesso', 'trabalhador')
+    list_filter = ('sucesso', 'tarefa')
+    date_hierarchy = 'inicio'
+
+
+@admin.register(Exportacao)
+class ExportacaoAdmin(admin.ModelAdmin):
+    list_display = ('nome_arquivo', 'tipo', 'status', 'progresso', 'solicitado_por', 'criado_em', 'expira_em')
+    list_filter = ('status', 'tipo')
+    date_hierarchy = 'criado_em'
+    readonly_fields = ('chave', 'iniciado_em', 'atualizado_em', 'concluido_em', 'erro')
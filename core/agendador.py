@@ -0,0 +1,101 @@
+# core/agendador.py
+import io
+import os
+import socket
+import time
+import traceback
+from datetime import datetime, timedelta
+
+from django.core.management import call_command
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ExecucaoTarefa, TarefaAgendada
+
+# Quanto da saída de cada execução fica guardado no histórico
+LIMITE_SAIDA = 20000
+
+
+def nome_trabalhador():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def calcular_proxima(tarefa, agora=None):
+    """Próxima execução: o próximo `horario` local (diária) ou agora + intervalo"""
+    agora = agora or timezone.now()
+    if tarefa.horario is None:
+        return agora + timedelta(minutes=max(tarefa.intervalo_minutos, 1))
+
+    local = timezone.localtime(agora)
+    proxima = timezone.make_aware(datetime.combine(local.date(), tarefa.horario))
+    if proxima <= agora:
+        proxima = timezone.make_aware(datetime.combine(local.date() + timedelta(days=1), tarefa.horario))
+    return proxima
+
+
+def reservar_proxima(trabalhador):
+    """
+    Reserva uma tarefa vencida para este trabalhador. A linha é travada com
+    SKIP LOCKED: com vários workers, cada tarefa é pega por um só, e quem
+    chega depois passa para a próxima em vez de esperar. Reservas mais antigas
+    que tempo_maximo_minutos (worker que morreu no meio) podem ser retomadas.
+    """
+    agora = timezone.now()
+    with transaction.atomic():
+        candidatas = TarefaAgendada.objects.select_for_update(skip_locked=True).filter(
+            ativa=True, proxima_execucao__lte=agora
+        ).order_by('proxima_execucao')
+
+        for tarefa in candidatas:
+            livre = tarefa.em_execucao_desde is None or (
+                tarefa.em_execucao_desde < agora - timedelta(minutes=tarefa.tempo_maximo_minutos)
+            )
+            if livre:
+                tarefa.em_execucao_desde = agora
+                tarefa.trabalhador = trabalhador
+                tarefa.save(update_fields=['em_execucao_desde', 'trabalhador'])
+                return tarefa
+    return None
+
+
+def executar(tarefa, trabalhador):
+    """Roda o comando da tarefa (fora de transação), mede o tempo e libera a reserva"""
+    saida = io.StringIO()
+    inicio = timezone.now()
+    relogio = time.monotonic()
+    erro = ''
+    try:
+        call_command(tarefa.comando, *tarefa.argumentos, stdout=saida, stderr=saida)
+        sucesso = True
+    except Exception:
+        sucesso = False
+        erro = traceback.format_exc()
+    duracao = time.monotonic() - relogio
+    fim = timezone.now()
+
+    ExecucaoTarefa.objects.create(
+        tarefa=tarefa, inicio=inicio, fim=fim, duracao=duracao, sucesso=sucesso,
+        saida=saida.getvalue()[-LIMITE_SAIDA:], erro=erro[-LIMITE_SAIDA:], trabalhador=trabalhador,
+    )
+    TarefaAgendada.objects.filter(pk=tarefa.pk, trabalhador=trabalhador).update(
+        em_execucao_desde=None,
+        ultima_execucao=inicio,
+        ultima_duracao=duracao,
+        ultimo_sucesso=sucesso,
+        proxima_execucao=calcular_proxima(tarefa, fim),
+    )
+    return sucesso, duracao
+
+
+def executar_pendentes(trabalhador=None, ao_terminar=None):
+    """Executa todas as tarefas vencidas, uma de cada vez; devolve quantas rodaram"""
+    trabalhador = trabalhador or nome_trabalhador()
+    total = 0
+    while True:
+        tarefa = reservar_proxima(trabalhador)
+        if tarefa is None:
+            return total
+        sucesso, duracao = executar(tarefa, trabalhador)
+        total += 1
+        if ao_terminar:
+            ao_terminar(tarefa, sucesso, duracao)
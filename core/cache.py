@@ -0,0 +1,18 @@
+# core/cache.py
+from django.conf import settings
+
+# Backends que guardam os dados na memória de cada processo (ou não guardam nada)
+BACKENDS_LOCAIS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def cache_compartilhado(alias='default'):
+    """
+    True se o cache é visto por todos os processos (Redis, Memcached, banco...).
+    Sem CACHES nas settings o Django usa LocMemCache: cada worker do gunicorn
+    tem o seu, e o que um invalida os outros continuam servindo.
+    """
+    backend = settings.CACHES.get(alias, {}).get('BACKEND', BACKENDS_LOCAIS[0])
+    return backend not in BACKENDS_LOCAIS
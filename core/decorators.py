@@ -3,6 +3,8 @@ from django.contrib.auth.decorators import user_passes_test
 from django.core.exceptions import PermissionDenied
 from functools import wraps
 
+from core.grupos import pertence_a
+
 # ========== DECORATORS POR GRUPO ==========
 
 def admin_required(view_func):
@@ -10,7 +12,7 @@ def admin_required(view_func):
     def check_admin(user):
         return user.is_authenticated and (
             user.is_superuser or
-            user.groups.filter(name='Admin').exists()
+            pertence_a(user, 'Admin')
         )
     return user_passes_test(check_admin)(view_func)
 
@@ -19,7 +21,7 @@ def gerente_required(view_func):
     def check_gerente(user):
         return user.is_authenticated and (
             user.is_superuser or
-            user.groups.filter(name__in=['Admin', 'Gerente']).exists()
+            pertence_a(user, 'Admin', 'Gerente')
         )
     return user_passes_test(check_gerente)(view_func)
 
@@ -28,7 +30,7 @@ def vendedor_required(view_func):
     def check_vendedor(user):
         return user.is_authenticated and (
             user.is_superuser or
-            user.groups.filter(name__in=['Admin', 'Gerente', 'Vendedor']).exists()
+            pertence_a(user, 'Admin', 'Gerente', 'Vendedor')
         )
     return user_passes_test(check_vendedor)(view_func)
 
@@ -51,7 +53,7 @@ def grupo_required(*group_names, login_url=None, redirect_field_name=None):
     """Decorator para grupos específicos com redirect"""
     def in_groups(user):
         if user.is_authenticated:
-            if user.is_superuser or user.groups.filter(name__in=group_names).exists():
+            if user.is_superuser or pertence_a(user, *group_names):
                 return True
         return False
     return user_passes_test(in_groups, login_url=login_url, redirect_field_name=redirect_field_name)
\ No newline at end of file
@@ -0,0 +1,232 @@
+# core/exportacoes.py
+import hashlib
+import json
+import logging
+import threading
+import time
+import tempfile
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import DatabaseError, IntegrityError, close_old_connections, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .grupos import pertence_a
+from .models import Exportacao
+
+logger = logging.getLogger(__name__)
+
+# Relatórios que podem ser gerados em segundo plano. `gerador` recebe o arquivo
+# de destino, a função de progresso e os parâmetros; `parametros` traz os
+# aceitos e seus valores padrão (o tipo do padrão converte o valor recebido).
+TIPOS = {
+    'estoque': {
+        'gerador': 'productos.exportacoes.relatorio_estoque',
+        'arquivo': 'relatorio_estoque.xlsx',
+        'grupos': ('Admin', 'Gerente'),
+        'parametros': {},
+    },
+    'validade_proxima': {
+        'gerador': 'productos.exportacoes.relatorio_validade_proxima',
+        'arquivo': 'produtos_validade_proxima.xlsx',
+        'grupos': ('Admin', 'Gerente', 'Vendedor'),
+        'parametros': {'dias': 90},
+    },
+}
+
+# Quantos relatórios são gerados ao mesmo tempo em cada processo web
+TRABALHADORES = getattr(settings, 'EXPORTACAO_TRABALHADORES', 2)
+# Por quanto tempo um arquivo pronto é reaproveitado por pedidos iguais
+TEMPO_REUSO = timedelta(minutes=getattr(settings, 'EXPORTACAO_TTL_MINUTOS', 10))
+# Sem sinal de progresso por esse tempo, a exportação é dada como interrompida
+TEMPO_MAXIMO = timedelta(minutes=getattr(settings, 'EXPORTACAO_TEMPO_MAXIMO_MINUTOS', 30))
+# Intervalo mínimo (segundos) entre gravações de progresso no banco
+INTERVALO_PROGRESSO = 1.0
+# Intervalo mínimo (segundos) entre limpezas de arquivos vencidos disparadas por este processo
+INTERVALO_LIMPEZA = 600
+# Horas que exportações com erro ficam no histórico
+HORAS_HISTORICO_ERRO = 24
+
+_executor = None
+_executor_lock = threading.Lock()
+
+_ultima_limpeza = None
+_limpeza_lock = threading.Lock()
+
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=TRABALHADORES, thread_name_prefix='exportacao')
+        return _executor
+
+
+def pode_exportar(user, tipo):
+    return user.is_authenticated and (user.is_superuser or pertence_a(user, *TIPOS[tipo]['grupos']))
+
+
+def normalizar_parametros(tipo, dados):
+    """Só os parâmetros aceitos pelo tipo, convertidos; os ausentes ficam com o padrão"""
+    parametros = {}
+    for nome, padrao in TIPOS[tipo]['parametros'].items():
+        valor = dados.get(nome)
+        parametros[nome] = type(padrao)(valor) if valor not in (None, '') else padrao
+    return parametros
+
+
+def chave_exportacao(tipo, parametros):
+    return hashlib.sha256(json.dumps([tipo, parametros], sort_keys=True).encode()).hexdigest()
+
+
+def solicitar(tipo, parametros, usuario=None):
+    """
+    Devolve (exportacao, reaproveitada). Se houver uma exportação com os mesmos
+    parâmetros ainda válida (pronta dentro do prazo ou em andamento), é ela que
+    volta; senão uma nova é criada e entra na fila depois do commit.
+    """
+    _agendar_limpeza()
+    agora = timezone.now()
+    chave = chave_exportacao(tipo, parametros)
+
+    for existente in Exportacao.objects.filter(chave=chave).exclude(status=Exportacao.ERRO)[:5]:
+        if existente.disponivel(agora):
+            return existente, True
+        if existente.em_andamento:
+            if existente.atualizado_em > agora - TEMPO_MAXIMO:
+                return existente, True
+            Exportacao.objects.filter(pk=existente.pk, status=existente.status).update(
+                status=Exportacao.ERRO, erro="Exportação interrompida (sem progresso)", atualizado_em=agora
+            )
+
+    try:
+        with transaction.atomic():
+            exportacao = Exportacao.objects.create(
+                tipo=tipo,
+                parametros=parametros,
+                chave=chave,
+                nome_arquivo=TIPOS[tipo]['arquivo'],
+                solicitado_por=usuario if usuario and usuario.is_authenticated else None,
+            )
+    except IntegrityError:
+        # Um pedido igual e simultâneo criou a exportação primeiro (constraint
+        # exportacao_chave_em_andamento): reaproveita a dele
+        existente = Exportacao.objects.filter(chave=chave).exclude(status=Exportacao.ERRO).first()
+        if existente is None:
+            raise
+        return existente, True
+    transaction.on_commit(lambda: _pool().submit(executar, exportacao.pk))
+    return exportacao, False
+
+
+class Progresso:
+    """progresso(feitos, total) gravado no banco no máximo uma vez por INTERVALO_PROGRESSO"""
+
+    def __init__(self, exportacao_id):
+        self.exportacao_id = exportacao_id
+        self.ultimo = 0
+        self.gravado_em = 0.0
+
+    def __call__(self, feitos, total):
+        # 100% só quando o arquivo estiver gravado
+        percentual = min(int(feitos * 100 / total), 99) if total else 0
+        agora = time.monotonic()
+        if percentual == self.ultimo or agora - self.gravado_em < INTERVALO_PROGRESSO:
+            return
+        try:
+            Exportacao.objects.filter(pk=self.exportacao_id).update(progresso=percentual, atualizado_em=timezone.now())
+        except DatabaseError as e:
+            # O progresso é só informativo: não interrompe a geração do arquivo
+            logger.warning("Erro em gravar progresso da exportação %s: %s", self.exportacao_id, e)
+            return
+        self.ultimo = percentual
+        self.gravado_em = agora
+
+
+def executar(exportacao_id):
+    """Gera o arquivo de uma exportação pendente (roda numa thread do pool, com conexão própria)"""
+    close_old_connections()
+    try:
+        agora = timezone.now()
+        pegou = Exportacao.objects.filter(pk=exportacao_id, status=Exportacao.PENDENTE).update(
+            status=Exportacao.PROCESSANDO, iniciado_em=agora, atualizado_em=agora
+        )
+        if not pegou:
+            return
+
+        exportacao = Exportacao.objects.get(pk=exportacao_id)
+        gerador = import_string(TIPOS[exportacao.tipo]['gerador'])
+        with tempfile.TemporaryFile() as temporario:
+            gerador(temporario, progresso=Progresso(exportacao.pk), **exportacao.parametros)
+            temporario.seek(0)
+            exportacao.arquivo.save(f"{exportacao.pk}_{exportacao.nome_arquivo}", File(temporario), save=False)
+
+        fim = timezone.now()
+        Exportacao.objects.filter(pk=exportacao.pk).update(
+            status=Exportacao.CONCLUIDA,
+            progresso=100,
+            arquivo=exportacao.arquivo.name,
+            concluido_em=fim,
+            atualizado_em=fim,
+            expira_em=fim + TEMPO_REUSO,
+        )
+    except Exception:
+        logger.exception("Erro em executar exportação %s", exportacao_id)
+        Exportacao.objects.filter(pk=exportacao_id).update(
+            status=Exportacao.ERRO, erro=traceback.format_exc()[-5000:], atualizado_em=timezone.now()
+        )
+    finally:
+        # A thread continua no pool: não deixa a conexão dela aberta entre exportações
+        connection.close()
+
+
+# ========== LIMPEZA DOS ARQUIVOS VENCIDOS ==========
+
+def limpar_expiradas(horas_erro=HORAS_HISTORICO_ERRO):
+    """
+    Apaga os arquivos e os registros das exportações vencidas, com erro há mais
+    de `horas_erro` ou interrompidas. Precisa rodar onde os arquivos estão (o
+    MEDIA_ROOT dos processos web, ou o storage compartilhado): num processo sem
+    acesso a eles, os registros sumiriam e os arquivos ficariam para trás.
+    Devolve (exportações removidas, arquivos apagados).
+    """
+    agora = timezone.now()
+    vencidas = Exportacao.objects.filter(
+        Q(status=Exportacao.CONCLUIDA, expira_em__lt=agora)
+        | Q(status=Exportacao.ERRO, atualizado_em__lt=agora - timedelta(hours=horas_erro))
+        # Interrompidas: o processo que gerava morreu sem concluir
+        | Q(status__in=[Exportacao.PENDENTE, Exportacao.PROCESSANDO], atualizado_em__lt=agora - TEMPO_MAXIMO)
+    )
+
+    arquivos = 0
+    for exportacao in vencidas.exclude(arquivo='').iterator():
+        exportacao.arquivo.delete(save=False)
+        arquivos += 1
+    total, _ = vencidas.delete()
+    return total, arquivos
+
+
+def _agendar_limpeza():
+    """Limpa os vencidos no pool deste processo web, no máximo a cada INTERVALO_LIMPEZA"""
+    global _ultima_limpeza
+    agora = time.monotonic()
+    with _limpeza_lock:
+        if _ultima_limpeza is not None and agora - _ultima_limpeza < INTERVALO_LIMPEZA:
+            return
+        _ultima_limpeza = agora
+    _pool().submit(_limpar_em_segundo_plano)
+
+
+def _limpar_em_segundo_plano():
+    close_old_connections()
+    try:
+        limpar_expiradas()
+    except Exception:
+        logger.exception("Erro em limpar exportações vencidas")
+    finally:
+        connection.close()
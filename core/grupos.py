@@ -0,0 +1,45 @@
+# core/grupos.py
+from django.core.cache import cache
+
+from core.cache import cache_compartilhado
+
+# Tempo (segundos) dos grupos no cache entre requisições; os signals invalidam antes disso.
+# Só vale com cache compartilhado: num cache por processo a invalidação não chega
+# aos outros workers, e quem perdeu um grupo manteria o acesso até expirar.
+GRUPOS_CACHE_TIMEOUT = 300
+
+
+def _chave_cache(user_id):
+    return f"grupos_usuario:{user_id}"
+
+
+def grupos_do_usuario(user):
+    """
+    Nomes dos grupos do usuário, consultados no máximo uma vez por requisição:
+    ficam memorizados no próprio objeto user e, se o cache for compartilhado
+    entre os processos, também no cache entre requisições.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+
+    grupos = getattr(user, '_grupos_cache', None)
+    if grupos is None:
+        compartilhado = cache_compartilhado()
+        if compartilhado:
+            grupos = cache.get(_chave_cache(user.pk))
+        if grupos is None:
+            grupos = frozenset(user.groups.values_list('name', flat=True))
+            if compartilhado:
+                cache.set(_chave_cache(user.pk), grupos, GRUPOS_CACHE_TIMEOUT)
+        user._grupos_cache = grupos
+    return grupos
+
+
+def pertence_a(user, *nomes_grupos):
+    """True se o usuário está em algum dos grupos informados"""
+    return not grupos_do_usuario(user).isdisjoint(nomes_grupos)
+
+
+def invalidar_grupos(*user_ids):
+    """Remove do cache os grupos dos usuários informados"""
+    cache.delete_many([_chave_cache(user_id) for user_id in user_ids])
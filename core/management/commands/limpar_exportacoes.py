@@ -0,0 +1,19 @@
+# core/management/commands/limpar_exportacoes.py
+from django.core.management.base import BaseCommand
+
+from core.exportacoes import HORAS_HISTORICO_ERRO, limpar_expiradas
+
+
+class Command(BaseCommand):
+    help = (
+        'Apaga os relatórios exportados que passaram do prazo de reaproveitamento. '
+        'Os processos web já fazem isso sozinhos; rode manualmente só onde MEDIA_ROOT é visível.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--horas', type=int, default=HORAS_HISTORICO_ERRO,
+                            help='Horas que exportações com erro ficam no histórico')
+
+    def handle(self, *args, **options):
+        total, arquivos = limpar_expiradas(options['horas'])
+        self.stdout.write(self.style.SUCCESS(f"✅ {total} exportações removidas ({arquivos} arquivos apagados)."))
@@ -0,0 +1,46 @@
+# core/management/commands/run_scheduler.py
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.agendador import executar_pendentes, nome_trabalhador
+
+
+class Command(BaseCommand):
+    help = 'Worker que executa as tarefas agendadas (TarefaAgendada) fora das requisições'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intervalo', type=int, default=30, help='Segundos entre verificações')
+        parser.add_argument('--uma-vez', action='store_true', help='Executa as tarefas vencidas e sai')
+
+    def handle(self, *args, **options):
+        self.parar = False
+        # O gerenciador de processos (dyno) manda SIGTERM: termina a tarefa atual e sai
+        signal.signal(signal.SIGTERM, self._sinal_parar)
+        signal.signal(signal.SIGINT, self._sinal_parar)
+
+        trabalhador = nome_trabalhador()
+        self.stdout.write(f"🕒 Agendador iniciado ({trabalhador})")
+
+        while not self.parar:
+            close_old_connections()
+            executar_pendentes(trabalhador, ao_terminar=self._relatar)
+            if options['uma_vez']:
+                break
+            for _ in range(max(options['intervalo'], 1)):
+                if self.parar:
+                    break
+                time.sleep(1)
+
+        self.stdout.write("🛑 Agendador encerrado")
+
+    def _sinal_parar(self, *args):
+        self.parar = True
+
+    def _relatar(self, tarefa, sucesso, duracao):
+        if sucesso:
+            self.stdout.write(self.style.SUCCESS(f"✅ {tarefa.nome}: {duracao:.1f}s"))
+        else:
+            self.stdout.write(self.style.ERROR(f"❌ {tarefa.nome} falhou após {duracao:.1f}s (ver Execuções de Tarefas)"))
@@ -0,0 +1,13 @@
+# core/middleware.py
+from core.grupos import grupos_do_usuario
+
+
+class GruposUsuarioMiddleware:
+    """Carrega os grupos do usuário uma vez por requisição, para decorators e template tags"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        grupos_do_usuario(request.user)
+        return self.get_response(request)
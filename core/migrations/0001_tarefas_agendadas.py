@@ -0,0 +1,59 @@
+# Generated by Django 4.2.7 on 2026-10-17 15:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TarefaAgendada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=100, unique=True)),
+                ('comando', models.CharField(max_length=100)),
+                ('argumentos', models.JSONField(blank=True, default=list)),
+                ('ativa', models.BooleanField(default=True)),
+                ('horario', models.TimeField(blank=True, null=True)),
+                ('intervalo_minutos', models.PositiveIntegerField(default=1440)),
+                ('proxima_execucao', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('em_execucao_desde', models.DateTimeField(blank=True, null=True)),
+                ('trabalhador', models.CharField(blank=True, max_length=100)),
+                ('tempo_maximo_minutos', models.PositiveIntegerField(default=60)),
+                ('ultima_execucao', models.DateTimeField(blank=True, null=True)),
+                ('ultima_duracao', models.FloatField(blank=True, null=True)),
+                ('ultimo_sucesso', models.BooleanField(null=True)),
+            ],
+            options={
+                'verbose_name': 'Tarefa Agendada',
+                'verbose_name_plural': 'Tarefas Agendadas',
+                'ordering': ['proxima_execucao'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ExecucaoTarefa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('inicio', models.DateTimeField(db_index=True)),
+                ('fim', models.DateTimeField()),
+                ('duracao', models.FloatField()),
+                ('sucesso', models.BooleanField()),
+                ('saida', models.TextField(blank=True)),
+                ('erro', models.TextField(blank=True)),
+                ('trabalhador', models.CharField(blank=True, max_length=100)),
+                ('tarefa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='execucoes', to='core.tarefaagendada')),
+            ],
+            options={
+                'verbose_name': 'Execução de Tarefa',
+                'verbose_name_plural': 'Execuções de Tarefas',
+                'ordering': ['-inicio'],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+from datetime import datetime, time, timedelta
+
+from django.db import migrations
+from django.utils import timezone
+
+# Manutenção noturna, fora do horário da farmácia (horário local)
+TAREFAS_PADRAO = [
+    ('Resumo de estoque (virada de validade)', 'atualizar_resumo_estoque', [], time(0, 10)),
+    ('Baixa de lotes vencidos', 'limpar_lotes_vencidos', [], time(2, 0)),
+    ('Fato diário de vendas (últimos 7 dias)', 'reconstruir_vendas_diarias', ['--dias', '7'], time(3, 0)),
+]
+
+
+def criar_tarefas_padrao(apps, schema_editor):
+    TarefaAgendada = apps.get_model('core', 'TarefaAgendada')
+    amanha = timezone.localdate() + timedelta(days=1)
+    for nome, comando, argumentos, horario in TAREFAS_PADRAO:
+        TarefaAgendada.objects.get_or_create(nome=nome, defaults={
+            'comando': comando,
+            'argumentos': argumentos,
+            'horario': horario,
+            'proxima_execucao': timezone.make_aware(datetime.combine(amanha, horario)),
+        })
+
+
+def remover_tarefas_padrao(apps, schema_editor):
+    TarefaAgendada = apps.get_model('core', 'TarefaAgendada')
+    TarefaAgendada.objects.filter(nome__in=[nome for nome, *_resto in TAREFAS_PADRAO]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_tarefas_agendadas'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_tarefas_padrao, remover_tarefas_padrao),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-17 16:06
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0002_tarefas_padrao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Exportacao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=50)),
+                ('parametros', models.JSONField(blank=True, default=dict)),
+                ('chave', models.CharField(db_index=True, max_length=64)),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('processando', 'Processando'), ('concluida', 'Concluída'), ('erro', 'Erro')], default='pendente', max_length=20)),
+                ('progresso', models.PositiveSmallIntegerField(default=0)),
+                ('arquivo', models.FileField(blank=True, upload_to='exportacoes/%Y/%m/')),
+                ('nome_arquivo', models.CharField(max_length=100)),
+                ('erro', models.TextField(blank=True)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('iniciado_em', models.DateTimeField(blank=True, null=True)),
+                ('atualizado_em', models.DateTimeField(default=django.utils.timezone.now)),
+                ('concluido_em', models.DateTimeField(blank=True, null=True)),
+                ('expira_em', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('solicitado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Exportação',
+                'verbose_name_plural': 'Exportações',
+                'ordering': ['-criado_em'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='exportacao',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['pendente', 'processando'])), fields=('chave',), name='exportacao_chave_em_andamento'),
+        ),
+    ]
@@ -1,3 +1,118 @@
 from django.db import models
+from django.contrib.auth.models import User
+from django.utils import timezone
 
-# Create your models here.
+
+class TarefaAgendada(models.Model):
+    """
+    Comando de manutenção (manage.py) executado periodicamente pelo worker
+    run_scheduler. Com `horario`, roda uma vez por dia nesse horário local;
+    sem ele, a cada `intervalo_minutos`.
+    """
+    nome = models.CharField(max_length=100, unique=True)
+    comando = models.CharField(max_length=100)
+    argumentos = models.JSONField(default=list, blank=True)
+    ativa = models.BooleanField(default=True)
+
+    horario = models.TimeField(null=True, blank=True)
+    intervalo_minutos = models.PositiveIntegerField(default=1440)
+    proxima_execucao = models.DateTimeField(default=timezone.now, db_index=True)
+
+    # Reserva da execução: quem pegou a tarefa e desde quando (liberada ao terminar)
+    em_execucao_desde = models.DateTimeField(null=True, blank=True)
+    trabalhador = models.CharField(max_length=100, blank=True)
+    tempo_maximo_minutos = models.PositiveIntegerField(default=60)
+
+    ultima_execucao = models.DateTimeField(null=True, blank=True)
+    ultima_duracao = models.FloatField(null=True, blank=True)  # segundos
+    ultimo_sucesso = models.BooleanField(null=True)
+
+    class Meta:
+        verbose_name = "Tarefa Agendada"
+        verbose_name_plural = "Tarefas Agendadas"
+        ordering = ['proxima_execucao']
+
+    def __str__(self):
+        return f"{self.nome} ({self.comando})"
+
+
+class ExecucaoTarefa(models.Model):
+    """Histórico de cada execução, com duração e saída do comando"""
+    tarefa = models.ForeignKey(TarefaAgendada, on_delete=models.CASCADE, related_name='execucoes')
+    inicio = models.DateTimeField(db_index=True)
+    fim = models.DateTimeField()
+    duracao = models.FloatField()  # segundos
+    sucesso = models.BooleanField()
+    saida = models.TextField(blank=True)
+    erro = models.TextField(blank=True)
+    trabalhador = models.CharField(max_length=100, blank=True)
+
+    class Meta:
+        verbose_name = "Execução de Tarefa"
+        verbose_name_plural = "Execuções de Tarefas"
+        ordering = ['-inicio']
+
+    def __str__(self):
+        return f"{self.tarefa.nome} em {self.inicio:%d/%m/%Y %H:%M} ({'ok' if self.sucesso else 'erro'})"
+
+
+class Exportacao(models.Model):
+    """
+    Relatório gerado em segundo plano (core.exportacoes). O arquivo fica em
+    MEDIA_ROOT até `expira_em`; pedidos com os mesmos parâmetros (`chave`)
+    até lá reaproveitam o mesmo arquivo.
+    """
+    PENDENTE = 'pendente'
+    PROCESSANDO = 'processando'
+    CONCLUIDA = 'concluida'
+    ERRO = 'erro'
+    STATUS_CHOICES = [
+        (PENDENTE, 'Pendente'),
+        (PROCESSANDO, 'Processando'),
+        (CONCLUIDA, 'Concluída'),
+        (ERRO, 'Erro'),
+    ]
+
+    tipo = models.CharField(max_length=50)
+    parametros = models.JSONField(default=dict, blank=True)
+    chave = models.CharField(max_length=64, db_index=True)  # sha256 de tipo + parâmetros
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDENTE)
+    progresso = models.PositiveSmallIntegerField(default=0)  # 0 a 100
+
+    arquivo = models.FileField(upload_to='exportacoes/%Y/%m/', blank=True)
+    nome_arquivo = models.CharField(max_length=100)
+    erro = models.TextField(blank=True)
+
+    solicitado_por = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    criado_em = models.DateTimeField(auto_now_add=True)
+    iniciado_em = models.DateTimeField(null=True, blank=True)
+    # Atualizado junto com o progresso: uma exportação parada há muito tempo morreu com o processo
+    atualizado_em = models.DateTimeField(default=timezone.now)
+    concluido_em = models.DateTimeField(null=True, blank=True)
+    expira_em = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    class Meta:
+        verbose_name = "Exportação"
+        verbose_name_plural = "Exportações"
+        ordering = ['-criado_em']
+        constraints = [
+            # No máximo uma exportação em andamento por chave: dois pedidos iguais
+            # simultâneos não geram o mesmo arquivo duas vezes
+            models.UniqueConstraint(
+                fields=['chave'],
+                condition=models.Q(status__in=['pendente', 'processando']),
+                name='exportacao_chave_em_andamento',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.nome_arquivo} ({self.get_status_display()})"
+
+    @property
+    def em_andamento(self):
+        return self.status in (self.PENDENTE, self.PROCESSANDO)
+
+    def disponivel(self, agora=None):
+        """Arquivo pronto e ainda dentro do prazo de reaproveitamento"""
+        agora = agora or timezone.now()
+        return self.status == self.CONCLUIDA and bool(self.arquivo) and self.expira_em > agora
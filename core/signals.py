@@ -1,9 +1,11 @@
 # core/signals.py
-from django.db.models.signals import post_migrate
+from django.db.models.signals import post_migrate, m2m_changed, post_save, pre_delete
 from django.dispatch import receiver
-from django.contrib.auth.models import Group, Permission
+from django.contrib.auth.models import Group, Permission, User
 from django.apps import apps
 
+from core.grupos import invalidar_grupos
+
 
 @receiver(post_migrate)
 def criar_grupos_automaticamente(sender, **kwargs):
@@ -67,4 +69,31 @@ def criar_grupos_automaticamente(sender, **kwargs):
 
         print("✅ Grupo VENDEDOR criado")
 
-    print("🎉 Grupos configurados automaticamente!")
\ No newline at end of file
+    print("🎉 Grupos configurados automaticamente!")
+
+# ========== CACHE DE GRUPOS DOS USUÁRIOS ==========
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidar_cache_grupos(sender, instance, action, reverse, pk_set, **kwargs):
+    """Invalida o cache de grupos quando um usuário entra ou sai de um grupo"""
+    if action not in ('post_add', 'post_remove', 'pre_clear', 'post_clear'):
+        return
+
+    if not reverse:
+        # user.groups.add/remove/clear
+        instance.__dict__.pop('_grupos_cache', None)
+        invalidar_grupos(instance.pk)
+    elif action == 'pre_clear':
+        # group.user_set.clear(): os usuários só são conhecidos antes de limpar
+        invalidar_grupos(*instance.user_set.values_list('pk', flat=True))
+    elif pk_set:
+        # group.user_set.add/remove
+        invalidar_grupos(*pk_set)
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def invalidar_cache_grupos_do_grupo(sender, instance, created=False, **kwargs):
+    """Renomear ou excluir um grupo muda os grupos de todos os seus membros"""
+    if not created:
+        invalidar_grupos(*instance.user_set.values_list('pk', flat=True))
@@ -1,38 +1,40 @@
 # core/templatetags/auth_tags.py
 from django import template
 
+from core.grupos import pertence_a
+
 register = template.Library()
 
 @register.filter
 def is_admin(user):
-    return user.groups.filter(name='Admin').exists()
+    return pertence_a(user, 'Admin')
 
 @register.filter
 def is_gerente(user):
-    return user.groups.filter(name='Gerente').exists()
+    return pertence_a(user, 'Gerente')
 
 @register.filter
 def is_vendedor(user):
-    return user.groups.filter(name='Vendedor').exists()
+    return pertence_a(user, 'Vendedor')
 
 @register.filter
 def has_group(user, group_name):
-    return user.groups.filter(name=group_name).exists()
+    return pertence_a(user, group_name)
 
 @register.simple_tag
 def user_level(user):
     """Retorna o nível do usuário"""
     if user.is_superuser:
         return 'admin'
-    elif user.groups.filter(name='Admin').exists():
+    elif pertence_a(user, 'Admin'):
         return 'admin'
-    elif user.groups.filter(name='Gerente').exists():
+    elif pertence_a(user, 'Gerente'):
         return 'gerente'
-    elif user.groups.filter(name='Vendedor').exists():
+    elif pertence_a(user, 'Vendedor'):
         return 'vendedor'
     return 'sem-nivel'
 
 @register.simple_tag
 def can_access(user, *groups):
     """Verifica se usuário tem acesso a algum dos grupos"""
-    return user.groups.filter(name__in=groups).exists() or user.is_superuser
\ No newline at end of file
+    return pertence_a(user, *groups) or user.is_superuser
\ No newline at end of file
@@ -1,3 +1,185 @@
+from datetime import datetime, time, timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+
+from . import exportacoes
+from .agendador import calcular_proxima, executar, executar_pendentes, reservar_proxima
+from .models import ExecucaoTarefa, Exportacao, TarefaAgendada
+
+
+class AgendadorTests(TestCase):
+    """Reserva e reagendamento das tarefas do worker run_scheduler (core.agendador)"""
+
+    def setUp(self):
+        # As tarefas padrão da migração só vencem amanhã
+        self.agora = timezone.now()
+        self.tarefa = TarefaAgendada.objects.create(
+            nome='Verificação', comando='check', intervalo_minutos=30,
+            proxima_execucao=self.agora - timedelta(minutes=1),
+        )
+
+    def test_reserva_tarefa_vencida_para_um_so_trabalhador(self):
+        reservada = reservar_proxima('web.1:10')
+
+        self.assertEqual(reservada, self.tarefa)
+        self.tarefa.refresh_from_db()
+        self.assertEqual(self.tarefa.trabalhador, 'web.1:10')
+        self.assertIsNotNone(self.tarefa.em_execucao_desde)
+        # Já reservada: o outro worker não a pega
+        self.assertIsNone(reservar_proxima('web.2:20'))
+
+    def test_nao_reserva_tarefa_futura_ou_inativa(self):
+        TarefaAgendada.objects.filter(pk=self.tarefa.pk).update(proxima_execucao=self.agora + timedelta(minutes=5))
+        TarefaAgendada.objects.create(
+            nome='Inativa', comando='check', ativa=False, proxima_execucao=self.agora - timedelta(minutes=1),
+        )
+
+        self.assertIsNone(reservar_proxima('web.1:10'))
+
+    def test_retoma_reserva_vencida(self):
+        # O worker que reservou morreu há mais de tempo_maximo_minutos
+        TarefaAgendada.objects.filter(pk=self.tarefa.pk).update(
+            em_execucao_desde=self.agora - timedelta(minutes=61), trabalhador='web.1:10',
+        )
+
+        self.assertEqual(reservar_proxima('web.2:20'), self.tarefa)
+        self.tarefa.refresh_from_db()
+        self.assertEqual(self.tarefa.trabalhador, 'web.2:20')
+
+    def test_executar_registra_e_reagenda(self):
+        tarefa = reservar_proxima('web.1:10')
+
+        sucesso, _duracao = executar(tarefa, 'web.1:10')
+
+        self.assertTrue(sucesso)
+        execucao = ExecucaoTarefa.objects.get(tarefa=tarefa)
+        self.assertTrue(execucao.sucesso)
+        self.assertEqual(execucao.trabalhador, 'web.1:10')
+        tarefa.refresh_from_db()
+        self.assertIsNone(tarefa.em_execucao_desde)
+        self.assertTrue(tarefa.ultimo_sucesso)
+        self.assertEqual(tarefa.proxima_execucao, execucao.fim + timedelta(minutes=30))
+
+    def test_falha_fica_no_historico_e_reagenda(self):
+        TarefaAgendada.objects.filter(pk=self.tarefa.pk).update(comando='comando_inexistente')
+
+        self.assertEqual(executar_pendentes('web.1:10'), 1)
+
+        execucao = ExecucaoTarefa.objects.get(tarefa=self.tarefa)
+        self.assertFalse(execucao.sucesso)
+        self.assertIn('comando_inexistente', execucao.erro)
+        self.tarefa.refresh_from_db()
+        self.assertFalse(self.tarefa.ultimo_sucesso)
+        self.assertIsNone(self.tarefa.em_execucao_desde)
+        self.assertGreater(self.tarefa.proxima_execucao, self.agora)
+
+    def test_reserva_retomada_nao_e_liberada_pelo_antigo_trabalhador(self):
+        tarefa = reservar_proxima('web.1:10')
+        TarefaAgendada.objects.filter(pk=tarefa.pk).update(trabalhador='web.2:20')
+
+        executar(tarefa, 'web.1:10')
+
+        tarefa.refresh_from_db()
+        self.assertEqual(tarefa.trabalhador, 'web.2:20')
+        self.assertIsNotNone(tarefa.em_execucao_desde)
+
+    def test_proxima_execucao_diaria_no_horario_local(self):
+        dez_horas = timezone.make_aware(datetime(2026, 3, 10, 10, 0))
+        tarefa = TarefaAgendada(nome='Diária', comando='check', horario=time(3, 0))
+
+        self.assertEqual(calcular_proxima(tarefa, dez_horas), timezone.make_aware(datetime(2026, 3, 11, 3, 0)))
+        tarefa.horario = time(12, 0)
+        self.assertEqual(calcular_proxima(tarefa, dez_horas), timezone.make_aware(datetime(2026, 3, 10, 12, 0)))
+
+    @mock.patch('core.management.commands.run_scheduler.close_old_connections')
+    @mock.patch('core.management.commands.run_scheduler.signal.signal')
+    def test_run_scheduler_uma_vez(self, _signal, _close_old_connections):
+        saida = StringIO()
+        call_command('run_scheduler', '--uma-vez', stdout=saida)
+
+        self.assertIn('Verificação', saida.getvalue())
+        self.assertEqual(ExecucaoTarefa.objects.filter(tarefa=self.tarefa, sucesso=True).count(), 1)
+        self.tarefa.refresh_from_db()
+        self.assertGreater(self.tarefa.proxima_execucao, self.agora)
+
+
+class SolicitarExportacaoTests(TestCase):
+    """Reaproveitamento de exportações iguais em core.exportacoes.solicitar"""
+
+    def setUp(self):
+        # Sem threads no teste: o pool só registra o que seria enfileirado
+        patcher = mock.patch.object(exportacoes, '_pool')
+        self.pool = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.parametros = exportacoes.normalizar_parametros('validade_proxima', {'dias': '30'})
+        self.chave = exportacoes.chave_exportacao('validade_proxima', self.parametros)
+
+    def exportacao(self, **campos):
+        return Exportacao.objects.create(
+            tipo='validade_proxima', parametros=self.parametros, chave=self.chave,
+            nome_arquivo='produtos_validade_proxima.xlsx', **campos,
+        )
+
+    def solicitar(self):
+        return exportacoes.solicitar('validade_proxima', self.parametros)
+
+    def test_nova_exportacao_entra_na_fila_depois_do_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            exportacao, reaproveitada = self.solicitar()
+
+        self.assertFalse(reaproveitada)
+        self.assertEqual(exportacao.status, Exportacao.PENDENTE)
+        self.pool.return_value.submit.assert_any_call(exportacoes.executar, exportacao.pk)
+
+    def test_reaproveita_arquivo_pronto_dentro_do_prazo(self):
+        agora = timezone.now()
+        pronta = self.exportacao(
+            status=Exportacao.CONCLUIDA, arquivo='exportacoes/produtos_validade_proxima.xlsx',
+            expira_em=agora + timedelta(minutes=5),
+        )
+
+        self.assertEqual(self.solicitar(), (pronta, True))
+
+        # Depois do prazo, um pedido igual gera outro arquivo
+        Exportacao.objects.filter(pk=pronta.pk).update(expira_em=agora - timedelta(minutes=1))
+        nova, reaproveitada = self.solicitar()
+        self.assertFalse(reaproveitada)
+        self.assertNotEqual(nova, pronta)
+
+    def test_reaproveita_em_andamento_e_descarta_interrompida(self):
+        em_andamento = self.exportacao(status=Exportacao.PROCESSANDO)
+        self.assertEqual(self.solicitar(), (em_andamento, True))
+
+        # Sem progresso há mais de TEMPO_MAXIMO: marcada com erro e substituída
+        Exportacao.objects.filter(pk=em_andamento.pk).update(
+            atualizado_em=timezone.now() - exportacoes.TEMPO_MAXIMO - timedelta(minutes=1)
+        )
+        nova, reaproveitada = self.solicitar()
+
+        self.assertFalse(reaproveitada)
+        em_andamento.refresh_from_db()
+        self.assertEqual(em_andamento.status, Exportacao.ERRO)
+        self.assertEqual(nova.status, Exportacao.PENDENTE)
+
+    def test_pedido_simultaneo_reaproveita_o_que_chegou_primeiro(self):
+        primeiro = self.exportacao()
+        filtrar = Exportacao.objects.filter
+        consultas = []
+
+        def filtro(*args, **kwargs):
+            # A primeira consulta acontece antes do pedido simultâneo gravar a sua exportação
+            consultas.append(kwargs)
+            return Exportacao.objects.none() if len(consultas) == 1 else filtrar(*args, **kwargs)
+
+        with mock.patch.object(Exportacao.objects, 'filter', side_effect=filtro):
+            with self.captureOnCommitCallbacks(execute=True):
+                exportacao, reaproveitada = self.solicitar()
 
-# Create your tests here.
+        # O INSERT bate na constraint exportacao_chave_em_andamento
+        self.assertEqual((exportacao, reaproveitada), (primeiro, True))
+        self.assertEqual(Exportacao.objects.count(), 1)
+        self.assertNotIn(mock.call(exportacoes.executar, mock.ANY), self.pool.return_value.submit.call_args_list)
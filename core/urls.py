@@ -4,5 +4,7 @@ from . import views
 urlpatterns = [
     path('', views.dashboard, name='dashboard'),
     path('exportar-validade-excel/', views.exportar_validade_proxima_excel, name='exportar_validade_excel'),
-    
+    path('exportacoes/<str:tipo>/solicitar/', views.solicitar_exportacao, name='solicitar_exportacao'),
+    path('exportacoes/<int:exportacao_id>/', views.status_exportacao, name='status_exportacao'),
+    path('exportacoes/<int:exportacao_id>/download/', views.baixar_exportacao, name='baixar_exportacao'),
 ]
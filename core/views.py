@@ -1,28 +1,41 @@
-from django.shortcuts import render
+import tempfile
+
+from django.contrib import messages
+from django.core.exceptions import PermissionDenied
+from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
+from django.views.decorators.http import require_POST
 from django.utils import timezone
-from datetime import timedelta, datetime
-from django.db.models import Sum, Count, Q, F
+from datetime import timedelta
+from django.db.models import Sum, F
 from django.contrib.auth.decorators import login_required
-from vendas.models import Venda
+from relatorios.models import VendaDiaria
 from productos.models import Produto, Lote
 from core.decorators import  vendedor_required
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from django.http import HttpResponse
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment
-from openpyxl.utils import get_column_letter
+from django.http import FileResponse, Http404, JsonResponse
+from core.exportacoes import TIPOS as TIPOS_EXPORTACAO, normalizar_parametros, pode_exportar, solicitar
+from core.models import Exportacao
+from productos.exportacoes import relatorio_validade_proxima
 
 
 @login_required
 @vendedor_required
 def dashboard(request):
-    hoje = timezone.now().date()
+    hoje = timezone.localdate()
     inicio_mes = hoje.replace(day=1)
     trinta_dias_atras = hoje - timedelta(days=30)
 
+    # Vendas por dia (fato diário): hoje, mês corrente e últimos 30 dias numa só consulta
+    vendas_por_dia = dict(
+        VendaDiaria.objects.filter(
+            dia__gte=min(inicio_mes, trinta_dias_atras),
+            dia__lte=hoje
+        ).values('dia').annotate(total=Sum('faturamento')).values_list('dia', 'total')
+    )
+
     # Vendas do dia
-    vendas_hoje = Venda.objects.filter(data_venda__date=hoje)
-    total_vendas_hoje = vendas_hoje.aggregate(total=Sum('total'))['total'] or 0
+    total_vendas_hoje = vendas_por_dia.get(hoje, 0)
 
     # Produtos com validade próxima (próximos 90 dias)
     validade_proxima = Lote.objects.filter(
@@ -52,9 +65,7 @@ def dashboard(request):
 
     # Resto do seu código...
     # Receita mensal
-    receita_mensal = Venda.objects.filter(
-        data_venda__date__gte=inicio_mes
-    ).aggregate(total=Sum('total'))['total'] or 0
+    receita_mensal = sum(total for dia, total in vendas_por_dia.items() if dia >= inicio_mes)
 
     # Vendas dos últimos 30 dias para o gráfico
     vendas_ultimos_30_dias = []
@@ -62,11 +73,7 @@ def dashboard(request):
 
     for i in range(31):
         data = trinta_dias_atras + timedelta(days=i)
-        total_dia = Venda.objects.filter(
-            data_venda__date=data
-        ).aggregate(total=Sum('total'))['total'] or 0
-
-        vendas_ultimos_30_dias.append(float(total_dia))
+        vendas_ultimos_30_dias.append(float(vendas_por_dia.get(data, 0)))
         categorias_30_dias.append(data.strftime('%d/%m'))
 
     receita_ultimos_30_dias = sum(vendas_ultimos_30_dias)
@@ -86,7 +93,8 @@ def dashboard(request):
             'y': float(produto.total_vendido or 0)
         })
 
-    # Productos abaixo do stock minimo
+    # Productos abaixo do stock minimo: total dos lotes, incluindo vencidos;
+    # produtos sem lotes ficam de fora (a soma é NULL)
     produtos_estoque_baixo = Produto.objects.annotate(
         total_estoque=Sum('lote__quantidade_disponivel')
     ).filter(
@@ -111,90 +119,82 @@ def dashboard(request):
 @login_required
 @vendedor_required
 def exportar_validade_proxima_excel(request):
-    hoje = timezone.now().date()
-
-    # Buscar todos os produtos com validade próxima
-    produtos_validade_proxima = Lote.objects.filter(
-        data_validade__range=[hoje, hoje + timedelta(days=90)]
-    ).select_related('produto', 'produto__categoria').order_by('data_validade')
-
-    # Criar workbook e worksheet
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Produtos Validade Próxima"
-
-    # Definir estilos
-    header_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    center_alignment = Alignment(horizontal='center', vertical='center')
-
-    # Cabeçalhos ajustados para seus campos
-    headers = [
-        'Produto',
-        'Categoria',
-        'Código Barras',
-        'Lote',
-        'Quantidade',
-        'Data Validade',
-        'Dias Restantes',
-        'Status',
-        'Preço Venda'
-    ]
-
-    for col_num, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col_num)
-        cell.value = header
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = center_alignment
-
-    # Preencher dados
-    for row_num, lote in enumerate(produtos_validade_proxima, 2):
-        dias_para_vencer = (lote.data_validade - hoje).days
-
-        if dias_para_vencer <= 0:
-            status = "Vencido"
-            dias_texto = f"Vencido há {abs(dias_para_vencer)} dias"
-        elif dias_para_vencer <= 7:
-            status = "Crítico"
-            dias_texto = f"{dias_para_vencer} dias"
-        elif dias_para_vencer <= 30:
-            status = "Alerta"
-            dias_texto = f"{dias_para_vencer} dias"
-        else:
-            status = "Atenção"
-            dias_texto = f"{dias_para_vencer} dias"
-
-        # Preencher dados com os campos corretos do seu modelo
-        ws.cell(row=row_num, column=1, value=lote.produto.nome)
-        ws.cell(row=row_num, column=2, value=lote.produto.categoria.nome if lote.produto.categoria else '')
-        ws.cell(row=row_num, column=3, value=lote.produto.codigo_barras or '')
-        ws.cell(row=row_num, column=4, value=lote.numero_lote)
-        ws.cell(row=row_num, column=5, value=lote.quantidade_disponivel)
-        ws.cell(row=row_num, column=6, value=lote.data_validade.strftime('%d/%m/%Y'))
-        ws.cell(row=row_num, column=7, value=dias_texto)
-        ws.cell(row=row_num, column=8, value=status)
-        ws.cell(row=row_num, column=9, value=float(lote.produto.preco_venda))
-
-    # Ajustar largura das colunas
-    column_widths = {}
-    for row in ws.iter_rows():
-        for cell in row:
-            if cell.value:
-                column_letter = get_column_letter(cell.column)
-                current_width = column_widths.get(column_letter, 0)
-                new_width = max(current_width, len(str(cell.value)) + 2)
-                column_widths[column_letter] = new_width
-
-    for column_letter, width in column_widths.items():
-        ws.column_dimensions[column_letter].width = min(width, 50)
-
-    # Criar resposta
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    arquivo = tempfile.TemporaryFile()
+    relatorio_validade_proxima(arquivo)
+    arquivo.seek(0)
+    return FileResponse(
+        arquivo,
+        as_attachment=True,
+        filename="produtos_validade_proxima.xlsx",
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
     )
-    response['Content-Disposition'] = 'attachment; filename="produtos_validade_proxima.xlsx"'
 
-    wb.save(response)
 
-    return response
+# ========== EXPORTAÇÕES EM SEGUNDO PLANO ==========
+
+def _estado_exportacao(exportacao):
+    estado = {
+        'id': exportacao.pk,
+        'status': exportacao.status,
+        'progresso': exportacao.progresso,
+        'url_status': reverse('status_exportacao', args=[exportacao.pk]),
+        'url_download': None,
+        'erro': "Não foi possível gerar o relatório." if exportacao.status == Exportacao.ERRO else None,
+    }
+    if exportacao.disponivel():
+        estado['url_download'] = reverse('baixar_exportacao', args=[exportacao.pk])
+    return estado
+
+
+def _exportacao_do_usuario(request, exportacao_id):
+    exportacao = get_object_or_404(Exportacao, pk=exportacao_id, tipo__in=TIPOS_EXPORTACAO)
+    if not pode_exportar(request.user, exportacao.tipo):
+        raise PermissionDenied
+    return exportacao
+
+
+@login_required
+@require_POST
+def solicitar_exportacao(request, tipo):
+    """Coloca o relatório na fila (ou reaproveita um igual) e devolve o estado para a tela acompanhar"""
+    if tipo not in TIPOS_EXPORTACAO:
+        raise Http404
+    if not pode_exportar(request.user, tipo):
+        raise PermissionDenied
+
+    try:
+        parametros = normalizar_parametros(tipo, request.POST)
+    except ValueError:
+        return JsonResponse({'erro': "Parâmetros inválidos."}, status=400)
+
+    exportacao, _ = solicitar(tipo, parametros, request.user)
+
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        return JsonResponse(_estado_exportacao(exportacao))
+
+    if exportacao.disponivel():
+        return redirect('baixar_exportacao', exportacao.pk)
+    messages.info(request, "⏳ O relatório está sendo gerado. Tente baixar novamente em alguns instantes.")
+    return redirect(request.META.get('HTTP_REFERER') or 'dashboard')
+
+
+@login_required
+def status_exportacao(request, exportacao_id):
+    return JsonResponse(_estado_exportacao(_exportacao_do_usuario(request, exportacao_id)))
+
+
+@login_required
+def baixar_exportacao(request, exportacao_id):
+    exportacao = _exportacao_do_usuario(request, exportacao_id)
+    if not exportacao.disponivel():
+        raise Http404
+    try:
+        arquivo = exportacao.arquivo.open('rb')
+    except FileNotFoundError:
+        raise Http404
+    return FileResponse(
+        arquivo,
+        as_attachment=True,
+        filename=exportacao.nome_arquivo,
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
@@ -38,6 +38,9 @@ SESSION_EXPIRE_AT_BROWSER_CLOSE = True
 SESSION_COOKIE_AGE = 900  # 15 minutos
 SESSION_SAVE_EVERY_REQUEST = True
 
+# Carrinho do PDV: 'sessao' (na sessão, compacto) ou 'cache' (não reescreve a sessão)
+CARRINHO_BACKEND = os.getenv('CARRINHO_BACKEND', 'sessao')
+
 # ==========================
 # INSTALLED APPS
 # ==========================
@@ -70,6 +73,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.GruposUsuarioMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
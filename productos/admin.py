@@ -2,7 +2,7 @@ from django.contrib import admin
 from import_export.admin import ImportExportModelAdmin
 from import_export import fields, resources
 from import_export.widgets import ForeignKeyWidget
-from .models import Produto, Lote, Categoria
+from .models import Produto, Lote, Categoria, BaixaVencimento
 
 # ---------------------------------------------------
 # Recurso para Produto - VERSÃO SIMPLIFICADA
@@ -253,4 +253,12 @@ class LoteAdmin(ImportExportModelAdmin):
     search_fields = ('numero_lote', 'produto__nome')
 
     def save_model(self, request, obj, form, change):
-        super().save_model(request, obj, form, change)
\ No newline at end of file
+        super().save_model(request, obj, form, change)
+
+
+@admin.register(BaixaVencimento)
+class BaixaVencimentoAdmin(admin.ModelAdmin):
+    list_display = ('numero_lote', 'produto', 'unidades', 'custo', 'data_validade', 'data_baixa')
+    list_filter = ('data_baixa',)
+    search_fields = ('numero_lote', 'produto__nome')
+    date_hierarchy = 'data_baixa'
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ProductosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'productos'
+
+    def ready(self):
+        # Importa os signals para que sejam registrados
+        import productos.signals
@@ -0,0 +1,172 @@
+# productos/busca.py
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+
+from core.cache import cache_compartilhado
+from .models import Produto
+
+# Máximo de candidatos do índice em memória consultados no banco por busca
+MAX_CANDIDATOS = 200
+
+# Códigos de barras lidos recentemente mantidos em memória por processo
+CODIGOS_EM_CACHE = 4096
+
+# Os signals só limpam o processo onde o produto mudou (e uma importação roda em
+# outro processo): o índice e os códigos em memória valem no máximo este tempo
+# (segundos). Com cache compartilhado, a versão abaixo invalida todos na hora.
+TEMPO_INDICE = 300
+TEMPO_CODIGOS = 60
+CHAVE_VERSAO = 'busca_produtos:versao'
+
+_indice = None  # (versão, expira_em, linhas)
+_indice_lock = threading.Lock()
+
+_codigos = OrderedDict()  # código -> (versão, expira_em, produtos)
+_codigos_lock = threading.Lock()
+
+
+def _versao():
+    """Versão do catálogo no cache compartilhado (0 sem cache compartilhado)"""
+    if not cache_compartilhado():
+        return 0
+    return cache.get_or_set(CHAVE_VERSAO, 1, None)
+
+
+def _valido(entrada, versao):
+    return entrada is not None and entrada[0] == versao and entrada[1] > time.monotonic()
+
+
+def _normalizar(texto):
+    return (texto or '').casefold()
+
+
+def _obter_indice():
+    """
+    Índice em memória (id, nome, princípio ativo, código de barras) para bancos sem
+    pg_trgm, como o SQLite de desenvolvimento. É montado por processo e refeito
+    após TEMPO_INDICE ou quando invalidar_indice é chamado.
+    """
+    global _indice
+    versao = _versao()
+    if not _valido(_indice, versao):
+        with _indice_lock:
+            if not _valido(_indice, versao):
+                linhas = [
+                    (pk, _normalizar(nome), _normalizar(principio_ativo), _normalizar(codigo_barras))
+                    for pk, nome, principio_ativo, codigo_barras in Produto.objects.order_by('nome', 'id')
+                    .values_list('id', 'nome', 'principio_ativo', 'codigo_barras')
+                ]
+                _indice = (versao, time.monotonic() + TEMPO_INDICE, linhas)
+    return _indice[2]
+
+
+def invalidar_indice():
+    """
+    Descarta o índice e os códigos em memória deste processo e, com cache
+    compartilhado, sobe a versão para que os outros processos façam o mesmo
+    """
+    global _indice
+    _indice = None
+    with _codigos_lock:
+        _codigos.clear()
+    if cache_compartilhado():
+        try:
+            cache.incr(CHAVE_VERSAO)
+        except ValueError:
+            cache.set(CHAVE_VERSAO, 1, None)
+
+
+def _candidatos_em_memoria(termo):
+    """Ids que casam com o termo, na ordem de relevância: código exato, início do nome, resto"""
+    termo = _normalizar(termo)
+    por_relevancia = ([], [], [])
+    for pk, nome, principio_ativo, codigo_barras in _obter_indice():
+        if codigo_barras == termo:
+            por_relevancia[0].append(pk)
+        elif nome.startswith(termo):
+            por_relevancia[1].append(pk)
+        elif termo in nome or termo in principio_ativo or codigo_barras.startswith(termo):
+            por_relevancia[2].append(pk)
+    return [pk for grupo in por_relevancia for pk in grupo][:MAX_CANDIDATOS]
+
+
+def buscar_produtos(termo, limite=10):
+    """
+    Os `limite` produtos com estoque válido que casam com o termo (nome, princípio
+    ativo ou código de barras), já anotados com o estoque.
+
+    No PostgreSQL a busca usa os índices GIN pg_trgm (migração 0014); nos demais
+    bancos, o índice em memória deste módulo.
+    """
+    termo = (termo or '').strip()
+    if not termo:
+        return []
+
+    produtos = Produto.objects.com_estoque().filter(estoque_valido_anotado__gt=0)
+
+    if connection.vendor == 'postgresql':
+        return list(
+            produtos.filter(
+                Q(nome__icontains=termo) |
+                Q(principio_ativo__icontains=termo) |
+                Q(codigo_barras__icontains=termo)
+            ).annotate(
+                relevancia=Case(
+                    When(codigo_barras=termo, then=Value(0)),
+                    When(nome__istartswith=termo, then=Value(1)),
+                    default=Value(2),
+                    output_field=IntegerField(),
+                )
+            ).order_by('relevancia', 'nome', 'id')[:limite]
+        )
+
+    candidatos = _candidatos_em_memoria(termo)
+    encontrados = {produto.pk: produto for produto in produtos.filter(pk__in=candidatos)}
+    return [encontrados[pk] for pk in candidatos if pk in encontrados][:limite]
+
+
+# ========== LEITURA DE CÓDIGO DE BARRAS ==========
+
+def _produtos_do_codigo(codigo):
+    """
+    Produtos com o código, por um LRU em memória com validade. Código sem produto
+    não fica no cache: o produto pode ser cadastrado logo depois da leitura.
+    """
+    versao = _versao()
+    with _codigos_lock:
+        entrada = _codigos.get(codigo)
+        if _valido(entrada, versao):
+            _codigos.move_to_end(codigo)
+            return entrada[2]
+
+    produtos = tuple(Produto.objects.filter(codigo_barras=codigo).order_by('id').values_list('id', 'nome'))
+    if produtos:
+        with _codigos_lock:
+            _codigos[codigo] = (versao, time.monotonic() + TEMPO_CODIGOS, produtos)
+            _codigos.move_to_end(codigo)
+            while len(_codigos) > CODIGOS_EM_CACHE:
+                _codigos.popitem(last=False)
+    return produtos
+
+
+def resolver_codigo_barras(codigo):
+    """
+    Id do produto com o código de barras lido, pelo índice de codigo_barras e um cache
+    LRU em memória (ver _produtos_do_codigo).
+    Levanta Produto.DoesNotExist, ou Produto.MultipleObjectsReturned quando o código
+    está cadastrado em mais de um produto.
+    """
+    produtos = _produtos_do_codigo((codigo or '').strip())
+    if not produtos:
+        raise Produto.DoesNotExist(f"Nenhum produto com o código de barras {codigo}")
+    if len(produtos) > 1:
+        nomes = ', '.join(nome for _pk, nome in produtos)
+        raise Produto.MultipleObjectsReturned(
+            f"Código de barras {codigo} cadastrado em mais de um produto: {nomes}"
+        )
+    return produtos[0][0]
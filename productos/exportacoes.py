@@ -0,0 +1,250 @@
+# productos/exportacoes.py
+"""
+Geradores dos relatórios em Excel. Cada um escreve o xlsx num arquivo já aberto
+(`destino`) e, se receber `progresso`, chama progresso(feitos, total) de tempos
+em tempos: são usados tanto pelas views de download direto quanto pelas
+exportações em segundo plano (core.exportacoes).
+"""
+from datetime import timedelta
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Border, Side, Alignment, NamedStyle
+from openpyxl.utils import get_column_letter
+from django.utils import timezone
+
+from .models import Lote, Produto
+
+
+def _estilos_relatorio_estoque():
+    """Estilos nomeados do relatório: registrados uma vez no arquivo e referenciados pelo nome em cada célula"""
+    borda = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
+    centro = Alignment(horizontal='center', vertical='center')
+
+    def preenchimento(cor):
+        return PatternFill(start_color=cor, end_color=cor, fill_type="solid")
+
+    return [
+        NamedStyle(name='titulo', font=Font(bold=True, size=16), alignment=centro),
+        NamedStyle(name='subtitulo', alignment=centro),
+        NamedStyle(name='cabecalho', font=Font(bold=True, color="FFFFFF", size=12),
+                   fill=preenchimento("366092"), alignment=centro, border=borda),
+        NamedStyle(name='texto', border=borda),
+        NamedStyle(name='inteiro', border=borda, alignment=centro, number_format='#,##0'),
+        NamedStyle(name='dinheiro', border=borda, alignment=centro, number_format='"MT" #,##0.00'),
+        NamedStyle(name='status_esgotado', font=Font(bold=True), fill=preenchimento("FFCCCB"),
+                   alignment=centro, border=borda),
+        NamedStyle(name='status_baixo', font=Font(bold=True), fill=preenchimento("FFE599"),
+                   alignment=centro, border=borda),
+        NamedStyle(name='status_ok', font=Font(bold=True), fill=preenchimento("C6EFCE"),
+                   alignment=centro, border=borda),
+        NamedStyle(name='resumo_titulo', font=Font(bold=True, size=12), fill=preenchimento("D9E1F2"),
+                   alignment=centro),
+        NamedStyle(name='resumo_rotulo', font=Font(bold=True), border=borda),
+        NamedStyle(name='alerta', font=Font(bold=True, color="FF0000"), fill=preenchimento("FFE6E6"),
+                   alignment=centro),
+    ]
+
+
+STATUS_RELATORIO_ESTOQUE = {
+    'esgotado': 'SEM ESTOQUE',
+    'baixo': 'ESTOQUE BAIXO',
+    'ok': 'ESTOQUE OK',
+}
+
+
+def relatorio_estoque(destino, progresso=None):
+    """
+    Relatório de estoque em modo write_only, numa única passada por uma consulta
+    anotada (iterator): memória e número de consultas não crescem com o catálogo.
+    """
+    consulta = Produto.objects.com_estoque().select_related('categoria').order_by('categoria__nome', 'nome')
+    total_produtos = Produto.objects.count() if progresso else 0
+
+    wb = Workbook(write_only=True)
+    for estilo in _estilos_relatorio_estoque():
+        wb.add_named_style(estilo)
+    ws = wb.create_sheet("Relatório de Estoque")
+
+    def celula(valor, estilo):
+        c = WriteOnlyCell(ws, value=valor)
+        c.style = estilo
+        return c
+
+    # ===== LARGURA DAS COLUNAS (antes de escrever as linhas) =====
+    widths = {
+        'A': 40, 'B': 20, 'C': 15, 'D': 12,
+        'E': 15, 'F': 15, 'G': 15, 'H': 15,
+        'I': 15, 'J': 20, 'K': 20
+    }
+    for col, width in widths.items():
+        ws.column_dimensions[col].width = width
+
+    # ===== TÍTULO =====
+    ws.append([celula("RELATÓRIO DE ESTOQUE - BALANÇO DE PRODUTOS", 'titulo')])
+    ws.merged_cells.add('A1:K1')
+    ws.append([celula(f"Emitido em: {timezone.localtime().strftime('%d/%m/%Y às %H:%M')}", 'subtitulo')])
+    ws.merged_cells.add('A2:K2')
+    ws.append([])
+
+    # ===== CABEÇALHO =====
+    headers = [
+        'Produto', 'Categoria', 'Código Barras', 'Lotes Ativos',
+        'Estoque Disponível', 'Estoque Vencido', 'Estoque Mínimo', 'Status',
+        'Preço Venda', 'Rendimento (válido)', 'Valor Investido (válido)'
+    ]
+    ws.append([celula(header, 'cabecalho') for header in headers])
+
+    # ===== DADOS (os totais do resumo são acumulados na mesma passada) =====
+    row_num = 5
+    contagem_status = {'esgotado': 0, 'baixo': 0, 'ok': 0}
+    total_estoque_disponivel = 0
+    total_estoque_vencido = 0
+    total_rendimento_valido = 0
+    total_investido_valido = 0
+
+    for produto in consulta.iterator(chunk_size=2000):
+        estoque_disponivel = produto.estoque_disponivel
+        estoque_vencido = produto.estoque_vencido
+        rendimento = produto.rendimento_potencial
+        investido = produto.valor_investido
+        status_estoque = produto.status_estoque
+
+        contagem_status[status_estoque] += 1
+        total_estoque_disponivel += estoque_disponivel
+        total_estoque_vencido += estoque_vencido
+        total_rendimento_valido += rendimento
+        total_investido_valido += investido
+
+        ws.append([
+            celula(produto.nome, 'texto'),
+            celula(produto.categoria.nome if produto.categoria else 'N/A', 'texto'),
+            celula(produto.codigo_barras or 'N/A', 'texto'),
+            celula(produto.lotes_ativos, 'inteiro'),
+            celula(estoque_disponivel, 'inteiro'),
+            celula(estoque_vencido, 'inteiro'),
+            celula(produto.estoque_minimo, 'inteiro'),
+            celula(STATUS_RELATORIO_ESTOQUE[status_estoque], f'status_{status_estoque}'),
+            celula(float(produto.preco_venda or 0), 'dinheiro'),
+            celula(float(rendimento), 'dinheiro'),
+            celula(float(investido), 'dinheiro'),
+        ])
+        row_num += 1
+        if progresso and row_num % 500 == 0:
+            progresso(row_num - 5, total_produtos)
+
+    # ===== RESUMO =====
+    ws.append([])
+    ws.append([celula("RESUMO DO ESTOQUE (APENAS LOTES VÁLIDOS)", 'resumo_titulo')])
+    summary_row = row_num + 1
+    ws.merged_cells.add(f'A{summary_row}:K{summary_row}')
+
+    resumo = [
+        ('Total de Produtos', sum(contagem_status.values()), 'inteiro'),
+        ('Produtos sem Estoque Disponível', contagem_status['esgotado'], 'inteiro'),
+        ('Produtos com Estoque Baixo', contagem_status['baixo'], 'inteiro'),
+        ('Produtos com Estoque OK', contagem_status['ok'], 'inteiro'),
+        ('Estoque Disponível Total (unidades)', total_estoque_disponivel, 'inteiro'),
+        ('Estoque Vencido Total (unidades)', total_estoque_vencido, 'inteiro'),
+        ('Rendimento Potencial Total (válido)', float(total_rendimento_valido), 'dinheiro'),
+        ('Investimento Total (válido)', float(total_investido_valido), 'dinheiro'),
+    ]
+    for desc, val, estilo in resumo:
+        ws.append([celula(desc, 'resumo_rotulo'), celula(val, estilo)])
+
+    # ===== LINHA DE ALERTA SOBRE VENCIDOS =====
+    if total_estoque_vencido > 0:
+        ws.append([])
+        alert_row = summary_row + len(resumo) + 2
+        ws.append([celula(f"⚠️ {total_estoque_vencido} unidades em lotes vencidos (fora do estoque disponível)",
+                          'alerta')])
+        ws.merged_cells.add(f'A{alert_row}:K{alert_row}')
+
+    wb.save(destino)
+
+
+def relatorio_validade_proxima(destino, progresso=None, dias=90):
+    """Lotes que vencem nos próximos `dias` dias, do mais próximo ao mais distante"""
+    hoje = timezone.now().date()
+
+    # Buscar todos os produtos com validade próxima
+    produtos_validade_proxima = Lote.objects.filter(
+        data_validade__range=[hoje, hoje + timedelta(days=dias)]
+    ).select_related('produto', 'produto__categoria').order_by('data_validade')
+    total_lotes = produtos_validade_proxima.count() if progresso else 0
+
+    # Criar workbook e worksheet
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Produtos Validade Próxima"
+
+    # Definir estilos
+    header_font = Font(bold=True, color="FFFFFF")
+    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+    center_alignment = Alignment(horizontal='center', vertical='center')
+
+    # Cabeçalhos ajustados para seus campos
+    headers = [
+        'Produto',
+        'Categoria',
+        'Código Barras',
+        'Lote',
+        'Quantidade',
+        'Data Validade',
+        'Dias Restantes',
+        'Status',
+        'Preço Venda'
+    ]
+
+    for col_num, header in enumerate(headers, 1):
+        cell = ws.cell(row=1, column=col_num)
+        cell.value = header
+        cell.font = header_font
+        cell.fill = header_fill
+        cell.alignment = center_alignment
+
+    # Preencher dados
+    for row_num, lote in enumerate(produtos_validade_proxima.iterator(chunk_size=2000), 2):
+        dias_para_vencer = (lote.data_validade - hoje).days
+
+        if dias_para_vencer <= 0:
+            status = "Vencido"
+            dias_texto = f"Vencido há {abs(dias_para_vencer)} dias"
+        elif dias_para_vencer <= 7:
+            status = "Crítico"
+            dias_texto = f"{dias_para_vencer} dias"
+        elif dias_para_vencer <= 30:
+            status = "Alerta"
+            dias_texto = f"{dias_para_vencer} dias"
+        else:
+            status = "Atenção"
+            dias_texto = f"{dias_para_vencer} dias"
+
+        # Preencher dados com os campos corretos do seu modelo
+        ws.cell(row=row_num, column=1, value=lote.produto.nome)
+        ws.cell(row=row_num, column=2, value=lote.produto.categoria.nome if lote.produto.categoria else '')
+        ws.cell(row=row_num, column=3, value=lote.produto.codigo_barras or '')
+        ws.cell(row=row_num, column=4, value=lote.numero_lote)
+        ws.cell(row=row_num, column=5, value=lote.quantidade_disponivel)
+        ws.cell(row=row_num, column=6, value=lote.data_validade.strftime('%d/%m/%Y'))
+        ws.cell(row=row_num, column=7, value=dias_texto)
+        ws.cell(row=row_num, column=8, value=status)
+        ws.cell(row=row_num, column=9, value=float(lote.produto.preco_venda))
+
+        if progresso and row_num % 500 == 0:
+            progresso(row_num - 1, total_lotes)
+
+    # Ajustar largura das colunas
+    column_widths = {}
+    for row in ws.iter_rows():
+        for cell in row:
+            if cell.value:
+                column_letter = get_column_letter(cell.column)
+                current_width = column_widths.get(column_letter, 0)
+                new_width = max(current_width, len(str(cell.value)) + 2)
+                column_widths[column_letter] = new_width
+
+    for column_letter, width in column_widths.items():
+        ws.column_dimensions[column_letter].width = min(width, 50)
+
+    wb.save(destino)
@@ -0,0 +1,35 @@
+# productos/importacao.py
+"""Funções comuns aos comandos de importação de planilhas (importar_lotes, importar_produtos)"""
+from pathlib import Path
+
+import pandas as pd
+from django.core.management.base import CommandError
+
+
+def normalizar_nomes(serie):
+    """Nome comparável: sem acentos, sem espaços repetidos e sem diferença de maiúsculas"""
+    return (
+        serie.astype('string').fillna('')
+        .str.normalize('NFKD').str.encode('ascii', errors='ignore').str.decode('ascii')
+        .str.replace(r'\s+', ' ', regex=True).str.strip().str.casefold()
+    )
+
+
+def ler_planilha(arquivo, texto=()):
+    """Lê xlsx ou csv com colunas em minúsculas; as colunas em `texto` são lidas como string"""
+    caminho = Path(arquivo)
+    if not caminho.exists():
+        raise CommandError(f"Arquivo não encontrado: {arquivo}")
+
+    tipos = {coluna: str for coluna in texto}
+    if caminho.suffix.lower() == '.csv':
+        df = pd.read_csv(caminho, dtype=tipos)
+    else:
+        df = pd.read_excel(caminho, dtype=tipos)
+    return df.rename(columns=lambda c: str(c).strip().lower())
+
+
+def exigir_colunas(df, colunas):
+    faltando = [c for c in colunas if c not in df.columns]
+    if faltando:
+        raise CommandError(f"Colunas obrigatórias ausentes: {', '.join(faltando)}")
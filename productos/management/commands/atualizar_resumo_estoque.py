@@ -0,0 +1,35 @@
+# productos/management/commands/atualizar_resumo_estoque.py
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from productos.models import Produto, ProdutoEstoqueResumo
+
+
+class Command(BaseCommand):
+    help = 'Atualiza o resumo de estoque dos produtos (virada de validade dos lotes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--todos',
+            action='store_true',
+            help='Recalcula o resumo de todos os produtos, não apenas os desatualizados',
+        )
+        parser.add_argument('--lote', type=int, default=500, help='Produtos por agregação')
+
+    def handle(self, *args, **options):
+        hoje = timezone.localdate()
+
+        produtos = Produto.objects.order_by('pk')
+        if not options['todos']:
+            # Sem resumo, ou resumo calculado antes de hoje (algum lote pode ter vencido)
+            produtos = produtos.exclude(resumo_estoque__data_referencia=hoje)
+
+        ids = list(produtos.values_list('pk', flat=True))
+        tamanho = max(options['lote'], 1)
+
+        for inicio in range(0, len(ids), tamanho):
+            ProdutoEstoqueResumo.recalcular(ids[inicio:inicio + tamanho])
+
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ Resumo de estoque atualizado para {len(ids)} produtos.")
+        )
@@ -0,0 +1,155 @@
+# productos/management/commands/importar_lotes.py
+import time
+
+import pandas as pd
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from productos.importacao import exigir_colunas, ler_planilha, normalizar_nomes
+from productos.models import Lote, LoteSequencia, Produto, ProdutoEstoqueResumo
+
+COLUNAS_OBRIGATORIAS = ('produto', 'data_validade')
+
+
+def mapa_produtos():
+    """
+    Produtos indexados pelo nome normalizado, numa única consulta. Nomes que
+    ficam iguais após a normalização são ambíguos e não entram no mapa.
+    """
+    produtos = pd.DataFrame.from_records(
+        Produto.objects.order_by().values_list('id', 'nome', 'carteiras_por_caixa'),
+        columns=['produto_id', 'produto_nome', 'carteiras_por_caixa'],
+    )
+    produtos['chave'] = normalizar_nomes(produtos['produto_nome'])
+    repetidos = produtos['chave'].duplicated(keep=False)
+    return produtos[~repetidos].set_index('chave'), set(produtos.loc[repetidos, 'chave'])
+
+
+def validar_linhas(df, produtos, ambiguos, hoje):
+    """
+    Valida todas as linhas de uma vez. Devolve (validas, erros): as linhas válidas
+    já com produto_id e datas convertidas, e um DataFrame linha/produto/erro.
+    """
+    exigir_colunas(df, COLUNAS_OBRIGATORIAS)
+
+    df = df.assign(linha=df.index + 2)  # linha da planilha (cabeçalho na linha 1)
+    erro = pd.Series(pd.NA, index=df.index, dtype='string')
+
+    def marcar(mascara, mensagem):
+        erro.loc[mascara & erro.isna()] = mensagem
+
+    df = df.join(produtos, on=normalizar_nomes(df['produto']).rename('chave'))
+    ambiguo = normalizar_nomes(df['produto']).isin(ambiguos)
+    marcar(df['produto_id'].isna() & ~ambiguo, "Produto não encontrado")
+    marcar(ambiguo, "Nome de produto ambíguo (mais de um produto com este nome)")
+
+    df['data_validade'] = pd.to_datetime(df['data_validade'], errors='coerce', dayfirst=True).dt.date
+    marcar(df['data_validade'].isna(), "Data de validade inválida")
+
+    if 'data_fabricacao' in df.columns:
+        df['data_fabricacao'] = pd.to_datetime(df['data_fabricacao'], errors='coerce', dayfirst=True).dt.date
+        fabricacao = df['data_fabricacao'].notna() & df['data_validade'].notna()
+        marcar(fabricacao & (df['data_validade'] <= df['data_fabricacao'].where(fabricacao)),
+               "Data de validade deve ser posterior à data de fabricação")
+    else:
+        df['data_fabricacao'] = None
+
+    # Mesma regra de Lote.clean: datas passadas só em desenvolvimento
+    if not settings.DEBUG:
+        marcar(df['data_validade'].notna() & (df['data_validade'] < hoje), "Data de validade não pode ser no passado")
+
+    for coluna in ('nr_caixas', 'nr_carteiras'):
+        valores = pd.to_numeric(df[coluna], errors='coerce') if coluna in df.columns else pd.Series(0, index=df.index)
+        valores = valores.fillna(0)
+        marcar((valores < 0) | (valores % 1 != 0), f"{coluna} deve ser um número inteiro não negativo")
+        df[coluna] = valores.where(erro.isna(), 0).astype(int)
+
+    erros = df.loc[erro.notna(), ['linha', 'produto']].assign(erro=erro[erro.notna()])
+    validas = df.loc[erro.isna()].astype({'produto_id': int})
+    validas['carteiras_por_caixa'] = validas['carteiras_por_caixa'].fillna(1).replace(0, 1).astype(int)
+    return validas, erros
+
+
+def montar_lotes(validas, hoje, reservar=True):
+    """
+    Cria os objetos Lote já numerados, sem consultas por linha: cada prefixo
+    (produto + mês) reserva o bloco de números de todas as suas linhas de uma vez.
+    Na simulação (reservar=False) os números não são reservados.
+    """
+    validas = validas.assign(prefixo=[Lote.prefixo_numero(nome, hoje) for nome in validas['produto_nome']])
+    primeiros = {
+        prefixo: LoteSequencia.reservar(prefixo, int(quantidade)) if reservar else 1
+        for prefixo, quantidade in validas['prefixo'].value_counts().items()
+    }
+    # Posição de cada linha no bloco do seu prefixo, na ordem da planilha
+    validas = validas.assign(
+        sequencia=validas.groupby('prefixo').cumcount() + validas['prefixo'].map(primeiros)
+    )
+
+    agora = timezone.now()
+    lotes = []
+    # to_dict devolve tipos nativos do Python (o driver do banco não aceita os do numpy)
+    for linha in validas.to_dict('records'):
+        lotes.append(Lote(
+            produto_id=linha['produto_id'],
+            numero_lote=Lote.formatar_numero(linha['prefixo'], linha['sequencia']),
+            nr_caixas=linha['nr_caixas'],
+            nr_carteiras=linha['nr_carteiras'],
+            quantidade_disponivel=linha['nr_caixas'] * linha['carteiras_por_caixa'] + linha['nr_carteiras'],
+            data_validade=linha['data_validade'],
+            data_fabricacao=linha['data_fabricacao'] if pd.notna(linha['data_fabricacao']) else None,
+            data_criacao=agora,
+            data_atualizacao=agora,
+        ))
+    return lotes
+
+
+class Command(BaseCommand):
+    help = 'Importa lotes de uma planilha (xlsx ou csv) em massa: produto, data_validade, nr_caixas, nr_carteiras'
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', nargs='?', default='lotes.xlsx', help='Planilha com os lotes')
+        parser.add_argument('--dry-run', action='store_true', help='Valida e numera os lotes sem gravar nada')
+        parser.add_argument('--lote', type=int, default=1000, help='Lotes por INSERT')
+        parser.add_argument('--relatorio', help='Grava as linhas rejeitadas neste CSV (linha, produto, erro)')
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        hoje = timezone.now().date()
+
+        df = ler_planilha(options['arquivo'])
+        self.stdout.write(f"✅ {len(df)} linhas lidas")
+
+        validas, erros = validar_linhas(df, *mapa_produtos(), hoje=hoje)
+
+        if options['dry_run']:
+            lotes = montar_lotes(validas, hoje, reservar=False)
+            self.stdout.write(self.style.WARNING(f"🔎 Simulação: {len(lotes)} lotes seriam criados"))
+        else:
+            tamanho = max(options['lote'], 1)
+            with transaction.atomic():
+                lotes = montar_lotes(validas, hoje)
+                Lote.objects.bulk_create(lotes, batch_size=tamanho)
+                produto_ids = validas['produto_id'].unique().tolist()
+                for i in range(0, len(produto_ids), tamanho):
+                    ProdutoEstoqueResumo.recalcular(produto_ids[i:i + tamanho])
+            self.stdout.write(self.style.SUCCESS(f"✅ {len(lotes)} lotes criados"))
+
+        self._relatar_erros(erros, options['relatorio'])
+        self.stdout.write(f"⏱️ {time.monotonic() - inicio:.1f}s")
+
+    def _relatar_erros(self, erros, relatorio):
+        if erros.empty:
+            return
+
+        self.stdout.write(self.style.ERROR(f"❌ {len(erros)} linhas rejeitadas"))
+        if relatorio:
+            erros.to_csv(relatorio, index=False)
+            self.stdout.write(f"📝 Relatório de erros: {relatorio}")
+        else:
+            for erro in erros.head(20).itertuples(index=False):
+                self.stdout.write(f"  - Linha {erro.linha} ({erro.produto}): {erro.erro}")
+            if len(erros) > 20:
+                self.stdout.write("  ... use --relatorio para a lista completa")
@@ -0,0 +1,370 @@
+# productos/management/commands/importar_produtos.py
+import time
+from decimal import Decimal
+
+import pandas as pd
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from openpyxl import Workbook
+
+from fornecedores.models import Fornecedor
+from productos.busca import invalidar_indice
+from productos.importacao import exigir_colunas, ler_planilha, normalizar_nomes
+from productos.models import Categoria, Produto, ProdutoEstoqueResumo
+
+COLUNAS_OBRIGATORIAS = ('nome', 'categoria', 'fornecedor', 'preco_compra', 'preco_venda')
+VALORES_VAZIOS = ('', 'nan', 'null', 'none')
+VALORES_SIM = ('sim', 'true', '1', 'yes', 's')
+
+TIPOS_CATEGORIA = {valor for valor, _rotulo in Categoria._meta.get_field('tipo').choices}
+FORMAS_FARMACEUTICAS = {valor for valor, _rotulo in Produto.FORMA_FARMACEUTICA_CHOICES}
+NIVEIS_PRESCRICAO = {valor for valor, _rotulo in Produto.NIVEL_PRESCRICAO_CHOICES}
+
+# Campos gravados por bulk_update quando o produto já existe
+CAMPOS_ATUALIZADOS = ['fornecedor', 'codigo_barras', 'preco_compra', 'preco_venda', 'preco_carteira']
+# Num produto existente, só mudam quando a planilha traz a coluna e a célula tem um valor
+# válido; senão o produto mantém o que tinha (e não recebe o valor padrão de um produto novo)
+CAMPOS_OPCIONAIS = [
+    'categoria', 'carteiras_por_caixa', 'estoque_minimo', 'forma_farmaceutica', 'dosagem',
+    'nivel_prescricao', 'principio_ativo', 'controlado',
+]
+
+
+class Defeitos:
+    """Problemas encontrados por linha e campo, marcados coluna a coluna"""
+
+    def __init__(self, index):
+        self.index = index
+        self.campos = {}
+        self.erro = pd.Series(pd.NA, index=index, dtype='string')
+
+    def _serie(self, campo):
+        if campo not in self.campos:
+            self.campos[campo] = pd.Series(pd.NA, index=self.index, dtype='string')
+        return self.campos[campo]
+
+    def aviso(self, mascara, campo, mensagem):
+        """Problema não crítico: a linha é importada com o valor padrão"""
+        serie = self._serie(campo)
+        alvo = mascara & serie.isna()
+        serie.loc[alvo] = mensagem[alvo] if isinstance(mensagem, pd.Series) else mensagem
+
+    def rejeitar(self, mascara, campo, mensagem, erro_geral):
+        """Problema crítico: a linha não é importada; vale o primeiro erro geral"""
+        self.aviso(mascara, campo, mensagem)
+        self.erro.loc[mascara & self.erro.isna()] = erro_geral
+
+    @property
+    def aceitas(self):
+        return self.erro.isna()
+
+    def linhas_rejeitadas(self, df):
+        """(linha, produto, erro geral, campos com defeito) de cada linha rejeitada"""
+        for i in self.erro[self.erro.notna()].index:
+            campos = ', '.join(f"{campo}: {serie[i]}" for campo, serie in self.campos.items() if pd.notna(serie[i]))
+            yield df.at[i, 'linha'], df.at[i, 'nome_limpo'] or 'NOME VAZIO/INVÁLIDO', self.erro[i], campos or 'Nenhum'
+
+
+def _texto(df, coluna):
+    """Coluna como texto limpo; '' para células vazias ou ausentes"""
+    if coluna not in df.columns:
+        return pd.Series('', index=df.index, dtype='string')
+    serie = df[coluna].astype('string').fillna('').str.strip()
+    return serie.mask(serie.str.lower().isin(VALORES_VAZIOS), '')
+
+
+def _numero(df, coluna):
+    if coluna not in df.columns:
+        return pd.Series(float('nan'), index=df.index), pd.Series(False, index=df.index)
+    valores = pd.to_numeric(df[coluna], errors='coerce')
+    return valores, df[coluna].notna() & valores.isna()
+
+
+def _informado(df, campo, mascara):
+    """Marca as linhas em que a planilha trouxe um valor válido para o campo opcional"""
+    df[f'informado_{campo}'] = mascara
+
+
+def _indice_por_nome(registros):
+    """{nome normalizado: id}; quando o nome se repete, vale o registro mais antigo"""
+    registros = pd.DataFrame.from_records(registros, columns=['id', 'nome'])
+    registros['chave'] = normalizar_nomes(registros['nome'])
+    return registros.sort_values('id').drop_duplicates('chave').set_index('chave')['id'].to_dict()
+
+
+class Command(BaseCommand):
+    help = 'Importa ou atualiza produtos de um catálogo (xlsx ou csv) em massa'
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', nargs='?', default='produtos.xlsx', help='Planilha com os produtos')
+        parser.add_argument('--dry-run', action='store_true', help='Valida a planilha sem gravar nada')
+        parser.add_argument('--apenas-novos', action='store_true',
+                            help='Rejeita produtos que já existem em vez de atualizá-los')
+        parser.add_argument('--lote', type=int, default=1000, help='Produtos por INSERT/UPDATE')
+        parser.add_argument('--relatorio', default='relatorio_erros_importacao.xlsx',
+                            help='Planilha com as linhas rejeitadas')
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+
+        df = ler_planilha(options['arquivo'], texto=('codigo_barras',))
+        exigir_colunas(df, COLUNAS_OBRIGATORIAS)
+        df['linha'] = df.index + 2  # linha da planilha (cabeçalho na linha 1)
+        self.stdout.write(f"📊 {len(df)} linhas lidas")
+
+        defeitos = Defeitos(df.index)
+        self._validar_nomes(df, defeitos, options['apenas_novos'])
+        self._validar_fornecedores(df, defeitos)
+        self._validar_precos(df, defeitos)
+        self._validar_opcionais(df, defeitos)
+        self._validar_codigos(df, defeitos)
+
+        aceitas = df[defeitos.aceitas]
+        novas_categorias = self._categorias_novas(aceitas)
+
+        if options['dry_run']:
+            novos, atualizados = self._contar(aceitas)
+            self.stdout.write(self.style.WARNING(
+                f"🔎 Simulação: {novos} produtos seriam criados, {atualizados} atualizados "
+                f"e {len(novas_categorias)} categorias criadas"
+            ))
+        else:
+            with transaction.atomic():
+                categorias = self._criar_categorias(novas_categorias)
+                novos, existentes, campos = self._montar_produtos(aceitas, categorias)
+                tamanho = max(options['lote'], 1)
+                Produto.objects.bulk_create(novos, batch_size=tamanho)
+                Produto.objects.bulk_update(existentes, campos, batch_size=tamanho)
+                # Os preços mudaram: valor investido e rendimento do resumo de estoque também
+                produto_ids = [produto.pk for produto in existentes]
+                for i in range(0, len(produto_ids), tamanho):
+                    ProdutoEstoqueResumo.recalcular(produto_ids[i:i + tamanho])
+            # bulk_create/bulk_update não disparam os signals de Produto. Isto só limpa a
+            # cópia deste processo e sobe a versão no cache compartilhado (se houver);
+            # sem ele, os workers web veem a mudança quando a busca expira (productos/busca.py)
+            invalidar_indice()
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {len(novos)} produtos criados, {len(existentes)} atualizados, "
+                f"{len(novas_categorias)} categorias criadas"
+            ))
+
+        rejeitadas = int((~defeitos.aceitas).sum())
+        if rejeitadas:
+            self._gravar_relatorio(df, defeitos, options['relatorio'])
+            self.stdout.write(self.style.ERROR(f"❌ {rejeitadas} linhas rejeitadas"))
+            self.stdout.write(f"💾 Relatório de erros salvo em: '{options['relatorio']}'")
+        self.stdout.write(f"⏱️ {time.monotonic() - inicio:.1f}s")
+
+    # ========== VALIDAÇÃO (coluna a coluna) ==========
+
+    def _validar_nomes(self, df, defeitos, apenas_novos):
+        df['nome_limpo'] = _texto(df, 'nome')
+        df['chave'] = normalizar_nomes(df['nome_limpo'])
+
+        vazio = df['chave'] == ''
+        defeitos.rejeitar(vazio, 'nome', 'Campo vazio ou inválido', 'Nome do produto está vazio ou inválido')
+        defeitos.rejeitar(df['chave'].duplicated(), 'nome', 'Nome repetido na planilha',
+                          'Produto repetido na planilha')
+
+        produtos = _indice_por_nome(Produto.objects.order_by().values_list('id', 'nome'))
+        df['produto_id'] = df['chave'].map(produtos)
+        if apenas_novos:
+            mensagem = 'Produto já existe (ID: ' + df['produto_id'].astype('Int64').astype('string') + ')'
+            defeitos.rejeitar(df['produto_id'].notna(), 'nome', mensagem, 'Produto já existe no sistema')
+
+    def _validar_fornecedores(self, df, defeitos):
+        nomes = _texto(df, 'fornecedor')
+        chaves = normalizar_nomes(nomes)
+        defeitos.rejeitar(chaves == '', 'fornecedor', 'Nome do fornecedor vazio', 'Nome do fornecedor está vazio')
+
+        fornecedores = _indice_por_nome(Fornecedor.objects.order_by().values_list('id', 'nome'))
+        # Nomes sem correspondência exata: procura o fornecedor que contém o nome, uma vez por nome
+        for chave in set(chaves) - set(fornecedores) - {''}:
+            parecido = next((nome for nome in sorted(fornecedores, key=fornecedores.get) if chave in nome), None)
+            if parecido:
+                fornecedores[chave] = fornecedores[parecido]
+
+        df['fornecedor_id'] = chaves.map(fornecedores)
+        mensagem = 'Fornecedor "' + nomes + '" não encontrado no sistema'
+        defeitos.rejeitar(df['fornecedor_id'].isna(), 'fornecedor', mensagem, mensagem)
+
+    def _validar_precos(self, df, defeitos):
+        for campo in ('preco_compra', 'preco_venda'):
+            valores, invalido = _numero(df, campo)
+            original = df[campo].astype('string').fillna('')
+            defeitos.rejeitar(invalido | valores.isna(), campo, 'Erro na conversão. Valor original: ' + original,
+                              'Erro nos campos de preço')
+            valores = valores.round(2)
+            defeitos.rejeitar(valores <= 0, campo, 'Valor inválido: ' + original + '. Deve ser maior que zero',
+                              'Erro nos campos de preço')
+            df[campo] = valores
+
+        # Mesma regra de Produto.clean, que bulk_create/bulk_update não chamam
+        defeitos.rejeitar(df['preco_venda'] < df['preco_compra'], 'relacao_precos',
+                          'Preço de venda menor que o preço de compra', 'Erro nos campos de preço')
+        defeitos.aviso(df['preco_venda'] == df['preco_compra'], 'relacao_precos',
+                       'Preço de venda igual ao preço de compra')
+
+        carteiras, invalido = _numero(df, 'carteiras_por_caixa')
+        ruim = invalido | (carteiras <= 0)
+        defeitos.aviso(ruim, 'carteiras_por_caixa', 'Valor inválido. Usando 1')
+        _informado(df, 'carteiras_por_caixa', carteiras.notna() & ~ruim)
+        df['carteiras_por_caixa'] = carteiras.mask(ruim).fillna(1).astype(int)
+
+        carteira, invalido = _numero(df, 'preco_carteira')
+        carteira = carteira.round(2)
+        ruim = invalido | (carteira <= 0)
+        defeitos.aviso(ruim, 'preco_carteira', 'Valor inválido. Será calculado automaticamente')
+        _informado(df, 'preco_carteira', carteira.notna() & ~ruim)
+        df['preco_carteira'] = carteira.mask(ruim)
+
+    def _validar_opcionais(self, df, defeitos):
+        minimo, invalido = _numero(df, 'estoque_minimo')
+        ruim = invalido | (minimo < 0)
+        defeitos.aviso(ruim, 'estoque_minimo', 'Valor inválido. Usando 10')
+        _informado(df, 'estoque_minimo', minimo.notna() & ~ruim)
+        df['estoque_minimo'] = minimo.mask(ruim).fillna(10).astype(int)
+
+        forma = _texto(df, 'forma_farmaceutica').str.lower()
+        ruim = (forma != '') & ~forma.isin(FORMAS_FARMACEUTICAS)
+        defeitos.aviso(ruim, 'forma_farmaceutica', 'Forma farmacêutica desconhecida: ' + forma)
+        _informado(df, 'forma_farmaceutica', (forma != '') & ~ruim)
+        df['forma_farmaceutica'] = forma.mask(ruim | (forma == ''))
+
+        nivel = _texto(df, 'nivel_prescricao').str.lower()
+        ruim = (nivel != '') & ~nivel.isin(NIVEIS_PRESCRICAO)
+        defeitos.aviso(ruim, 'nivel_prescricao', 'Nível desconhecido: ' + nivel + '. Usando niv0')
+        _informado(df, 'nivel_prescricao', (nivel != '') & ~ruim)
+        df['nivel_prescricao'] = nivel.mask(ruim | (nivel == ''), 'niv0')
+
+        for campo in ('dosagem', 'principio_ativo'):
+            valores = _texto(df, campo)
+            _informado(df, campo, valores != '')
+            df[campo] = valores.mask(valores == '')
+
+        controlado = _texto(df, 'controlado').str.lower().str.replace(r'\.0$', '', regex=True)
+        _informado(df, 'controlado', controlado != '')
+        df['controlado'] = controlado.isin(VALORES_SIM)
+
+        categoria = _texto(df, 'categoria')
+        defeitos.aviso(categoria == '', 'categoria', 'Categoria inválida ou vazia')
+        _informado(df, 'categoria', categoria != '')
+        df['categoria_nome'] = categoria.mask(categoria == '', 'Geral')
+        df['categoria_chave'] = normalizar_nomes(df['categoria_nome'])
+        tipo = _texto(df, 'tipo').str.lower()
+        df['categoria_tipo'] = tipo.where(tipo.isin(TIPOS_CATEGORIA), 'medicamento')
+
+    def _validar_codigos(self, df, defeitos):
+        """Código repetido (no sistema, em outro produto, ou na própria planilha) vira CB_<linha>"""
+        codigo = _texto(df, 'codigo_barras')
+        existentes = dict(
+            Produto.objects.exclude(codigo_barras__isnull=True).exclude(codigo_barras='')
+            .order_by().values_list('codigo_barras', 'id')
+        )
+        dono = codigo.map(existentes)
+        repetido = (codigo != '') & (
+            (dono.notna() & (dono != df['produto_id'])) | (codigo.duplicated() & defeitos.aceitas)
+        )
+        defeitos.aviso(repetido, 'codigo_barras', 'Código de barras duplicado: ' + codigo + '. Gerando novo...')
+        df['codigo_barras'] = codigo.mask(repetido, 'CB_' + df['linha'].map('{:06d}'.format))
+
+    # ========== GRAVAÇÃO ==========
+
+    def _categorias_novas(self, aceitas):
+        self.categorias = _indice_por_nome(Categoria.objects.order_by().values_list('id', 'nome'))
+        # Produto existente sem categoria na planilha mantém a sua: não precisa da 'Geral'
+        usadas = aceitas[aceitas['produto_id'].isna() | aceitas['informado_categoria']]
+        faltando = usadas[~usadas['categoria_chave'].isin(self.categorias)]
+        return faltando.drop_duplicates('categoria_chave')[['categoria_chave', 'categoria_nome', 'categoria_tipo']]
+
+    def _criar_categorias(self, novas):
+        """Cria as categorias que faltam num único INSERT e devolve {chave: id} completo"""
+        if not novas.empty:
+            Categoria.objects.bulk_create([
+                Categoria(nome=nome, tipo=tipo, descricao=f"Categoria para {nome}")
+                for nome, tipo in zip(novas['categoria_nome'], novas['categoria_tipo'])
+            ])
+            criadas = _indice_por_nome(
+                Categoria.objects.filter(nome__in=list(novas['categoria_nome'])).values_list('id', 'nome')
+            )
+            self.categorias = {**criadas, **self.categorias}
+        return self.categorias
+
+    @staticmethod
+    def _contar(aceitas):
+        atualizados = int(aceitas['produto_id'].notna().sum())
+        return len(aceitas) - atualizados, atualizados
+
+    def _montar_produtos(self, aceitas, categorias):
+        """(novos, atualizados, campos): campos é a lista de colunas do bulk_update dos atualizados"""
+        existentes = Produto.objects.in_bulk(aceitas['produto_id'].dropna().astype(int).tolist())
+        novos, atualizados = [], []
+        campos = set(CAMPOS_ATUALIZADOS)
+
+        informados = [f'informado_{campo}' for campo in ['preco_carteira', *CAMPOS_OPCIONAIS]]
+        colunas = ['nome_limpo', 'produto_id', 'categoria_chave', 'fornecedor_id', 'codigo_barras', 'preco_compra',
+                   'preco_venda', 'preco_carteira', 'carteiras_por_caixa', 'estoque_minimo', 'forma_farmaceutica',
+                   'dosagem', 'nivel_prescricao', 'principio_ativo', 'controlado', *informados]
+        # to_dict devolve tipos nativos do Python (o driver do banco não aceita os do numpy)
+        for linha in aceitas[colunas].astype(object).where(aceitas[colunas].notna(), None).to_dict('records'):
+            opcionais = dict(
+                categoria_id=categorias.get(linha['categoria_chave']),
+                carteiras_por_caixa=linha['carteiras_por_caixa'],
+                estoque_minimo=linha['estoque_minimo'],
+                forma_farmaceutica=linha['forma_farmaceutica'],
+                dosagem=linha['dosagem'],
+                nivel_prescricao=linha['nivel_prescricao'],
+                principio_ativo=linha['principio_ativo'],
+                controlado=linha['controlado'],
+            )
+            preco_venda = Decimal(f"{linha['preco_venda']:.2f}")
+            produto = existentes.get(int(linha['produto_id'])) if linha['produto_id'] is not None else None
+
+            if produto is not None:
+                # Só os opcionais que a planilha informou; o resto fica como está no banco
+                informados_linha = [campo for campo in CAMPOS_OPCIONAIS if linha[f'informado_{campo}']]
+                opcionais = {
+                    campo: valor for campo, valor in opcionais.items()
+                    if campo.removesuffix('_id') in informados_linha
+                }
+                campos.update(informados_linha)
+
+            carteiras_por_caixa = opcionais.get('carteiras_por_caixa', produto and produto.carteiras_por_caixa)
+            if linha['informado_preco_carteira']:
+                preco_carteira = Decimal(f"{linha['preco_carteira']:.2f}")
+            elif (
+                produto is not None and produto.preco_carteira
+                and produto.preco_venda == preco_venda and produto.carteiras_por_caixa == carteiras_por_caixa
+            ):
+                # Preço da caixa e carteiras iguais: mantém o preço de carteira já cadastrado
+                preco_carteira = produto.preco_carteira
+            else:
+                preco_carteira = (preco_venda / Decimal(carteiras_por_caixa or 1)).quantize(Decimal('0.01'))
+
+            valores = dict(
+                fornecedor_id=int(linha['fornecedor_id']),
+                preco_compra=Decimal(f"{linha['preco_compra']:.2f}"),
+                preco_venda=preco_venda,
+                preco_carteira=preco_carteira,
+                **opcionais,
+            )
+
+            if produto is None:
+                novos.append(Produto(nome=linha['nome_limpo'], codigo_barras=linha['codigo_barras'] or '', **valores))
+            else:
+                for campo, valor in valores.items():
+                    setattr(produto, campo, valor)
+                # Sem código na planilha, o produto mantém o que já tinha
+                produto.codigo_barras = linha['codigo_barras'] or produto.codigo_barras
+                atualizados.append(produto)
+
+        return novos, atualizados, [campo for campo in [*CAMPOS_ATUALIZADOS, *CAMPOS_OPCIONAIS] if campo in campos]
+
+    def _gravar_relatorio(self, df, defeitos, caminho):
+        """Planilha das linhas rejeitadas, escrita em modo streaming (write_only)"""
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet('Erros')
+        ws.append(['Linha', 'Produto', 'Erro Geral', 'Campos com Defeito'])
+        for linha in defeitos.linhas_rejeitadas(df):
+            ws.append(list(linha))
+        wb.save(caminho)
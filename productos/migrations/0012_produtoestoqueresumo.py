@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-17 15:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0011_lote_data_atualizacao_lote_data_criacao'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='lote',
+            name='numero_lote',
+            field=models.CharField(editable=False, max_length=50),
+        ),
+        migrations.CreateModel(
+            name='ProdutoEstoqueResumo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estoque_valido', models.PositiveIntegerField(default=0)),
+                ('estoque_vencido', models.PositiveIntegerField(default=0)),
+                ('lotes_ativos', models.PositiveIntegerField(default=0)),
+                ('lotes_vencidos', models.PositiveIntegerField(default=0)),
+                ('validade_proxima', models.DateField(blank=True, null=True)),
+                ('valor_investido', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('rendimento_potencial', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('prejuizo_vencido', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('data_referencia', models.DateField(db_index=True, default=django.utils.timezone.localdate)),
+                ('data_atualizacao', models.DateTimeField(auto_now=True)),
+                ('produto', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='resumo_estoque', to='productos.produto')),
+            ],
+            options={
+                'verbose_name': 'Resumo de Estoque',
+                'verbose_name_plural': 'Resumos de Estoque',
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 15:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0012_produtoestoqueresumo'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='produto',
+            index=models.Index(fields=['nome', 'id'], name='produto_nome_id_idx'),
+        ),
+    ]
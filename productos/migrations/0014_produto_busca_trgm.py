@@ -0,0 +1,38 @@
+from django.db import migrations
+
+# Índices de trigramas para a busca de produtos do PDV. As expressões seguem o SQL que o
+# Django gera para __icontains no PostgreSQL: UPPER("coluna"::text) LIKE UPPER('%termo%').
+INDICES = [
+    ('produto_nome_trgm_idx', 'nome'),
+    ('produto_principio_ativo_trgm_idx', 'principio_ativo'),
+    ('produto_codigo_barras_trgm_idx', 'codigo_barras'),
+]
+
+
+def criar_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for nome, coluna in INDICES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {nome} ON productos_produto '
+            f'USING gin (UPPER({coluna}::text) gin_trgm_ops)'
+        )
+
+
+def remover_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for nome, _coluna in INDICES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {nome}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0013_produto_nome_id_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_indices, remover_indices),
+    ]
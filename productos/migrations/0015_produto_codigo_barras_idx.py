@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 15:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0014_produto_busca_trgm'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='produto',
+            name='codigo_barras',
+            field=models.CharField(blank=True, db_index=True, max_length=50, null=True),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 4.2.7 on 2026-10-17 15:55
+
+import re
+
+from django.db import migrations, models
+
+
+def numerar_lotes_existentes(apps, schema_editor):
+    """
+    Semeia LoteSequencia com o maior número já usado em cada prefixo/mês e
+    renumera os lotes com número repetido, para a restrição unique entrar.
+    """
+    Lote = apps.get_model('productos', 'Lote')
+    LoteSequencia = apps.get_model('productos', 'LoteSequencia')
+
+    lotes = list(Lote.objects.order_by('id').values_list('id', 'numero_lote', 'produto__nome', 'data_criacao'))
+
+    ultimos = {}
+    for _id, numero, nome, _criacao in lotes:
+        prefixo = (nome or '')[:3].upper()
+        encontrado = re.fullmatch(re.escape(prefixo) + r'(\d{6})(\d+)LT', numero or '')
+        if encontrado:
+            chave = prefixo + encontrado.group(1)
+            ultimos[chave] = max(ultimos.get(chave, 0), int(encontrado.group(2)))
+
+    usados = set()
+    for lote_id, numero, nome, criacao in lotes:
+        if numero and numero not in usados:
+            usados.add(numero)
+            continue
+        chave = f"{(nome or '')[:3].upper()}{criacao:%Y%m}"
+        while True:
+            ultimos[chave] = ultimos.get(chave, 0) + 1
+            novo = f"{chave}{ultimos[chave]:02d}LT"
+            if novo not in usados:
+                break
+        usados.add(novo)
+        Lote.objects.filter(pk=lote_id).update(numero_lote=novo)
+
+    LoteSequencia.objects.bulk_create(
+        [LoteSequencia(prefixo=prefixo, ultimo=ultimo) for prefixo, ultimo in ultimos.items()]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0015_produto_codigo_barras_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoteSequencia',
+            fields=[
+                ('prefixo', models.CharField(max_length=20, primary_key=True, serialize=False)),
+                ('ultimo', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Sequência de Lotes',
+                'verbose_name_plural': 'Sequências de Lotes',
+            },
+        ),
+        migrations.RunPython(numerar_lotes_existentes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='lote',
+            name='numero_lote',
+            field=models.CharField(editable=False, max_length=50, unique=True),
+        ),
+    ]
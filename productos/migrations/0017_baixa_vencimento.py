@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-17 15:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0016_lote_sequencia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BaixaVencimento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('numero_lote', models.CharField(max_length=50)),
+                ('data_validade', models.DateField()),
+                ('unidades', models.PositiveIntegerField()),
+                ('nr_caixas', models.PositiveIntegerField(default=0)),
+                ('nr_carteiras', models.PositiveIntegerField(default=0)),
+                ('custo', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('data_baixa', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('lote', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='baixas_vencimento', to='productos.lote')),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='baixas_vencimento', to='productos.produto')),
+            ],
+            options={
+                'verbose_name': 'Baixa por Vencimento',
+                'verbose_name_plural': 'Baixas por Vencimento',
+                'ordering': ['-data_baixa'],
+            },
+        ),
+    ]
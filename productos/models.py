@@ -1,10 +1,9 @@
-import os
-
-from django.db.models import Sum, F
+from django.db.models import Sum, F, Q, Count, Min, DecimalField, ExpressionWrapper, Value
+from django.db.models.functions import Coalesce, NullIf, Round
 from decimal import Decimal, ROUND_HALF_UP
 from fornecedores.models import Fornecedor
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import connection, models, transaction
 from django.utils import timezone
 
 
@@ -33,11 +32,87 @@ class Categoria(models.Model):
         verbose_name_plural = "Categorias"
         ordering = ['nome']
 
+class ProdutoQuerySet(models.QuerySet):
+    def com_estoque(self):
+        """
+        Anota as métricas de estoque numa única consulta agregada sobre os lotes.
+        As propriedades do Produto usam os valores *_anotado quando presentes.
+        """
+        hoje = timezone.localdate()
+        com_estoque = Q(lote__quantidade_disponivel__gt=0)
+        valido = com_estoque & Q(lote__data_validade__gt=hoje)
+        vencido = com_estoque & Q(lote__data_validade__lte=hoje)
+        dinheiro = DecimalField(max_digits=14, decimal_places=2)
+
+        caixas_validas = Coalesce(Sum('lote__nr_caixas', filter=valido), 0)
+        carteiras_validas = Coalesce(Sum('lote__nr_carteiras', filter=valido), 0)
+        caixas_vencidas = Coalesce(Sum('lote__nr_caixas', filter=vencido), 0)
+        # Mesmo valor de preco_carteira_calculado: arredondado a 0.01 antes de multiplicar
+        preco_carteira = Coalesce(
+            NullIf(F('preco_carteira'), 0),
+            Round(
+                ExpressionWrapper(F('preco_venda') / NullIf(F('carteiras_por_caixa'), 0), output_field=dinheiro),
+                2,
+                output_field=dinheiro,
+            ),
+            Value(0),
+            output_field=dinheiro,
+        )
+
+        return self.annotate(
+            estoque_valido_anotado=Coalesce(Sum('lote__quantidade_disponivel', filter=valido), 0),
+            estoque_vencido_anotado=Coalesce(Sum('lote__quantidade_disponivel', filter=vencido), 0),
+            lotes_ativos_anotado=Count('lote', filter=valido),
+            lotes_vencidos_anotado=Count('lote', filter=vencido),
+            validade_proxima_anotado=Min('lote__data_validade', filter=valido),
+            valor_investido_anotado=ExpressionWrapper(
+                caixas_validas * F('preco_compra'), output_field=dinheiro
+            ),
+            rendimento_potencial_anotado=ExpressionWrapper(
+                caixas_validas * F('preco_venda') + carteiras_validas * preco_carteira,
+                output_field=dinheiro,
+            ),
+            prejuizo_vencido_anotado=ExpressionWrapper(
+                caixas_vencidas * F('preco_compra'), output_field=dinheiro
+            ),
+        )
+
+
+    def com_disponibilidade(self):
+        """
+        Versão enxuta de com_estoque(): só estoque válido, estoque vencido e validade
+        mais próxima, o bastante para estoque_disponivel, tem_vencido e alerta_validade.
+        """
+        hoje = timezone.localdate()
+        com_estoque = Q(lote__quantidade_disponivel__gt=0)
+        valido = com_estoque & Q(lote__data_validade__gt=hoje)
+        vencido = com_estoque & Q(lote__data_validade__lte=hoje)
+
+        return self.annotate(
+            estoque_valido_anotado=Coalesce(Sum('lote__quantidade_disponivel', filter=valido), 0),
+            estoque_vencido_anotado=Coalesce(Sum('lote__quantidade_disponivel', filter=vencido), 0),
+            validade_proxima_anotado=Min('lote__data_validade', filter=valido),
+        )
+
+    def por_status(self, status):
+        """Filtra pelo status de estoque (esgotado/baixo/ok) no SQL; requer com_estoque()"""
+        if status == "esgotado":
+            return self.filter(estoque_valido_anotado=0)
+        if status == "baixo":
+            return self.filter(
+                estoque_valido_anotado__gt=0,
+                estoque_valido_anotado__lte=F('estoque_minimo')
+            )
+        if status == "ok":
+            return self.filter(estoque_valido_anotado__gt=F('estoque_minimo'))
+        return self
+
+
 class Produto(models.Model):
     nome = models.CharField(max_length=100)
     categoria = models.ForeignKey(Categoria, on_delete=models.SET_NULL, null=True)
     fornecedor = models.ForeignKey(Fornecedor, on_delete=models.SET_NULL, null=True)
-    codigo_barras = models.CharField(max_length=50, unique=False, null=True, blank=True)
+    codigo_barras = models.CharField(max_length=50, unique=False, null=True, blank=True, db_index=True)
 
     preco_compra = models.DecimalField(max_digits=10, decimal_places=2)
     preco_venda = models.DecimalField(max_digits=10, decimal_places=2)
@@ -81,6 +156,8 @@ class Produto(models.Model):
     principio_ativo = models.CharField(max_length=100, blank=True, null=True)
     controlado = models.BooleanField(default=False)
 
+    objects = ProdutoQuerySet.as_manager()
+
     def __str__(self):
         return f'{self.nome} - {self.codigo_barras or "sem código"}'
 
@@ -88,18 +165,42 @@ class Produto(models.Model):
         verbose_name = "Produto"
         verbose_name_plural = "Produtos"
         ordering = ['nome']
+        indexes = [
+            # Paginação por chave (nome, id) em productos_list
+            models.Index(fields=['nome', 'id'], name='produto_nome_id_idx'),
+        ]
 
     # ============================================
     # PROPRIEDADES DE ESTOQUE (APENAS LOTES NÃO VENCIDOS)
     # ============================================
 
+    @property
+    def resumo(self):
+        """Resumo de estoque do dia; recalcula se estiver ausente ou desatualizado"""
+        if not self.pk:
+            return ProdutoEstoqueResumo()
+
+        try:
+            resumo = self.resumo_estoque
+        except ProdutoEstoqueResumo.DoesNotExist:
+            resumo = None
+
+        if resumo is None or resumo.data_referencia != timezone.localdate():
+            resumo = ProdutoEstoqueResumo.recalcular([self.pk])[self.pk]
+            self.resumo_estoque = resumo
+        return resumo
+
+    def _metrica_estoque(self, campo):
+        """Valor anotado por com_estoque(); senão, o do resumo de estoque"""
+        anotado = f'{campo}_anotado'
+        if anotado in self.__dict__:
+            return self.__dict__[anotado]
+        return getattr(self.resumo, campo)
+
     @property
     def estoque_disponivel(self):
         """Retorna apenas o estoque de lotes não vencidos (para vendas)"""
-        return self.lote_set.filter(
-            quantidade_disponivel__gt=0,
-            data_validade__gt=timezone.now().date()
-        ).aggregate(total=Sum('quantidade_disponivel'))['total'] or 0
+        return self._metrica_estoque('estoque_valido')
 
     @property
     def tem_estoque(self):
@@ -109,28 +210,17 @@ class Produto(models.Model):
     @property
     def lotes_ativos(self):
         """Retorna quantos lotes NÃO VENCIDOS ainda têm estoque."""
-        return self.lote_set.filter(
-            quantidade_disponivel__gt=0,
-            data_validade__gt=timezone.now().date()
-        ).count()
+        return self._metrica_estoque('lotes_ativos')
 
     @property
     def valor_investido(self):
         """Soma do valor de custo de todos os lotes NÃO VENCIDOS."""
-        lotes_validos = self.lote_set.filter(
-            quantidade_disponivel__gt=0,
-            data_validade__gt=timezone.now().date()
-        )
-        return sum(lote.valor_investido for lote in lotes_validos)
+        return self._metrica_estoque('valor_investido')
 
     @property
     def rendimento_potencial(self):
         """Soma do valor de venda de todos os lotes NÃO VENCIDOS."""
-        lotes_validos = self.lote_set.filter(
-            quantidade_disponivel__gt=0,
-            data_validade__gt=timezone.now().date()
-        )
-        return sum(lote.rendimento_potencial for lote in lotes_validos)
+        return self._metrica_estoque('rendimento_potencial')
 
     @property
     def estoque_em_caixas_carteiras(self):
@@ -156,12 +246,7 @@ class Produto(models.Model):
     @property
     def validade_proxima(self):
         """Data de validade mais próxima entre lotes NÃO VENCIDOS"""
-        lote = self.lote_set.filter(
-            quantidade_disponivel__gt=0,
-            data_validade__gt=timezone.now().date()
-        ).order_by("data_validade").first()
-
-        return lote.data_validade if lote else None
+        return self._metrica_estoque('validade_proxima')
 
     @property
     def dias_ate_validade(self):
@@ -186,35 +271,22 @@ class Produto(models.Model):
     @property
     def estoque_vencido(self):
         """Retorna o estoque de lotes vencidos (apenas para informação gerencial)"""
-        return self.lote_set.filter(
-            quantidade_disponivel__gt=0,
-            data_validade__lte=timezone.now().date()
-        ).aggregate(total=Sum('quantidade_disponivel'))['total'] or 0
+        return self._metrica_estoque('estoque_vencido')
 
     @property
     def tem_vencido(self):
         """Verifica se há lotes vencidos com estoque (para alertas)"""
-        return self.lote_set.filter(
-            quantidade_disponivel__gt=0,
-            data_validade__lte=timezone.now().date()
-        ).exists()
+        return self.estoque_vencido > 0
 
     @property
     def lotes_vencidos(self):
         """Retorna quantos lotes vencidos ainda têm estoque."""
-        return self.lote_set.filter(
-            quantidade_disponivel__gt=0,
-            data_validade__lte=timezone.now().date()
-        ).count()
+        return self._metrica_estoque('lotes_vencidos')
 
     @property
     def prejuizo_vencido(self):
         """Valor investido em lotes vencidos (prejuízo)"""
-        lotes_vencidos = self.lote_set.filter(
-            quantidade_disponivel__gt=0,
-            data_validade__lte=timezone.now().date()
-        )
-        return sum(lote.valor_investido for lote in lotes_vencidos)
+        return self._metrica_estoque('prejuizo_vencido')
 
     # ============================================
     # PROPRIEDADES DE PREÇO
@@ -234,6 +306,14 @@ class Produto(models.Model):
 
         return Decimal('0.00')
 
+    def custo_por_unidade(self, unidade):
+        """Custo de compra de uma caixa ou de uma carteira (preço da caixa / carteiras por caixa)"""
+        preco_compra = Decimal(str(self.preco_compra or 0))
+        if unidade == "caixa":
+            return preco_compra
+        carteiras = Decimal(self.carteiras_por_caixa or 1)
+        return (preco_compra / carteiras).quantize(Decimal("0.0001"), rounding=ROUND_HALF_UP)
+
     @property
     def margem_lucro_percentual(self):
         """Retorna a margem de lucro percentual"""
@@ -277,12 +357,15 @@ class Produto(models.Model):
 
         super().save(*args, **kwargs)
 
+        # Preços entram no valor investido / rendimento do resumo
+        self.resumo_estoque = ProdutoEstoqueResumo.recalcular([self.pk])[self.pk]
+
 
 
 
 class Lote(models.Model):
     produto = models.ForeignKey(Produto, on_delete=models.CASCADE)
-    numero_lote = models.CharField(max_length=50, editable=False)  # impede edição manual
+    numero_lote = models.CharField(max_length=50, editable=False, unique=True)  # impede edição manual
     nr_caixas = models.PositiveIntegerField(default=0)
     nr_carteiras = models.PositiveIntegerField(default=0)
     quantidade_disponivel = models.PositiveIntegerField(default=0)
@@ -334,16 +417,22 @@ class Lote(models.Model):
         preco_carteira = self.produto.preco_carteira_calculado or 0
         return (self.nr_caixas * preco_caixa) + (self.nr_carteiras * preco_carteira)
 
+    @staticmethod
+    def prefixo_numero(nome_produto, data=None):
+        """Prefixo do produto + ano/mês, a chave da sequência em LoteSequencia. Ex: PAR202512"""
+        data = data or timezone.now().date()
+        return f"{nome_produto[:3].upper()}{data:%Y%m}"  # Ex: Paracetamol → PAR
+
+    @staticmethod
+    def formatar_numero(prefixo, sequencia):
+        """Número do lote: prefixo + sequência. Ex: PAR20251201LT"""
+        return f"{prefixo}{sequencia:02d}LT"
+
     def save(self, *args, **kwargs):
         # GERAR O NÚMERO DO LOTE AUTOMATICAMENTE NA CRIAÇÃO
         if not self.pk:
-            prefixo = self.produto.nome[:3].upper()  # Ex: Paracetamol → PA
-            hoje = timezone.now().date()
-            ano = hoje.strftime("%Y")
-            mes = hoje.strftime("%m")
-            total_lotes = Lote.objects.filter(produto=self.produto).count() + 1
-            sequencia = f"{total_lotes:02d}"
-            self.numero_lote = f"{prefixo}{ano}{mes}{sequencia}LT"  # Ex: PA20251201LT
+            prefixo = Lote.prefixo_numero(self.produto.nome)
+            self.numero_lote = Lote.formatar_numero(prefixo, LoteSequencia.reservar(prefixo))
 
         # validações
         self.clean()
@@ -354,6 +443,16 @@ class Lote(models.Model):
                                                                    1)) + self.nr_carteiras
 
         super().save(*args, **kwargs)
+        self.atualizar_resumo()
+
+    def delete(self, *args, **kwargs):
+        resultado = super().delete(*args, **kwargs)
+        self.atualizar_resumo()
+        return resultado
+
+    def atualizar_resumo(self):
+        """Recalcula o resumo de estoque do produto deste lote"""
+        self.produto.resumo_estoque = ProdutoEstoqueResumo.recalcular([self.produto_id])[self.produto_id]
 
     def converter_para_caixas_carteiras(self, unidades):
         carteiras_por_caixa = self.produto.carteiras_por_caixa or 1
@@ -389,3 +488,163 @@ class Lote(models.Model):
             'data_atualizacao'
         ])
         return True
+
+
+class LoteSequencia(models.Model):
+    """
+    Último número de lote usado por prefixo (3 letras do produto + ano/mês).
+    reservar() incrementa a linha num único comando atômico, sem COUNT sobre os
+    lotes e sem números repetidos quando dois lotes são cadastrados ao mesmo tempo.
+    """
+    prefixo = models.CharField(max_length=20, primary_key=True)
+    ultimo = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Sequência de Lotes"
+        verbose_name_plural = "Sequências de Lotes"
+
+    def __str__(self):
+        return f"{self.prefixo}: {self.ultimo}"
+
+    @classmethod
+    def reservar(cls, prefixo, quantidade=1):
+        """
+        Reserva `quantidade` números consecutivos do prefixo e devolve o primeiro.
+        Importações em massa pedem o bloco inteiro de uma vez.
+        """
+        if connection.features.can_return_columns_from_insert:
+            tabela = connection.ops.quote_name(cls._meta.db_table)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"INSERT INTO {tabela} (prefixo, ultimo) VALUES (%s, %s) "
+                    f"ON CONFLICT (prefixo) DO UPDATE SET ultimo = {tabela}.ultimo + EXCLUDED.ultimo "
+                    f"RETURNING ultimo",
+                    [prefixo, quantidade],
+                )
+                ultimo = cursor.fetchone()[0]
+        else:
+            with transaction.atomic():
+                cls.objects.get_or_create(prefixo=prefixo)
+                sequencia = cls.objects.select_for_update().get(prefixo=prefixo)
+                sequencia.ultimo += quantidade
+                sequencia.save(update_fields=['ultimo'])
+                ultimo = sequencia.ultimo
+        return ultimo - quantidade + 1
+
+
+class BaixaVencimento(models.Model):
+    """
+    Registro de auditoria de cada lote vencido retirado do estoque pelo comando
+    limpar_lotes_vencidos: quanto saiu e quanto custou (base dos relatórios de perda).
+    """
+    lote = models.ForeignKey(Lote, on_delete=models.SET_NULL, null=True, related_name='baixas_vencimento')
+    produto = models.ForeignKey(Produto, on_delete=models.CASCADE, related_name='baixas_vencimento')
+    numero_lote = models.CharField(max_length=50)
+    data_validade = models.DateField()
+    unidades = models.PositiveIntegerField()  # carteiras
+    nr_caixas = models.PositiveIntegerField(default=0)
+    nr_carteiras = models.PositiveIntegerField(default=0)
+    custo = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    data_baixa = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        verbose_name = "Baixa por Vencimento"
+        verbose_name_plural = "Baixas por Vencimento"
+        ordering = ['-data_baixa']
+
+    def __str__(self):
+        return f"Baixa {self.numero_lote} - {self.unidades} un. ({self.data_baixa:%d/%m/%Y})"
+
+
+class ProdutoEstoqueResumo(models.Model):
+    """
+    Resumo desnormalizado do estoque de cada produto (uma linha por produto).
+    Mantido por Lote.save/delete e pelo comando atualizar_resumo_estoque,
+    que roda de madrugada para os lotes que venceram na virada do dia.
+    """
+    produto = models.OneToOneField(Produto, on_delete=models.CASCADE, related_name='resumo_estoque')
+
+    estoque_valido = models.PositiveIntegerField(default=0)
+    estoque_vencido = models.PositiveIntegerField(default=0)
+    lotes_ativos = models.PositiveIntegerField(default=0)
+    lotes_vencidos = models.PositiveIntegerField(default=0)
+    validade_proxima = models.DateField(null=True, blank=True)
+
+    valor_investido = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    rendimento_potencial = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    prejuizo_vencido = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    # Dia em que "válido"/"vencido" foi avaliado
+    data_referencia = models.DateField(default=timezone.localdate, db_index=True)
+    data_atualizacao = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Resumo de Estoque"
+        verbose_name_plural = "Resumos de Estoque"
+
+    def __str__(self):
+        return f"Resumo {self.produto_id} - {self.estoque_valido} un. ({self.data_referencia})"
+
+    @classmethod
+    def recalcular(cls, produto_ids):
+        """
+        Recalcula o resumo dos produtos informados com uma única agregação
+        sobre os lotes e grava tudo num só upsert. Retorna {produto_id: resumo}.
+        """
+        produto_ids = set(produto_ids)
+        if not produto_ids:
+            return {}
+
+        hoje = timezone.localdate()
+        valido = Q(data_validade__gt=hoje)
+        vencido = Q(data_validade__lte=hoje)
+
+        agregados = {
+            linha['produto_id']: linha
+            for linha in Lote.objects.filter(
+                produto_id__in=produto_ids,
+                quantidade_disponivel__gt=0
+            ).order_by().values('produto_id').annotate(
+                estoque_valido=Sum('quantidade_disponivel', filter=valido),
+                estoque_vencido=Sum('quantidade_disponivel', filter=vencido),
+                lotes_ativos=Count('id', filter=valido),
+                lotes_vencidos=Count('id', filter=vencido),
+                validade_proxima=Min('data_validade', filter=valido),
+                caixas_validas=Sum('nr_caixas', filter=valido),
+                carteiras_validas=Sum('nr_carteiras', filter=valido),
+                caixas_vencidas=Sum('nr_caixas', filter=vencido),
+            )
+        }
+
+        resumos = []
+        for produto in Produto.objects.filter(pk__in=produto_ids):
+            linha = agregados.get(produto.pk, {})
+            preco_carteira = produto.preco_carteira_calculado or 0
+
+            resumos.append(cls(
+                produto=produto,
+                estoque_valido=linha.get('estoque_valido') or 0,
+                estoque_vencido=linha.get('estoque_vencido') or 0,
+                lotes_ativos=linha.get('lotes_ativos') or 0,
+                lotes_vencidos=linha.get('lotes_vencidos') or 0,
+                validade_proxima=linha.get('validade_proxima'),
+                valor_investido=(linha.get('caixas_validas') or 0) * produto.preco_compra,
+                rendimento_potencial=(
+                    (linha.get('caixas_validas') or 0) * produto.preco_venda
+                    + (linha.get('carteiras_validas') or 0) * preco_carteira
+                ),
+                prejuizo_vencido=(linha.get('caixas_vencidas') or 0) * produto.preco_compra,
+                data_referencia=hoje,
+            ))
+
+        cls.objects.bulk_create(
+            resumos,
+            update_conflicts=True,
+            unique_fields=['produto'],
+            update_fields=[
+                'estoque_valido', 'estoque_vencido', 'lotes_ativos', 'lotes_vencidos',
+                'validade_proxima', 'valor_investido', 'rendimento_potencial',
+                'prejuizo_vencido', 'data_referencia', 'data_atualizacao',
+            ],
+        )
+        return {resumo.produto_id: resumo for resumo in resumos}
@@ -0,0 +1,13 @@
+# productos/signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .busca import invalidar_indice
+from .models import Produto
+
+
+@receiver(post_save, sender=Produto)
+@receiver(post_delete, sender=Produto)
+def invalidar_indice_busca(sender, **kwargs):
+    """Descarta o índice de busca e o cache de códigos de barras quando um produto muda"""
+    invalidar_indice()
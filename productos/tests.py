@@ -1,3 +1,215 @@
+import csv
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.utils import timezone
+
+from fornecedores.models import Fornecedor
+from .models import Categoria, Lote, LoteSequencia, Produto, ProdutoEstoqueResumo
+
+
+class PlanilhaTemporariaMixin:
+    """Grava planilhas CSV de teste numa pasta temporária apagada no fim do teste"""
+
+    def setUp(self):
+        super().setUp()
+        self.pasta = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.pasta)
+
+    def planilha(self, linhas, nome='planilha.csv'):
+        caminho = self.pasta / nome
+        with open(caminho, 'w', newline='', encoding='utf-8') as arquivo:
+            escritor = csv.DictWriter(arquivo, fieldnames=list(linhas[0]))
+            escritor.writeheader()
+            escritor.writerows(linhas)
+        return str(caminho)
+
+
+class LoteSequenciaTests(TestCase):
+    """Numeração de lotes por prefixo (LoteSequencia.reservar)"""
+
+    def test_numeros_consecutivos_por_prefixo(self):
+        self.assertEqual([LoteSequencia.reservar('PAR202601') for _ in range(5)], [1, 2, 3, 4, 5])
+        # Outro prefixo tem a própria sequência
+        self.assertEqual(LoteSequencia.reservar('IBU202601'), 1)
+        self.assertEqual(LoteSequencia.objects.get(prefixo='PAR202601').ultimo, 5)
+
+    def test_reserva_em_bloco(self):
+        self.assertEqual(LoteSequencia.reservar('AMO202601', quantidade=10), 1)
+        self.assertEqual(LoteSequencia.reservar('AMO202601', quantidade=3), 11)
+        self.assertEqual(LoteSequencia.reservar('AMO202601'), 14)
+
+    def test_sem_returning_usa_select_for_update(self):
+        with mock.patch.object(connection.features, 'can_return_columns_from_insert', False):
+            numeros = [LoteSequencia.reservar('DIP202601') for _ in range(3)]
+            numeros.append(LoteSequencia.reservar('DIP202601', quantidade=4))
+        self.assertEqual(numeros, [1, 2, 3, 4])
+        self.assertEqual(LoteSequencia.reservar('DIP202601'), 8)
+
+    def test_lotes_recebem_numeros_unicos(self):
+        produto = Produto.objects.create(
+            nome='Paracetamol 500mg', preco_compra=Decimal('50.00'), preco_venda=Decimal('80.00'),
+        )
+        validade = timezone.localdate() + timedelta(days=365)
+        numeros = [
+            Lote.objects.create(produto=produto, nr_carteiras=1, data_validade=validade).numero_lote
+            for _ in range(12)
+        ]
+
+        prefixo = Lote.prefixo_numero(produto.nome)
+        self.assertEqual(len(set(numeros)), 12)
+        self.assertEqual(numeros[0], f'{prefixo}01LT')
+        self.assertEqual(numeros[-1], f'{prefixo}12LT')
+
+
+class ImportarProdutosTests(PlanilhaTemporariaMixin, TestCase):
+    """Reimportação de catálogo pelo comando importar_produtos"""
+
+    def setUp(self):
+        super().setUp()
+        self.fornecedor = Fornecedor.objects.create(
+            nome='Distribuidora Central', pessoa_de_contacto='Ana', nuit='400100200',
+            telefone='840000000', endereco='Maputo', status=True,
+        )
+        self.categoria = Categoria.objects.create(nome='Analgésicos')
+        self.produto = Produto.objects.create(
+            nome='Paracetamol 500mg', categoria=self.categoria, fornecedor=self.fornecedor,
+            preco_compra=Decimal('50.00'), preco_venda=Decimal('80.00'), preco_carteira=Decimal('9.00'),
+            carteiras_por_caixa=10, estoque_minimo=25, forma_farmaceutica='comprimido', dosagem='500mg',
+            nivel_prescricao='niv2', principio_ativo='Paracetamol', controlado=True,
+        )
+
+    def importar(self, **colunas):
+        linha = {
+            'nome': 'Paracetamol 500mg', 'categoria': 'Analgésicos', 'fornecedor': 'Distribuidora Central',
+            'preco_compra': '55.00', 'preco_venda': '80.00', **colunas,
+        }
+        call_command('importar_produtos', self.planilha([linha]), relatorio=str(self.pasta / 'erros.xlsx'),
+                     stdout=StringIO())
+        self.produto.refresh_from_db()
+
+    def test_colunas_opcionais_ausentes_mantem_os_valores(self):
+        self.importar()
+
+        self.assertEqual(self.produto.preco_compra, Decimal('55.00'))
+        self.assertEqual(self.produto.carteiras_por_caixa, 10)
+        self.assertEqual(self.produto.estoque_minimo, 25)
+        self.assertEqual(self.produto.forma_farmaceutica, 'comprimido')
+        self.assertEqual(self.produto.dosagem, '500mg')
+        self.assertEqual(self.produto.nivel_prescricao, 'niv2')
+        self.assertEqual(self.produto.principio_ativo, 'Paracetamol')
+        self.assertTrue(self.produto.controlado)
+        # Preço da caixa e carteiras iguais: o preço de carteira cadastrado fica
+        self.assertEqual(self.produto.preco_carteira, Decimal('9.00'))
+
+    def test_celulas_vazias_mantem_os_valores(self):
+        self.importar(categoria='', dosagem='', nivel_prescricao='', estoque_minimo='', controlado='')
+
+        self.assertEqual(self.produto.categoria, self.categoria)
+        self.assertEqual(self.produto.dosagem, '500mg')
+        self.assertEqual(self.produto.nivel_prescricao, 'niv2')
+        self.assertEqual(self.produto.estoque_minimo, 25)
+        self.assertTrue(self.produto.controlado)
+        self.assertFalse(Categoria.objects.filter(nome='Geral').exists())
+
+    def test_colunas_informadas_atualizam(self):
+        self.importar(dosagem='1g', nivel_prescricao='niv1', carteiras_por_caixa='20', controlado='nao')
+
+        self.assertEqual(self.produto.dosagem, '1g')
+        self.assertEqual(self.produto.nivel_prescricao, 'niv1')
+        self.assertEqual(self.produto.carteiras_por_caixa, 20)
+        self.assertFalse(self.produto.controlado)
+        self.assertEqual(self.produto.principio_ativo, 'Paracetamol')
+        # Carteiras mudaram: o preço de carteira é recalculado
+        self.assertEqual(self.produto.preco_carteira, Decimal('4.00'))
+
+
+class ImportarLotesTests(PlanilhaTemporariaMixin, TestCase):
+    """Importação de lotes em massa pelo comando importar_lotes"""
+
+    def setUp(self):
+        super().setUp()
+        self.paracetamol = Produto.objects.create(
+            nome='Paracetamol 500mg', preco_compra=Decimal('50.00'), preco_venda=Decimal('80.00'),
+            carteiras_por_caixa=10,
+        )
+        self.ibuprofeno = Produto.objects.create(
+            nome='Ibuprofeno 400mg', preco_compra=Decimal('60.00'), preco_venda=Decimal('90.00'),
+            carteiras_por_caixa=5,
+        )
+        self.hoje = timezone.now().date()
+        self.validade = f'{self.hoje + timedelta(days=365):%d/%m/%Y}'
+
+    def linha(self, produto='Paracetamol 500mg', **colunas):
+        return {
+            'produto': produto, 'data_validade': self.validade, 'data_fabricacao': '',
+            'nr_caixas': '1', 'nr_carteiras': '0', **colunas,
+        }
+
+    def importar(self, linhas, **opcoes):
+        saida = StringIO()
+        call_command('importar_lotes', self.planilha(linhas), stdout=saida, **opcoes)
+        return saida.getvalue()
+
+    def test_linhas_invalidas_vao_para_o_relatorio(self):
+        ontem = f'{self.hoje - timedelta(days=1):%d/%m/%Y}'
+        relatorio = self.pasta / 'erros.csv'
+        self.importar([
+            self.linha(nr_caixas='2', nr_carteiras='3'),
+            self.linha('Dipirona 1g'),
+            self.linha(data_validade='31/02/2030'),
+            self.linha(data_validade=ontem),
+            self.linha(nr_caixas='-1'),
+            self.linha(nr_carteiras='1.5'),
+            self.linha(data_fabricacao=self.validade),
+        ], relatorio=str(relatorio))
+
+        lote = Lote.objects.get()
+        self.assertEqual(lote.produto, self.paracetamol)
+        self.assertEqual((lote.nr_caixas, lote.nr_carteiras, lote.quantidade_disponivel), (2, 3, 23))
+        self.assertEqual(ProdutoEstoqueResumo.objects.get(produto=self.paracetamol).estoque_valido, 23)
+
+        with open(relatorio, newline='', encoding='utf-8') as arquivo:
+            erros = {int(linha['linha']): linha['erro'] for linha in csv.DictReader(arquivo)}
+        self.assertEqual(erros, {
+            3: 'Produto não encontrado',
+            4: 'Data de validade inválida',
+            5: 'Data de validade não pode ser no passado',
+            6: 'nr_caixas deve ser um número inteiro não negativo',
+            7: 'nr_carteiras deve ser um número inteiro não negativo',
+            8: 'Data de validade deve ser posterior à data de fabricação',
+        })
+
+    def test_numeros_reservados_em_bloco_por_prefixo(self):
+        prefixo = Lote.prefixo_numero(self.paracetamol.nome, self.hoje)
+        LoteSequencia.reservar(prefixo, quantidade=2)
+
+        self.importar([self.linha(), self.linha('Ibuprofeno 400mg'), self.linha(), self.linha()])
+
+        numeros = list(
+            Lote.objects.filter(produto=self.paracetamol).order_by('pk').values_list('numero_lote', flat=True)
+        )
+        self.assertEqual(numeros, [f'{prefixo}03LT', f'{prefixo}04LT', f'{prefixo}05LT'])
+        self.assertEqual(LoteSequencia.objects.get(prefixo=prefixo).ultimo, 5)
+
+        prefixo_ibu = Lote.prefixo_numero(self.ibuprofeno.nome, self.hoje)
+        self.assertEqual(Lote.objects.get(produto=self.ibuprofeno).numero_lote, f'{prefixo_ibu}01LT')
+        # Lotes criados depois continuam a sequência
+        self.assertEqual(LoteSequencia.reservar(prefixo), 6)
+
+    def test_simulacao_nao_grava_nem_reserva(self):
+        saida = self.importar([self.linha(), self.linha('Ibuprofeno 400mg'), self.linha('Dipirona 1g')], dry_run=True)
 
-# Create your tests here.
+        self.assertIn('Simulação: 2 lotes seriam criados', saida)
+        self.assertIn('1 linhas rejeitadas', saida)
+        self.assertFalse(Lote.objects.exists())
+        self.assertFalse(LoteSequencia.objects.exists())
+        self.assertFalse(ProdutoEstoqueResumo.objects.filter(estoque_valido__gt=0).exists())
@@ -1,9 +1,10 @@
-from django.urls import path, include
+from django.urls import path
 from . import views
 
 urlpatterns = [
     path('', views.productos_list, name='productos_list'),
     path('criar/', views.cadastrar_producto, name='cadastrar_producto'),
+    path('buscar/', views.buscar_produtos_json, name='buscar_produtos'),
     path('categorias/', views.categorias_list, name='categorias_list'),
     path('categoria/criar/', views.criar_categoria, name='criar_categoria'),
     path("categoria/<int:categoria_id>/apagar/", views.remover_categoria, name="remover_categoria"),
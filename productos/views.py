@@ -1,14 +1,13 @@
-from django.db.models import Sum, Min, Q
+from django.db.models import Q
 from core.decorators import gerente_required, vendedor_required, admin_required
 from .models import Produto, Categoria, Fornecedor, Lote
+from .busca import buscar_produtos
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.core.paginator import Paginator
-from django.http import HttpResponse
+from django.http import JsonResponse
 from django.utils import timezone
 from django.contrib.auth.decorators import login_required
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
 from django.core.exceptions import ValidationError
 from decimal import Decimal, InvalidOperation
 import datetime
@@ -32,6 +31,43 @@ def get_paginated_data(queryset, request, items_per_page=10):
     }
 
 
+def get_keyset_page(queryset, request, items_per_page=10):
+    """
+    Paginação por chave (nome, id): ?apos=<id> avança e ?antes=<id> volta.
+    O custo de qualquer página é o mesmo da primeira, sem OFFSET nem COUNT.
+    """
+    apos = safe_int(request.GET.get("apos"))
+    antes = safe_int(request.GET.get("antes"))
+    referencia_id = apos or antes
+    referencia = Produto.objects.filter(pk=referencia_id).values("nome", "id").first() \
+        if referencia_id else None
+
+    if referencia and antes:
+        itens = list(queryset.filter(
+            Q(nome__lt=referencia["nome"]) |
+            Q(nome=referencia["nome"], id__lt=referencia["id"])
+        ).order_by("-nome", "-id")[:items_per_page + 1])
+        tem_mais = len(itens) > items_per_page
+        itens = itens[:items_per_page][::-1]
+        tem_anterior, tem_proxima = tem_mais, True
+    else:
+        if referencia:
+            queryset = queryset.filter(
+                Q(nome__gt=referencia["nome"]) |
+                Q(nome=referencia["nome"], id__gt=referencia["id"])
+            )
+        itens = list(queryset.order_by("nome", "id")[:items_per_page + 1])
+        tem_proxima = len(itens) > items_per_page
+        itens = itens[:items_per_page]
+        tem_anterior = referencia is not None
+
+    return {
+        "itens": itens,
+        "anterior_id": itens[0].id if itens and tem_anterior else None,
+        "proximo_id": itens[-1].id if itens and tem_proxima else None,
+    }
+
+
 def safe_decimal(value, default=0):
     """Converte seguro para Decimal"""
     if not value:
@@ -103,7 +139,7 @@ def criar_categoria(request):
                 messages.error(request, "Já existe uma categoria com este nome")
                 return render(request, "productos/nova_categoria.html")
 
-            categoria = Categoria.objects.create(
+            Categoria.objects.create(
                 nome=nome,
                 tipo=tipo,
                 descricao=descricao
@@ -140,7 +176,7 @@ def productos_list(request):
     categoria = request.GET.get("categoria", "Todas")
     status = request.GET.get("status", "Todos")
 
-    productos = Produto.objects.all().select_related('categoria')
+    productos = Produto.objects.com_estoque().select_related('categoria').order_by('nome', 'id')
 
     if search:
         productos = productos.filter(
@@ -153,35 +189,69 @@ def productos_list(request):
         productos = productos.filter(categoria__nome=categoria)
 
     if status != "Todos":
-        if status == "esgotado":
-            productos = [p for p in productos if p.estoque_total == 0]
-        elif status == "baixo":
-            productos = [p for p in productos if p.status_estoque == "baixo"]
-        elif status == "ok":
-            productos = [p for p in productos if p.status_estoque == "ok"]
-
-    if status != "Todos":
-        paginator = Paginator(productos, 10)
-    else:
-        paginator = Paginator(productos, 10)
+        productos = productos.por_status(status)
 
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
-
-    custom_range = range(max(1, page_obj.number - 2), min(page_obj.number + 3, paginator.num_pages + 1))
+    # Filtros atuais para os links de paginação
+    filtros = request.GET.copy()
+    for chave in ("page", "apos", "antes"):
+        filtros.pop(chave, None)
 
     context = {
-        "productos": page_obj,
-        "page_obj": page_obj,
-        "custom_range": custom_range,
         "search": search,
         "categoria": categoria,
         "status": status,
-        "categorias": Categoria.objects.all()
+        "categorias": Categoria.objects.all(),
+        "filtros_query": filtros.urlencode(),
     }
+
+    if request.GET.get("paginacao") == "chave":
+        keyset = get_keyset_page(productos, request, 10)
+        context.update({
+            "productos": keyset["itens"],
+            "paginacao_chave": True,
+            "anterior_id": keyset["anterior_id"],
+            "proximo_id": keyset["proximo_id"],
+        })
+    else:
+        paginator = Paginator(productos, 10)
+        page_number = request.GET.get("page")
+        page_obj = paginator.get_page(page_number)
+
+        custom_range = range(max(1, page_obj.number - 2), min(page_obj.number + 3, paginator.num_pages + 1))
+
+        context.update({
+            "productos": page_obj,
+            "page_obj": page_obj,
+            "custom_range": custom_range,
+        })
+
     return render(request, "productos/productos.html", context)
 
 
+@login_required
+@vendedor_required
+def buscar_produtos_json(request):
+    """Autocomplete do PDV: os produtos com estoque que casam com ?q=, com preços"""
+    limite = min(max(safe_int(request.GET.get('limite'), 10), 1), 50)
+    produtos = buscar_produtos(request.GET.get('q', ''), limite)
+
+    return JsonResponse({
+        'resultados': [
+            {
+                'id': produto.id,
+                'nome': produto.nome,
+                'codigo_barras': produto.codigo_barras or '',
+                'principio_ativo': produto.principio_ativo or '',
+                'preco_venda': float(produto.preco_venda or 0),
+                'preco_carteira': float(produto.preco_carteira_calculado or 0),
+                'carteiras_por_caixa': produto.carteiras_por_caixa or 1,
+                'estoque': produto.estoque_disponivel,
+            }
+            for produto in produtos
+        ]
+    })
+
+
 @login_required
 @gerente_required
 def cadastrar_producto(request):
@@ -478,186 +548,25 @@ def editar_lote(request, pk):
 
 # productos/views.py - Adicione no final do arquivo
 
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
-from django.http import HttpResponse
-from django.utils import timezone
+import tempfile
+
+from django.http import FileResponse
 from django.contrib.auth.decorators import login_required
 from core.decorators import gerente_required
+from .exportacoes import relatorio_estoque
 
 
 @login_required
 @gerente_required
 def exportar_produtos_excel(request):
-    produtos = Produto.objects.all().order_by('categoria__nome', 'nome')
-
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Relatório de Estoque"
-
-    # ===== ESTILOS =====
-    header_font = Font(bold=True, color="FFFFFF", size=12)
-    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    title_font = Font(bold=True, size=16)
-
-    alert_fill = PatternFill(start_color="FFCCCB", end_color="FFCCCB", fill_type="solid")
-    warning_fill = PatternFill(start_color="FFE599", end_color="FFE599", fill_type="solid")
-    ok_fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
-
-    thin_border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
-    center_align = Alignment(horizontal='center', vertical='center')
-
-    # ===== TÍTULO =====
-    ws.merge_cells('A1:K1')
-    ws['A1'] = "RELATÓRIO DE ESTOQUE - BALANÇO DE PRODUTOS"
-    ws['A1'].font = title_font
-    ws['A1'].alignment = center_align
-
-    ws.merge_cells('A2:K2')
-    ws['A2'] = f"Emitido em: {timezone.now().strftime('%d/%m/%Y às %H:%M')}"
-    ws['A2'].alignment = center_align
-
-    ws.append([])
-
-    # ===== CABEÇALHO =====
-    headers = [
-        'Produto', 'Categoria', 'Código Barras', 'Lotes Ativos',
-        'Estoque Disponível', 'Estoque Vencido', 'Estoque Mínimo', 'Status',
-        'Preço Venda', 'Rendimento (válido)', 'Valor Investido (válido)'
-    ]
-    ws.append(headers)
-
-    for col in range(1, len(headers) + 1):
-        cell = ws.cell(row=4, column=col)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = center_align
-        cell.border = thin_border
-
-    # ===== DADOS =====
-    row_num = 5
-    total_estoque_disponivel = 0
-    total_estoque_vencido = 0
-    total_rendimento_valido = 0
-    total_investido_valido = 0
-
-    for produto in produtos:
-        # ✅ PROPRIEDADES CORRETAS DO SEU MODELO
-        estoque_disponivel = produto.estoque_disponivel
-        estoque_vencido = produto.estoque_vencido
-        num_lotes_ativos = produto.lotes_ativos  # ← CORRIGIDO: lotes_ativos
-        status_estoque = produto.status_estoque
-
-        # Acumular totais para resumo
-        total_estoque_disponivel += estoque_disponivel
-        total_estoque_vencido += estoque_vencido
-        total_rendimento_valido += produto.rendimento_potencial
-        total_investido_valido += produto.valor_investido
-
-        if status_estoque == "esgotado":
-            status = "SEM ESTOQUE"
-            status_fill = alert_fill
-        elif status_estoque == "baixo":
-            status = "ESTOQUE BAIXO"
-            status_fill = warning_fill
-        else:
-            status = "ESTOQUE OK"
-            status_fill = ok_fill
-
-        ws.append([
-            produto.nome,
-            produto.categoria.nome if produto.categoria else 'N/A',
-            produto.codigo_barras or 'N/A',
-            num_lotes_ativos,
-            estoque_disponivel,
-            estoque_vencido,
-            produto.estoque_minimo,
-            status,
-            float(produto.preco_venda or 0),
-            float(produto.rendimento_potencial),
-            float(produto.valor_investido)
-        ])
-
-        for col in range(1, len(headers) + 1):
-            cell = ws.cell(row=row_num, column=col)
-            cell.border = thin_border
-
-            # Alinhamento central para colunas numéricas
-            if col in [4, 5, 6, 7]:
-                cell.alignment = center_align
-                cell.number_format = '#,##0'
-
-            if col in [9, 10, 11]:  # Preço, Rendimento, Investimento
-                cell.number_format = '"MT" #,##0.00'
-                cell.alignment = center_align
-
-            if col == 8:  # Coluna Status
-                cell.fill = status_fill
-                cell.font = Font(bold=True)
-                cell.alignment = center_align
-
-        row_num += 1
-
-    # ===== LARGURA DAS COLUNAS =====
-    widths = {
-        'A': 40, 'B': 20, 'C': 15, 'D': 12,
-        'E': 15, 'F': 15, 'G': 15, 'H': 15,
-        'I': 15, 'J': 20, 'K': 20
-    }
-    for col, width in widths.items():
-        ws.column_dimensions[col].width = width
-
-    # ===== RESUMO =====
-    summary_row = row_num + 2
-
-    ws.merge_cells(f'A{summary_row}:K{summary_row}')
-    ws[f'A{summary_row}'] = "RESUMO DO ESTOQUE (APENAS LOTES VÁLIDOS)"
-    ws[f'A{summary_row}'].font = Font(bold=True, size=12)
-    ws[f'A{summary_row}'].fill = PatternFill(start_color="D9E1F2", end_color="D9E1F2", fill_type="solid")
-    ws[f'A{summary_row}'].alignment = center_align
-
-    resumo = [
-        ('Total de Produtos', len(produtos)),
-        ('Produtos sem Estoque Disponível', sum(1 for p in produtos if p.status_estoque == "esgotado")),
-        ('Produtos com Estoque Baixo', sum(1 for p in produtos if p.status_estoque == "baixo")),
-        ('Produtos com Estoque OK', sum(1 for p in produtos if p.status_estoque == "ok")),
-        ('Estoque Disponível Total (unidades)', total_estoque_disponivel),
-        ('Estoque Vencido Total (unidades)', total_estoque_vencido),
-        ('Rendimento Potencial Total (válido)', total_rendimento_valido),
-        ('Investimento Total (válido)', total_investido_valido),
-    ]
-
-    for i, (desc, val) in enumerate(resumo, start=1):
-        r = summary_row + i
-        ws.cell(row=r, column=1, value=desc).font = Font(bold=True)
-        ws.cell(row=r, column=1).border = thin_border
-
-        cell_val = ws.cell(row=r, column=2, value=val)
-        cell_val.border = thin_border
-
-        if desc in ['Rendimento Potencial Total (válido)', 'Investimento Total (válido)']:
-            cell_val.number_format = '"MT" #,##0.00'
-        else:
-            cell_val.number_format = '#,##0'
-
-    # ===== LINHA DE ALERTA SOBRE VENCIDOS =====
-    if total_estoque_vencido > 0:
-        alert_row = summary_row + len(resumo) + 2
-        ws.merge_cells(f'A{alert_row}:K{alert_row}')
-        ws[f'A{alert_row}'].font = Font(bold=True, color="FF0000")
-        ws[f'A{alert_row}'].fill = PatternFill(start_color="FFE6E6", end_color="FFE6E6", fill_type="solid")
-        ws[f'A{alert_row}'].alignment = center_align
-
-    # ===== RESPONSE =====
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    """Download direto do relatório de estoque (a tela usa a exportação em segundo plano)"""
+    # O arquivo temporário é apagado quando o FileResponse termina de enviá-lo
+    arquivo = tempfile.TemporaryFile()
+    relatorio_estoque(arquivo)
+    arquivo.seek(0)
+    return FileResponse(
+        arquivo,
+        as_attachment=True,
+        filename="relatorio_estoque.xlsx",
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
     )
-    response['Content-Disposition'] = 'attachment; filename="relatorio_estoque.xlsx"'
-    wb.save(response)
-    return response
-
@@ -0,0 +1,39 @@
+# relatorios/management/commands/reconstruir_vendas_diarias.py
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from relatorios.models import VendaDiaria
+from relatorios.services import reconstruir_vendas_diarias
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói o fato diário de vendas (VendaDiaria) a partir dos itens vendidos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help='Data inicial (AAAA-MM-DD); padrão: todo o histórico')
+        parser.add_argument('--ate', help='Data final (AAAA-MM-DD); padrão: hoje')
+        parser.add_argument('--dias', type=int, help='Apenas os últimos N dias (alternativa a --desde)')
+
+    def handle(self, *args, **options):
+        try:
+            desde = datetime.strptime(options['desde'], '%Y-%m-%d').date() if options['desde'] else None
+            ate = datetime.strptime(options['ate'], '%Y-%m-%d').date() if options['ate'] else None
+        except ValueError:
+            raise CommandError("Use datas no formato AAAA-MM-DD")
+
+        if options['dias'] and not desde:
+            desde = timezone.localdate() - timedelta(days=options['dias'])
+
+        reconstruir_vendas_diarias(desde, ate)
+
+        linhas = VendaDiaria.objects.all()
+        if desde:
+            linhas = linhas.filter(dia__gte=desde)
+        if ate:
+            linhas = linhas.filter(dia__lte=ate)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ Fato diário reconstruído: {linhas.count()} linhas.")
+        )
@@ -0,0 +1,86 @@
+# Generated by Django 4.2.7 on 2026-10-17 15:35
+
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, Count, DateField, DecimalField, ExpressionWrapper, F, IntegerField, Sum, When
+from django.db.models.functions import Coalesce, NullIf, TruncDay
+import django.db.models.deletion
+import django.db.models.functions.comparison
+
+
+def preencher_vendas_diarias(apps, schema_editor):
+    """Preenche o fato diário com as vendas já existentes (modelos históricos)"""
+    ItemVenda = apps.get_model('vendas', 'ItemVenda')
+    VendaDiaria = apps.get_model('relatorios', 'VendaDiaria')
+    dinheiro = DecimalField(max_digits=14, decimal_places=2)
+
+    linhas = ItemVenda.objects.annotate(
+        dia=TruncDay('venda__data_venda', tzinfo=ZoneInfo(settings.TIME_ZONE), output_field=DateField())
+    ).order_by().values(
+        'dia', 'venda__atendente_id', 'venda__forma_pagamento', 'produto__categoria_id'
+    ).annotate(
+        num_vendas=Count('venda', distinct=True),
+        faturamento=Sum(ExpressionWrapper(F('quantidade') * F('preco_unitario'), output_field=dinheiro)),
+        custo=Sum(ExpressionWrapper(F('quantidade') * F('custo_unitario'), output_field=dinheiro)),
+        unidades=Sum(Case(
+            When(unidade='caixa', then=F('quantidade') * Coalesce(NullIf(F('produto__carteiras_por_caixa'), 0), 1)),
+            default=F('quantidade'),
+            output_field=IntegerField(),
+        )),
+    )
+
+    VendaDiaria.objects.bulk_create([
+        VendaDiaria(
+            dia=linha['dia'],
+            atendente_id=linha['venda__atendente_id'],
+            forma_pagamento=linha['venda__forma_pagamento'],
+            categoria_id=linha['produto__categoria_id'],
+            num_vendas=linha['num_vendas'],
+            faturamento=linha['faturamento'] or 0,
+            custo=linha['custo'] or 0,
+            unidades=linha['unidades'] or 0,
+        )
+        for linha in linhas
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('productos', '0013_produto_nome_id_idx'),
+        # Custo gravado por item, usado no preenchimento inicial
+        ('vendas', '0007_preencher_custo_unitario'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VendaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('forma_pagamento', models.CharField(choices=[('dinheiro', 'Dinheiro'), ('mpesa', 'M-Pesa'), ('emola', 'E-Mola'), ('pos', 'POS'), ('transferencia', 'Transferencia Bancaria')], max_length=20)),
+                ('num_vendas', models.IntegerField(default=0)),
+                ('faturamento', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('custo', models.DecimalField(decimal_places=4, default=0, max_digits=16)),
+                ('unidades', models.IntegerField(default=0)),
+                ('atendente', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('categoria', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='productos.categoria')),
+            ],
+            options={
+                'verbose_name': 'Venda Diária',
+                'verbose_name_plural': 'Vendas Diárias',
+                'ordering': ['dia'],
+                'indexes': [models.Index(fields=['dia', 'atendente'], name='venda_diaria_dia_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='vendadiaria',
+            constraint=models.UniqueConstraint(models.F('dia'), django.db.models.functions.comparison.Coalesce('atendente', models.Value(0)), models.F('forma_pagamento'), django.db.models.functions.comparison.Coalesce('categoria', models.Value(0)), name='venda_diaria_chave_unica'),
+        ),
+        migrations.RunPython(preencher_vendas_diarias, migrations.RunPython.noop),
+    ]
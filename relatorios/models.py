@@ -1,3 +1,45 @@
+from django.contrib.auth.models import User
 from django.db import models
+from django.db.models import Value
+from django.db.models.functions import Coalesce
 
-# Create your models here.
+from productos.models import Categoria
+from vendas.models import Venda
+
+
+class VendaDiaria(models.Model):
+    """
+    Fato diário de vendas: uma linha por dia, atendente, forma de pagamento e categoria.
+    Atualizado incrementalmente ao finalizar/remover vendas e reconstruível pelo
+    comando reconstruir_vendas_diarias. Os gráficos somam estas linhas.
+    """
+    dia = models.DateField()
+    atendente = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    forma_pagamento = models.CharField(max_length=20, choices=Venda.FORMA_PAGAMENTO_CHOICES)
+    categoria = models.ForeignKey(Categoria, on_delete=models.SET_NULL, null=True, blank=True)
+
+    # Vendas que tiveram itens desta categoria (uma venda pode contar em várias categorias)
+    num_vendas = models.IntegerField(default=0)
+    faturamento = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    custo = models.DecimalField(max_digits=16, decimal_places=4, default=0)
+    # Em carteiras (caixas convertidas)
+    unidades = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Venda Diária"
+        verbose_name_plural = "Vendas Diárias"
+        ordering = ['dia']
+        indexes = [
+            models.Index(fields=['dia', 'atendente'], name='venda_diaria_dia_idx'),
+        ]
+        constraints = [
+            # atendente e categoria podem ser nulos: o Coalesce faz NULL contar como
+            # valor na chave, senão duas linhas "sem categoria" do mesmo dia seriam aceitas
+            models.UniqueConstraint(
+                'dia', Coalesce('atendente', Value(0)), 'forma_pagamento', Coalesce('categoria', Value(0)),
+                name='venda_diaria_chave_unica',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.dia} - {self.forma_pagamento} - {self.faturamento} MT"
@@ -0,0 +1,269 @@
+# relatorios/services.py
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (
+    Case, Count, DateField, DecimalField, Exists, ExpressionWrapper, F, IntegerField, Max, OuterRef,
+    Subquery, Sum, When,
+)
+from django.db.models.functions import Coalesce, NullIf, TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from productos.models import Produto
+from vendas.models import ItemVenda
+from vendas.services import converter_para_unidades
+from .models import VendaDiaria
+
+DINHEIRO = DecimalField(max_digits=14, decimal_places=2)
+
+# Faturamento e custo (CMV) de cada item, com o custo gravado no momento da venda
+FATURAMENTO_ITEM = ExpressionWrapper(F('quantidade') * F('preco_unitario'), output_field=DINHEIRO)
+CUSTO_ITEM = ExpressionWrapper(F('quantidade') * F('custo_unitario'), output_field=DINHEIRO)
+
+# Fuso da farmácia (Africa/Maputo): os dias e semanas dos relatórios são locais
+FUSO_RELATORIOS = ZoneInfo(settings.TIME_ZONE)
+
+
+# Granularidades dos gráficos por período
+GRANULARIDADES = [
+    ('dia', 'Por dia'),
+    ('semana', 'Por semana'),
+    ('mes', 'Por mês'),
+]
+
+_TRUNCAGENS = {'dia': TruncDay, 'semana': TruncWeek, 'mes': TruncMonth}
+
+
+def periodo_local(campo, granularidade='dia'):
+    """Trunca um DateTimeField para o dia, a semana ISO ou o mês local, devolvendo date"""
+    return _TRUNCAGENS[granularidade](campo, tzinfo=FUSO_RELATORIOS, output_field=DateField())
+
+
+def dia_local(campo):
+    return periodo_local(campo, 'dia')
+
+
+def semana_local(campo):
+    return periodo_local(campo, 'semana')
+
+
+def periodos_entre(data_inicio, data_fim, granularidade='dia'):
+    """
+    Início de cada período (o mesmo valor devolvido por periodo_local) de data_inicio
+    a data_fim, para preencher em Python os períodos sem vendas.
+    """
+    if granularidade == 'semana':
+        periodo = data_inicio - timedelta(days=data_inicio.weekday())
+    elif granularidade == 'mes':
+        periodo = data_inicio.replace(day=1)
+    else:
+        periodo = data_inicio
+
+    while periodo <= data_fim:
+        yield periodo
+        if granularidade == 'semana':
+            periodo += timedelta(days=7)
+        elif granularidade == 'mes':
+            periodo = (periodo + timedelta(days=32)).replace(day=1)
+        else:
+            periodo += timedelta(days=1)
+
+
+def _metricas():
+    return {
+        'faturamento': Coalesce(Sum(FATURAMENTO_ITEM), Decimal('0.00'), output_field=DINHEIRO),
+        'custo': Coalesce(Sum(CUSTO_ITEM), Decimal('0.00'), output_field=DINHEIRO),
+    }
+
+
+# ========== ESTOQUE PARADO ==========
+
+def calcular_estoque_parado(dias=90):
+    """
+    Produtos com estoque e sem vendas nos últimos `dias` dias, numa única consulta:
+    estoque atual, data da última venda e dias exatos sem venda. Ordenado pelo estoque.
+    """
+    agora = timezone.now()
+    hoje = timezone.localdate()
+    vendas_do_produto = ItemVenda.objects.filter(produto=OuterRef('pk')).order_by()
+
+    produtos = Produto.objects.filter(
+        ~Exists(vendas_do_produto.filter(venda__data_venda__gte=agora - timedelta(days=dias)))
+    ).com_estoque().annotate(
+        estoque_atual=F('estoque_valido_anotado') + F('estoque_vencido_anotado'),
+        ultima_venda=Subquery(
+            vendas_do_produto.values('produto').annotate(ultima=Max('venda__data_venda')).values('ultima')
+        ),
+    ).filter(estoque_atual__gt=0).order_by('-estoque_atual', 'nome').values(
+        'nome', 'categoria__nome', 'estoque_atual', 'estoque_minimo', 'ultima_venda'
+    )
+
+    parados = []
+    for produto in produtos:
+        ultima_venda = produto['ultima_venda'] and timezone.localtime(produto['ultima_venda']).date()
+        parados.append({
+            'nome': produto['nome'],
+            'categoria': produto['categoria__nome'] or 'Sem Categoria',
+            'estoque': produto['estoque_atual'],
+            'estoque_minimo': produto['estoque_minimo'],
+            'ultima_venda': ultima_venda,
+            'dias_sem_venda': (hoje - ultima_venda).days if ultima_venda else None,
+        })
+    return parados
+
+
+# ========== FATO DIÁRIO DE VENDAS ==========
+
+# carteiras_por_caixa=0 conta como 1, como em converter_para_unidades (caminho incremental)
+UNIDADES_ITEM = Case(
+    When(unidade='caixa', then=F('quantidade') * Coalesce(NullIf(F('produto__carteiras_por_caixa'), 0), 1)),
+    default=F('quantidade'),
+    output_field=IntegerField(),
+)
+
+
+def registrar_venda_diaria(venda, itens=None, sinal=1):
+    """
+    Soma (sinal=1) ou subtrai (sinal=-1) a venda do fato diário, por categoria.
+    Chamada na mesma transação que finaliza ou remove a venda.
+    """
+    if itens is None:
+        itens = ItemVenda.objects.filter(venda=venda).select_related('produto')
+
+    por_categoria = defaultdict(lambda: {'faturamento': Decimal('0.00'), 'custo': Decimal('0.00'), 'unidades': 0})
+    for item in itens:
+        # Categoria gravada no item: a remoção acha a mesma linha mesmo que o produto mude de categoria
+        linha = por_categoria[item.categoria_id]
+        linha['faturamento'] += item.subtotal
+        linha['custo'] += item.custo_total
+        linha['unidades'] += converter_para_unidades(item.unidade, item.quantidade, item.produto)
+
+    dia = timezone.localtime(venda.data_venda).date()
+    for categoria_id, valores in por_categoria.items():
+        chave = {
+            'dia': dia,
+            'atendente_id': venda.atendente_id,
+            'forma_pagamento': venda.forma_pagamento,
+            'categoria_id': categoria_id,
+        }
+        incremento = {
+            'num_vendas': F('num_vendas') + sinal,
+            'faturamento': F('faturamento') + sinal * valores['faturamento'],
+            'custo': F('custo') + sinal * valores['custo'],
+            'unidades': F('unidades') + sinal * valores['unidades'],
+        }
+        if sinal > 0:
+            # Dois caixas com a primeira venda do dia na mesma chave: get_or_create
+            # absorve o INSERT repetido (IntegrityError na constraint) e relê a linha
+            with transaction.atomic():
+                linha, criada = VendaDiaria.objects.select_for_update().get_or_create(
+                    **chave, defaults={'num_vendas': 1, **valores}
+                )
+                if not criada:
+                    VendaDiaria.objects.filter(pk=linha.pk).update(**incremento)
+        else:
+            VendaDiaria.objects.filter(**chave).update(**incremento)
+            VendaDiaria.objects.filter(num_vendas__lte=0, **chave).delete()
+
+
+def reconstruir_vendas_diarias(data_inicio=None, data_fim=None):
+    """Recalcula o fato diário a partir dos itens, numa única consulta agrupada"""
+    itens = ItemVenda.objects.annotate(dia=dia_local('venda__data_venda')).order_by()
+    existentes = VendaDiaria.objects.all()
+    if data_inicio:
+        itens = itens.filter(dia__gte=data_inicio)
+        existentes = existentes.filter(dia__gte=data_inicio)
+    if data_fim:
+        itens = itens.filter(dia__lte=data_fim)
+        existentes = existentes.filter(dia__lte=data_fim)
+
+    linhas = itens.values(
+        'dia', 'venda__atendente_id', 'venda__forma_pagamento', 'categoria_id'
+    ).annotate(
+        num_vendas=Count('venda', distinct=True),
+        unidades=Sum(UNIDADES_ITEM),
+        **_metricas(),
+    )
+
+    with transaction.atomic():
+        existentes.delete()
+        VendaDiaria.objects.bulk_create([
+            VendaDiaria(
+                dia=linha['dia'],
+                atendente_id=linha['venda__atendente_id'],
+                forma_pagamento=linha['venda__forma_pagamento'],
+                categoria_id=linha['categoria_id'],
+                num_vendas=linha['num_vendas'],
+                faturamento=linha['faturamento'],
+                custo=linha['custo'],
+                unidades=linha['unidades'] or 0,
+            )
+            for linha in linhas
+        ], batch_size=1000)
+
+
+# ========== CONSULTAS AO FATO DIÁRIO ==========
+
+_TRUNCAGENS_FATO = {'semana': TruncWeek, 'mes': TruncMonth}
+
+
+def periodo_do_fato(granularidade='dia'):
+    """Início do dia, da semana ISO ou do mês de VendaDiaria.dia (que já é o dia local)"""
+    if granularidade == 'dia':
+        return F('dia')
+    return _TRUNCAGENS_FATO[granularidade]('dia', output_field=DateField())
+
+
+def fatos_do_periodo(data_inicio, data_fim, atendente_id=None):
+    """Linhas do fato diário de data_inicio a data_fim, opcionalmente de um atendente"""
+    fatos = VendaDiaria.objects.filter(dia__range=(data_inicio, data_fim))
+    if atendente_id:
+        fatos = fatos.filter(atendente_id=atendente_id)
+    return fatos
+
+
+def _metricas_fato():
+    return {
+        'faturamento': Coalesce(Sum('faturamento'), Decimal('0.00'), output_field=DINHEIRO),
+        'custo': Coalesce(Sum('custo'), Decimal('0.00'), output_field=DINHEIRO),
+        'unidades': Coalesce(Sum('unidades'), 0),
+    }
+
+
+def totais_do_fato(fatos):
+    """Faturamento, custo (CMV), lucro e unidades das linhas do fato numa única agregação"""
+    totais = fatos.aggregate(**_metricas_fato())
+    totais['lucro'] = totais['faturamento'] - totais['custo']
+    return totais
+
+
+def resumo_do_fato_por(fatos, *campos, granularidade=None):
+    """
+    Faturamento, custo, lucro e unidades do fato diário agrupados por campos e/ou
+    pelo período (granularidade), num único GROUP BY sobre VendaDiaria.
+    Ex.: resumo_do_fato_por(fatos, 'categoria__nome') ou resumo_do_fato_por(fatos, granularidade='semana').
+    """
+    fatos = fatos.order_by()
+    if granularidade:
+        fatos = fatos.annotate(periodo=periodo_do_fato(granularidade))
+        campos += ('periodo',)
+
+    for linha in fatos.values(*campos).annotate(**_metricas_fato()):
+        linha['lucro'] = linha['faturamento'] - linha['custo']
+        yield linha
+
+
+def atendentes_do_fato(fatos, dias):
+    """Nomes dos atendentes com vendas em cada um dos dias pedidos (uma consulta)"""
+    linhas = fatos.order_by().filter(dia__in=dias, atendente__isnull=False).values_list(
+        'dia', 'atendente__first_name', 'atendente__last_name', 'atendente__username'
+    ).distinct()
+
+    nomes = defaultdict(list)
+    for dia, primeiro_nome, ultimo_nome, username in linhas:
+        nomes[dia].append(f"{primeiro_nome} {ultimo_nome}".strip() or username)
+    return {dia: sorted(lista) for dia, lista in nomes.items()}
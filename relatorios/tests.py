@@ -1,3 +1,126 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
 from django.test import TestCase
+from django.utils import timezone
+
+from productos.models import Categoria, Produto
+from vendas.models import ItemVenda, Venda
+from .models import VendaDiaria
+from .services import (
+    fatos_do_periodo, reconstruir_vendas_diarias, registrar_venda_diaria, resumo_do_fato_por, totais_do_fato,
+)
+
+
+class VendaDiariaTests(TestCase):
+    """Fato diário de vendas: incremento por venda e reconstrução agrupada"""
+
+    def setUp(self):
+        self.atendente = User.objects.create_user('caixa1')
+        # Sem categoria: a chave do fato tem categoria NULL
+        self.produto = Produto.objects.create(
+            nome='Soro fisiológico', preco_compra=Decimal('40.00'), preco_venda=Decimal('60.00'),
+            carteiras_por_caixa=5,
+        )
+
+    def vender(self, quantidade, unidade='carteira'):
+        venda = Venda.objects.create(
+            atendente=self.atendente, forma_pagamento='dinheiro', data_venda=timezone.now()
+        )
+        item = ItemVenda.objects.create(venda=venda, produto=self.produto, quantidade=quantidade, unidade=unidade)
+        registrar_venda_diaria(venda, [item])
+        return venda
+
+    def totais(self):
+        return list(VendaDiaria.objects.values_list(
+            'dia', 'atendente_id', 'forma_pagamento', 'categoria_id', 'num_vendas', 'faturamento', 'custo', 'unidades'
+        ))
+
+    def test_vendas_na_mesma_chave_somam_numa_linha(self):
+        self.vender(2)
+        self.vender(1, unidade='caixa')
+
+        linha = VendaDiaria.objects.get()
+        self.assertIsNone(linha.categoria_id)
+        self.assertEqual(linha.dia, timezone.localdate())
+        self.assertEqual(linha.num_vendas, 2)
+        # 2 carteiras a 12.00 + 1 caixa a 60.00; custo 2 x 8.00 + 40.00
+        self.assertEqual(linha.faturamento, Decimal('84.00'))
+        self.assertEqual(linha.custo, Decimal('56.00'))
+        self.assertEqual(linha.unidades, 7)
+
+    def test_chave_com_categoria_nula_e_unica(self):
+        chave = {'dia': timezone.localdate(), 'atendente': self.atendente, 'forma_pagamento': 'dinheiro'}
+        VendaDiaria.objects.create(**chave)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            VendaDiaria.objects.create(**chave)
+
+    def test_remover_venda_subtrai_e_apaga_linha_vazia(self):
+        self.vender(2)
+        venda = self.vender(3)
+
+        registrar_venda_diaria(venda, sinal=-1)
+        self.assertEqual(VendaDiaria.objects.get().num_vendas, 1)
+
+        registrar_venda_diaria(Venda.objects.exclude(pk=venda.pk).get(), sinal=-1)
+        self.assertFalse(VendaDiaria.objects.exists())
+
+    def test_reconstruir_da_os_mesmos_totais(self):
+        self.vender(2)
+        self.vender(1, unidade='caixa')
+        incremental = self.totais()
+
+        reconstruir_vendas_diarias()
+
+        self.assertEqual(self.totais(), incremental)
+
+    def test_reconstruir_com_carteiras_por_caixa_zero(self):
+        # Produto importado sem passar pelo clean(): 0 conta como 1 nos dois caminhos
+        Produto.objects.filter(pk=self.produto.pk).update(carteiras_por_caixa=0)
+        self.produto.refresh_from_db()
+        self.vender(3, unidade='caixa')
+        incremental = self.totais()
+
+        reconstruir_vendas_diarias()
+
+        self.assertEqual(self.totais(), incremental)
+        self.assertEqual(VendaDiaria.objects.get().unidades, 3)
+
+    def test_remover_venda_apos_mudanca_de_categoria(self):
+        antiga = Categoria.objects.create(nome='Soros')
+        nova = Categoria.objects.create(nome='Hidratação')
+        Produto.objects.filter(pk=self.produto.pk).update(categoria=antiga)
+        self.produto.refresh_from_db()
+        venda = self.vender(2)
+        self.vender(1)
+
+        # O produto muda de categoria depois da venda: a remoção baixa a linha da categoria antiga
+        Produto.objects.filter(pk=self.produto.pk).update(categoria=nova)
+        registrar_venda_diaria(venda, sinal=-1)
+
+        linha = VendaDiaria.objects.get()
+        self.assertEqual(linha.categoria, antiga)
+        self.assertEqual((linha.num_vendas, linha.faturamento, linha.unidades), (1, Decimal('12.00'), 1))
+
+    def test_series_do_relatorio_saem_do_fato(self):
+        self.vender(2)
+        self.vender(1, unidade='caixa')
+        hoje = timezone.localdate()
+        fatos = fatos_do_periodo(hoje, hoje, self.atendente.pk)
+
+        totais = totais_do_fato(fatos)
+        self.assertEqual((totais['faturamento'], totais['custo'], totais['lucro']),
+                         (Decimal('84.00'), Decimal('56.00'), Decimal('28.00')))
+
+        [semana] = resumo_do_fato_por(fatos, granularidade='semana')
+        self.assertEqual(semana['periodo'], hoje - timedelta(days=hoje.weekday()))
+        self.assertEqual(semana['lucro'], Decimal('28.00'))
+
+        [categoria] = resumo_do_fato_por(fatos, 'categoria__nome')
+        self.assertIsNone(categoria['categoria__nome'])
+        self.assertEqual(categoria['faturamento'], Decimal('84.00'))
 
-# Create your tests here.
+        outro = User.objects.create_user('caixa2')
+        self.assertFalse(fatos_do_periodo(hoje, hoje, outro.pk).exists())
@@ -1,6 +1,6 @@
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
-from django.db.models import Sum, Count, Q
+from django.db.models import Sum
 from django.utils import timezone
 from datetime import datetime, timedelta
 from decimal import Decimal
@@ -8,10 +8,21 @@ import json
 from collections import Counter
 
 from vendas.models import Venda, ItemVenda
-from productos.models import Produto, Categoria, Lote
-from clientes.models import Cliente
 from django.contrib.auth.models import User
 from core.decorators import gerente_required
+from .services import (
+    atendentes_do_fato, calcular_estoque_parado, fatos_do_periodo, periodos_entre, resumo_do_fato_por,
+    totais_do_fato, FATURAMENTO_ITEM, GRANULARIDADES,
+)
+
+# Acima deste número de dias o gráfico de vendas passa a agrupar por semana
+LIMITE_DIAS_GRAFICO_DIARIO = 92
+
+ROTULOS_PERIODO = {
+    'dia': lambda periodo: periodo.strftime('%d/%m'),
+    'semana': lambda periodo: f"Sem {periodo.strftime('%d/%m')}",
+    'mes': lambda periodo: periodo.strftime('%m/%Y'),
+}
 
 
 @login_required
@@ -26,6 +37,13 @@ def relatorios_avancados(request):
         data_fim = request.GET.get('data_fim', hoje.strftime('%Y-%m-%d'))
         tipo_relatorio = request.GET.get('tipo_relatorio', 'sales')
         atendente_id = request.GET.get('atendente', '')
+        granularidade = request.GET.get('granularidade', 'semana')
+        if granularidade not in dict(GRANULARIDADES):
+            granularidade = 'semana'
+        try:
+            dias_parado = max(int(request.GET.get('dias_parado', 90)), 1)
+        except ValueError:
+            dias_parado = 90
 
         # Converter datas
         try:
@@ -35,19 +53,24 @@ def relatorios_avancados(request):
             data_inicio_obj = hoje - timedelta(days=30)
             data_fim_obj = hoje
 
-        # Filtrar vendas
+        # Séries por dia, semana, atendente e categoria: fato diário (VendaDiaria)
+        fatos = fatos_do_periodo(data_inicio_obj, data_fim_obj, atendente_id)
+
+        # Vendas brutas só para o que o fato não responde: produtos mais vendidos
+        # (o fato não tem produto) e o número de vendas (no fato, uma venda com
+        # itens de várias categorias conta uma vez em cada categoria)
         vendas = Venda.objects.filter(
             data_venda__date__range=[data_inicio_obj, data_fim_obj]
-        ).select_related('atendente')
+        )
 
         if atendente_id:
             vendas = vendas.filter(atendente_id=atendente_id)
 
         # Dados para gráficos baseados no tipo de relatório
         if tipo_relatorio == 'sales':
-            dados_grafico_vendas = obter_dados_grafico_vendas(vendas, data_inicio_obj, data_fim_obj)
-            dados_grafico_rentabilidade = obter_dados_grafico_rentabilidade(vendas)
-            dados_tabela = obter_dados_tabela(vendas)
+            dados_grafico_vendas = obter_dados_grafico_vendas(fatos, data_inicio_obj, data_fim_obj)
+            dados_grafico_rentabilidade = obter_dados_grafico_rentabilidade(fatos)
+            dados_tabela = obter_dados_tabela(fatos)
 
         elif tipo_relatorio == 'bestsellers':
             dados_grafico_vendas = obter_dados_produtos_mais_vendidos(vendas)
@@ -55,27 +78,30 @@ def relatorios_avancados(request):
             dados_tabela = obter_dados_tabela_produtos_mais_vendidos(vendas)
 
         elif tipo_relatorio == 'deadstock':
-            dados_grafico_vendas = obter_dados_estoque_parado()
-            dados_grafico_rentabilidade = obter_dados_categorias_estoque_parado()
-            dados_tabela = obter_dados_tabela_estoque_parado()
+            # Calculado uma vez e reaproveitado pelos três blocos
+            estoque_parado = calcular_estoque_parado(dias_parado)
+            dados_grafico_vendas = obter_dados_estoque_parado(estoque_parado)
+            dados_grafico_rentabilidade = obter_dados_categorias_estoque_parado(estoque_parado)
+            dados_tabela = obter_dados_tabela_estoque_parado(estoque_parado)
 
         elif tipo_relatorio == 'profitability':
-            dados_grafico_vendas = obter_dados_rentabilidade_periodo(vendas, data_inicio_obj, data_fim_obj)
-            dados_grafico_rentabilidade = obter_dados_grafico_rentabilidade(vendas)
-            dados_tabela = obter_dados_tabela_rentabilidade(vendas)
+            dados_grafico_vendas = obter_dados_rentabilidade_periodo(
+                fatos, data_inicio_obj, data_fim_obj, granularidade
+            )
+            dados_grafico_rentabilidade = obter_dados_grafico_rentabilidade(fatos)
+            dados_tabela = obter_dados_tabela_rentabilidade(fatos)
         else:
             # Fallback para vendas
-            dados_grafico_vendas = obter_dados_grafico_vendas(vendas, data_inicio_obj, data_fim_obj)
-            dados_grafico_rentabilidade = obter_dados_grafico_rentabilidade(vendas)
-            dados_tabela = obter_dados_tabela(vendas)
+            dados_grafico_vendas = obter_dados_grafico_vendas(fatos, data_inicio_obj, data_fim_obj)
+            dados_grafico_rentabilidade = obter_dados_grafico_rentabilidade(fatos)
+            dados_tabela = obter_dados_tabela(fatos)
 
         # Estatísticas gerais
         total_vendas = vendas.count()
-        faturamento_total = vendas.aggregate(Sum('total'))['total__sum'] or Decimal('0.00')
-
-        # Calcular custo e lucro
-        custo_total = calcular_custo_total(vendas)
-        lucro_total = faturamento_total - custo_total
+        totais = totais_do_fato(fatos)
+        faturamento_total = totais['faturamento']
+        custo_total = totais['custo']
+        lucro_total = totais['lucro']
         margem_lucro = (lucro_total / faturamento_total * 100) if faturamento_total > 0 else Decimal('0.00')
 
         context = {
@@ -86,6 +112,8 @@ def relatorios_avancados(request):
             'data_fim': data_fim,
             'tipo_relatorio': tipo_relatorio,
             'atendente_selecionado': atendente_id,
+            'granularidade': granularidade,
+            'dias_parado': dias_parado,
 
             # Dados
             'dados_grafico_vendas': json.dumps(dados_grafico_vendas),
@@ -106,6 +134,7 @@ def relatorios_avancados(request):
                 ('deadstock', 'Estoque parado'),
                 ('profitability', 'Rentabilidade'),
             ],
+            'granularidades': GRANULARIDADES,
             'atendentes': User.objects.filter(is_active=True),
         }
 
@@ -121,6 +150,8 @@ def relatorios_avancados(request):
             'data_fim': timezone.now().date().strftime('%Y-%m-%d'),
             'tipo_relatorio': 'sales',
             'atendente_selecionado': '',
+            'granularidade': 'semana',
+            'dias_parado': 90,
             'dados_grafico_vendas': json.dumps({'categories': [], 'series': []}),
             'dados_grafico_rentabilidade': json.dumps({'series': []}),
             'dados_tabela': [],
@@ -135,6 +166,7 @@ def relatorios_avancados(request):
                 ('deadstock', 'Estoque parado'),
                 ('profitability', 'Rentabilidade'),
             ],
+            'granularidades': GRANULARIDADES,
             'atendentes': User.objects.filter(is_active=True),
         }
         return render(request, 'relatorios/relatorios_avancados.html', context)
@@ -142,30 +174,20 @@ def relatorios_avancados(request):
 
 # ========== FUNÇÕES PARA VENDAS POR PERÍODO ==========
 
-def obter_dados_grafico_vendas(vendas, data_inicio, data_fim):
-    """Gera dados reais para o gráfico de vendas por período"""
+def obter_dados_grafico_vendas(fatos, data_inicio, data_fim):
+    """Gera dados reais para o gráfico de vendas por período (por semana em períodos longos)"""
     try:
-        # Agrupar vendas por dia
-        vendas_por_dia = {}
-        current_date = data_inicio
-
-        while current_date <= data_fim:
-            vendas_por_dia[current_date] = Decimal('0.00')
-            current_date += timedelta(days=1)
+        granularidade = 'semana' if (data_fim - data_inicio).days > LIMITE_DIAS_GRAFICO_DIARIO else 'dia'
+        totais = {linha['periodo']: linha for linha in resumo_do_fato_por(fatos, granularidade=granularidade)}
 
-        # Preencher com dados reais
-        for venda in vendas:
-            data_venda = venda.data_venda.date()
-            if data_venda in vendas_por_dia:
-                vendas_por_dia[data_venda] += venda.total
-
-        # Preparar dados para o gráfico
+        # Preencher os períodos sem vendas
         categorias = []
         dados_vendas = []
 
-        for data, total in sorted(vendas_por_dia.items()):
-            categorias.append(data.strftime('%d/%m'))
-            dados_vendas.append(float(total))
+        for periodo in periodos_entre(data_inicio, data_fim, granularidade):
+            linha = totais.get(periodo)
+            categorias.append(periodo.strftime('%d/%m'))
+            dados_vendas.append(float(linha['faturamento']) if linha else 0.0)
 
         return {
             'categories': categorias,
@@ -191,7 +213,7 @@ def obter_dados_produtos_mais_vendidos(vendas):
             'produto__nome'
         ).annotate(
             total_vendido=Sum('quantidade'),
-            total_faturado=Sum('subtotal')
+            total_faturado=Sum(FATURAMENTO_ITEM)
         ).order_by('-total_vendido')[:10]
 
         categorias = [item['produto__nome'] for item in produtos_mais_vendidos]
@@ -252,7 +274,7 @@ def obter_dados_tabela_produtos_mais_vendidos(vendas):
             'produto__categoria__nome'
         ).annotate(
             quantidade_total=Sum('quantidade'),
-            faturamento_total=Sum('subtotal')
+            faturamento_total=Sum(FATURAMENTO_ITEM)
         ).order_by('-quantidade_total')[:20]
 
         dados_tabela = []
@@ -274,36 +296,11 @@ def obter_dados_tabela_produtos_mais_vendidos(vendas):
 
 # ========== FUNÇÕES PARA ESTOQUE PARADO ==========
 
-def obter_dados_estoque_parado():
+def obter_dados_estoque_parado(estoque_parado):
     """Gera dados para gráfico de estoque parado"""
     try:
-        # Produtos com estoque mas sem vendas nos últimos 90 dias
-        noventa_dias_atras = timezone.now().date() - timedelta(days=90)
-
-        produtos_com_estoque = Produto.objects.filter(
-            lote__quantidade_disponivel__gt=0
-        ).distinct()
-
-        produtos_sem_vendas = []
-
-        for produto in produtos_com_estoque:
-            vendas_recentes = ItemVenda.objects.filter(
-                produto=produto,
-                venda__data_venda__gte=noventa_dias_atras
-            ).exists()
-
-            if not vendas_recentes:
-                estoque_total = produto.estoque_total()
-                if estoque_total > 0:
-                    produtos_sem_vendas.append({
-                        'nome': produto.nome,
-                        'estoque': estoque_total,
-                        'categoria': produto.categoria.nome if produto.categoria else 'Sem Categoria'
-                    })
-
-        # Ordenar por estoque (maior primeiro) e pegar top 10
-        produtos_sem_vendas.sort(key=lambda x: x['estoque'], reverse=True)
-        produtos_sem_vendas = produtos_sem_vendas[:10]
+        # Top 10 por estoque (a lista já vem ordenada)
+        produtos_sem_vendas = estoque_parado[:10]
 
         categorias = [f"{produto['nome'][:15]}..." if len(produto['nome']) > 15 else produto['nome']
                       for produto in produtos_sem_vendas]
@@ -323,35 +320,18 @@ def obter_dados_estoque_parado():
         return {'categories': [], 'series': []}
 
 
-def obter_dados_categorias_estoque_parado():
+def obter_dados_categorias_estoque_parado(estoque_parado):
     """Gera dados para gráfico de categorias com estoque parado"""
     try:
-        noventa_dias_atras = timezone.now().date() - timedelta(days=90)
-
-        categorias_estoque_parado = {}
-
-        produtos_com_estoque = Produto.objects.filter(
-            lote__quantidade_disponivel__gt=0
-        ).distinct()
-
-        for produto in produtos_com_estoque:
-            vendas_recentes = ItemVenda.objects.filter(
-                produto=produto,
-                venda__data_venda__gte=noventa_dias_atras
-            ).exists()
-
-            if not vendas_recentes:
-                categoria_nome = produto.categoria.nome if produto.categoria else "Sem Categoria"
-                if categoria_nome not in categorias_estoque_parado:
-                    categorias_estoque_parado[categoria_nome] = 0
-                categorias_estoque_parado[categoria_nome] += produto.estoque_total()
+        categorias_estoque_parado = Counter()
+        for produto in estoque_parado:
+            categorias_estoque_parado[produto['categoria']] += produto['estoque']
 
         # Converter para formato do gráfico
         dados = []
         cores = ['#ef4444', '#f59e0b', '#84cc16', '#3b82f6', '#8b5cf6']
 
-        for i, (categoria, estoque) in enumerate(
-                sorted(categorias_estoque_parado.items(), key=lambda x: x[1], reverse=True)[:5]):
+        for i, (categoria, estoque) in enumerate(categorias_estoque_parado.most_common(5)):
             dados.append({
                 'name': categoria,
                 'y': float(estoque),
@@ -365,43 +345,21 @@ def obter_dados_categorias_estoque_parado():
         return {'series': []}
 
 
-def obter_dados_tabela_estoque_parado():
+def obter_dados_tabela_estoque_parado(estoque_parado):
     """Gera dados para tabela de estoque parado"""
     try:
-        noventa_dias_atras = timezone.now().date() - timedelta(days=90)
-
-        produtos_com_estoque = Produto.objects.filter(
-            lote__quantidade_disponivel__gt=0
-        ).distinct()
-
-        dados_tabela = []
-
-        for produto in produtos_com_estoque:
-            vendas_recentes = ItemVenda.objects.filter(
-                produto=produto,
-                venda__data_venda__gte=noventa_dias_atras
-            ).exists()
-
-            if not vendas_recentes:
-                estoque_total = produto.estoque_total()
-                ultima_venda = ItemVenda.objects.filter(
-                    produto=produto
-                ).order_by('-venda__data_venda').first()
-
-                dados_tabela.append({
-                    'produto': produto.nome,
-                    'categoria': produto.categoria.nome if produto.categoria else 'Sem Categoria',
-                    'estoque_atual': estoque_total,
-                    'estoque_minimo': produto.estoque_minimo,
-                    'ultima_venda': ultima_venda.venda.data_venda.date() if ultima_venda else 'Nunca',
-                    'dias_sem_venda': '90+',
-                    'tipo': 'estoque_parado'
-                })
-
-        # Ordenar por estoque (maior primeiro)
-        dados_tabela.sort(key=lambda x: x['estoque_atual'], reverse=True)
-
-        return dados_tabela[:20]
+        return [
+            {
+                'produto': produto['nome'],
+                'categoria': produto['categoria'],
+                'estoque_atual': produto['estoque'],
+                'estoque_minimo': produto['estoque_minimo'],
+                'ultima_venda': produto['ultima_venda'] or 'Nunca',
+                'dias_sem_venda': produto['dias_sem_venda'] if produto['dias_sem_venda'] is not None else 'Sem vendas',
+                'tipo': 'estoque_parado'
+            }
+            for produto in estoque_parado[:20]
+        ]
 
     except Exception as e:
         print(f"Erro em obter_dados_tabela_estoque_parado: {e}")
@@ -410,36 +368,23 @@ def obter_dados_tabela_estoque_parado():
 
 # ========== FUNÇÕES PARA RENTABILIDADE ==========
 
-def obter_dados_rentabilidade_periodo(vendas, data_inicio, data_fim):
-    """Gera dados para gráfico de rentabilidade por período"""
+def obter_dados_rentabilidade_periodo(fatos, data_inicio, data_fim, granularidade='semana'):
+    """Gera dados para gráfico de rentabilidade por dia, semana ISO ou mês, numa única consulta"""
     try:
-        # Agrupar por semana
-        rentabilidade_por_semana = {}
-        current_date = data_inicio
-        semana_num = 1
-
-        while current_date <= data_fim:
-            fim_semana = min(current_date + timedelta(days=6), data_fim)
-
-            vendas_semana = vendas.filter(
-                data_venda__date__range=[current_date, fim_semana]
-            )
-
-            faturamento_semana = vendas_semana.aggregate(total=Sum('total'))['total'] or Decimal('0.00')
-            custo_semana = faturamento_semana * Decimal('0.6')  # 60% de custo
-            lucro_semana = faturamento_semana - custo_semana
-
-            rentabilidade_por_semana[f"Sem {semana_num}"] = {
-                'faturamento': faturamento_semana,
-                'lucro': lucro_semana
-            }
+        rentabilidade = {
+            linha['periodo']: linha
+            for linha in resumo_do_fato_por(fatos, granularidade=granularidade)
+        }
 
-            current_date = fim_semana + timedelta(days=1)
-            semana_num += 1
+        categorias = []
+        dados_lucro = []
+        dados_faturamento = []
 
-        categorias = list(rentabilidade_por_semana.keys())
-        dados_lucro = [float(dados['lucro']) for dados in rentabilidade_por_semana.values()]
-        dados_faturamento = [float(dados['faturamento']) for dados in rentabilidade_por_semana.values()]
+        for periodo in periodos_entre(data_inicio, data_fim, granularidade):
+            linha = rentabilidade.get(periodo, {'faturamento': 0, 'lucro': 0})
+            categorias.append(ROTULOS_PERIODO[granularidade](periodo))
+            dados_faturamento.append(float(linha['faturamento']))
+            dados_lucro.append(float(linha['lucro']))
 
         return {
             'categories': categorias,
@@ -462,22 +407,17 @@ def obter_dados_rentabilidade_periodo(vendas, data_inicio, data_fim):
         return {'categories': [], 'series': []}
 
 
-def obter_dados_tabela_rentabilidade(vendas):
+def obter_dados_tabela_rentabilidade(fatos):
     """Gera dados para tabela de rentabilidade"""
     try:
-        # Agrupar por dia
-        vendas_por_dia = {}
-        for venda in vendas:
-            data = venda.data_venda.date()
-            if data not in vendas_por_dia:
-                vendas_por_dia[data] = []
-            vendas_por_dia[data].append(venda)
+        # Totais por dia local, agrupados no banco
+        totais = obter_totais_por_dia(fatos)
 
         dados_tabela = []
-        for data, vendas_dia in sorted(vendas_por_dia.items(), reverse=True)[:7]:
-            total_vendas_dia = sum(v.total for v in vendas_dia)
-            custo_dia = total_vendas_dia * Decimal('0.6')
-            lucro_dia = total_vendas_dia - custo_dia
+        for data in sorted(totais, reverse=True)[:7]:
+            total_vendas_dia = totais[data]['faturamento']
+            custo_dia = totais[data]['custo']
+            lucro_dia = totais[data]['lucro']
             margem = (lucro_dia / total_vendas_dia * 100) if total_vendas_dia > 0 else Decimal('0.00')
 
             # Status baseado na margem
@@ -511,19 +451,18 @@ def obter_dados_tabela_rentabilidade(vendas):
 
 # ========== FUNÇÕES COMPARTILHADAS ==========
 
-def obter_dados_grafico_rentabilidade(vendas):
-    """Gera dados para o gráfico de rentabilidade por categoria"""
-    try:
-        itens_venda = ItemVenda.objects.filter(venda__in=vendas).select_related('produto__categoria')
+def obter_totais_por_dia(fatos):
+    """Faturamento, custo real (CMV) e lucro por dia local, numa única consulta agrupada"""
+    return {linha['periodo']: linha for linha in resumo_do_fato_por(fatos, granularidade='dia')}
 
-        lucro_por_categoria = {}
-        for item in itens_venda:
-            categoria_nome = item.produto.categoria.nome if item.produto.categoria else "Sem Categoria"
-            lucro_item = item.subtotal * Decimal('0.4')  # 40% de margem
 
-            if categoria_nome not in lucro_por_categoria:
-                lucro_por_categoria[categoria_nome] = Decimal('0.00')
-            lucro_por_categoria[categoria_nome] += lucro_item
+def obter_dados_grafico_rentabilidade(fatos):
+    """Gera dados para o gráfico de rentabilidade por categoria"""
+    try:
+        lucro_por_categoria = {
+            linha['categoria__nome'] or "Sem Categoria": linha['lucro']
+            for linha in resumo_do_fato_por(fatos, 'categoria__nome')
+        }
 
         # Converter para formato do gráfico
         dados = []
@@ -544,35 +483,24 @@ def obter_dados_grafico_rentabilidade(vendas):
         return {'series': []}
 
 
-def obter_dados_tabela(vendas):
+def obter_dados_tabela(fatos):
     """Gera dados reais para a tabela de relatórios (vendas por período)"""
     try:
         dados = []
 
-        # Agrupar vendas por dia
-        vendas_por_dia = {}
-        for venda in vendas:
-            data = venda.data_venda.date()
-            if data not in vendas_por_dia:
-                vendas_por_dia[data] = {
-                    'vendas': [],
-                    'total_vendas': Decimal('0.00'),
-                    'atendentes': set()
-                }
-            vendas_por_dia[data]['vendas'].append(venda)
-            vendas_por_dia[data]['total_vendas'] += venda.total
-            vendas_por_dia[data]['atendentes'].add(venda.atendente)
+        # Totais por dia local, agrupados no banco
+        totais = obter_totais_por_dia(fatos)
 
         # Ordenar por data (mais recente primeiro)
-        datas_ordenadas = sorted(vendas_por_dia.keys(), reverse=True)
+        datas_ordenadas = sorted(totais, reverse=True)[:7]
+        atendentes = atendentes_do_fato(fatos, datas_ordenadas)
 
-        for data in datas_ordenadas[:7]:
-            info = vendas_por_dia[data]
-            total_vendas = info['total_vendas']
+        for data in datas_ordenadas:
+            total_vendas = totais[data]['faturamento']
 
             # Calcular custo e lucro
-            custo = total_vendas * Decimal('0.6')
-            lucro = total_vendas - custo
+            custo = totais[data]['custo']
+            lucro = totais[data]['lucro']
             margem = (lucro / total_vendas * 100) if total_vendas > 0 else Decimal('0.00')
 
             # Determinar status
@@ -587,7 +515,7 @@ def obter_dados_tabela(vendas):
                 status_cor = 'red'
 
             # Atendentes do dia
-            atendentes_nomes = [a.get_full_name() or a.username for a in info['atendentes']]
+            atendentes_nomes = atendentes.get(data, [])
             nome_atendente = ', '.join(atendentes_nomes) if atendentes_nomes else 'N/A'
 
             dados.append({
@@ -608,12 +536,3 @@ def obter_dados_tabela(vendas):
         print(f"Erro em obter_dados_tabela: {e}")
         return []
 
-
-def calcular_custo_total(vendas):
-    """Calcula o custo total das vendas"""
-    try:
-        faturamento_total = vendas.aggregate(Sum('total'))['total__sum'] or Decimal('0.00')
-        return faturamento_total * Decimal('0.6')
-    except Exception as e:
-        print(f"Erro em calcular_custo_total: {e}")
-        return Decimal('0.00')
\ No newline at end of file
@@ -0,0 +1,49 @@
+// static/js/exportacoes.js
+// Formulários com data-exportacao: pedem o relatório em segundo plano,
+// mostram o progresso no botão e iniciam o download quando o arquivo fica pronto.
+(function () {
+    const INTERVALO_MS = 1500;
+
+    async function pedir(url, opcoes = {}) {
+        const response = await fetch(url, {
+            ...opcoes,
+            headers: { 'X-Requested-With': 'XMLHttpRequest' }
+        });
+        if (!response.ok) {
+            throw new Error('Erro na rede: ' + response.status);
+        }
+        return response.json();
+    }
+
+    const esperar = ms => new Promise(resolve => setTimeout(resolve, ms));
+
+    document.addEventListener('submit', async function (event) {
+        const form = event.target.closest('form[data-exportacao]');
+        if (!form) return;
+        event.preventDefault();
+
+        const botao = form.querySelector('button[type="submit"]');
+        const rotulo = form.querySelector('[data-rotulo]') || botao;
+        const textoOriginal = rotulo.textContent;
+        botao.disabled = true;
+
+        try {
+            let estado = await pedir(form.action, { method: 'POST', body: new FormData(form) });
+            while (!estado.url_download) {
+                if (estado.status === 'erro') {
+                    throw new Error(estado.erro);
+                }
+                rotulo.textContent = `Gerando... ${estado.progresso}%`;
+                await esperar(INTERVALO_MS);
+                estado = await pedir(estado.url_status);
+            }
+            window.location = estado.url_download;
+        } catch (error) {
+            console.error('Erro:', error);
+            alert('❌ ' + (error.message || 'Erro ao gerar o relatório.'));
+        } finally {
+            rotulo.textContent = textoOriginal;
+            botao.disabled = false;
+        }
+    });
+})();
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.db.models import Sum, F, DecimalField, ExpressionWrapper
-from vendas.models import Venda, ItemVenda
+from vendas.models import Venda, ItemVenda, ItemVendaLote
 
 
 class ItemVendaInline(admin.TabularInline):
@@ -45,3 +45,10 @@ class ItemVendaAdmin(admin.ModelAdmin):
     def mostrar_subtotal(self, obj):
         return obj.subtotal
     mostrar_subtotal.short_description = "Subtotal"
+
+
+@admin.register(ItemVendaLote)
+class ItemVendaLoteAdmin(admin.ModelAdmin):
+    list_display = ('item_venda', 'lote', 'quantidade')
+    list_select_related = ('item_venda__produto', 'lote__produto')
+    search_fields = ('lote__numero_lote', 'item_venda__venda__id')
@@ -0,0 +1,178 @@
+# vendas/carrinho.py
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+
+from core.cache import cache_compartilhado
+from .services import disponibilidade
+
+# Onde o carrinho fica guardado: 'sessao' (padrão) ou 'cache', que não reescreve a sessão
+CARRINHO_BACKEND = getattr(settings, 'CARRINHO_BACKEND', 'sessao')
+
+
+class _BackendSessao:
+    """Guarda o carrinho compacto na sessão"""
+    CHAVE = 'carrinho'
+
+    def __init__(self, request):
+        self.session = request.session
+
+    def carregar(self):
+        return self.session.get(self.CHAVE)
+
+    def gravar(self, itens):
+        self.session[self.CHAVE] = itens
+
+
+class _BackendCache:
+    """
+    Guarda o carrinho no cache, por sessão, sem reescrever a sessão: dois caixas
+    com a mesma conta têm carrinhos separados e o carrinho some no logout.
+    Exige um cache compartilhado entre os processos (Redis, Memcached, banco).
+    """
+
+    def __init__(self, request):
+        if not cache_compartilhado():
+            raise ImproperlyConfigured(
+                "CARRINHO_BACKEND='cache' exige um cache compartilhado: com o LocMemCache "
+                "cada worker teria o seu carrinho. Configure CACHES ou use 'sessao'."
+            )
+        if request.session.session_key is None:
+            request.session.save()
+        self.chave = f"carrinho:{request.session.session_key}"
+
+    def carregar(self):
+        return cache.get(self.chave)
+
+    def gravar(self, itens):
+        cache.set(self.chave, itens, settings.SESSION_COOKIE_AGE)
+
+
+BACKENDS = {'sessao': _BackendSessao, 'cache': _BackendCache}
+
+
+class Carrinho:
+    """
+    Carrinho do PDV. Guarda apenas {"produto_id:unidade": quantidade}, com acesso
+    direto por (produto_id, unidade); nomes, preços e estoque são carregados
+    numa única consulta por linhas().
+    """
+
+    def __init__(self, request):
+        self.backend = BACKENDS[CARRINHO_BACKEND](request)
+        self._linhas = None
+
+        itens = self.backend.carregar()
+        if itens is None:
+            itens = self._converter_legado(request.session.pop('cart', None) or [])
+            if itens:
+                self.backend.gravar(itens)
+        self.itens = itens
+
+    @staticmethod
+    def _converter_legado(cart):
+        """Converte o carrinho antigo (lista de dicts em session['cart'])"""
+        itens = {}
+        for item in cart:
+            chave = Carrinho._chave(item['id'], item.get('unidade', 'carteira'))
+            itens[chave] = itens.get(chave, 0) + int(item.get('quantidade', 1))
+        return itens
+
+    @staticmethod
+    def _chave(produto_id, unidade):
+        return f"{int(produto_id)}:{unidade}"
+
+    def _salvar(self):
+        self._linhas = None
+        self.backend.gravar(self.itens)
+
+    # ========== ACESSO ==========
+
+    def __len__(self):
+        return len(self.itens)
+
+    def __iter__(self):
+        """(produto_id, unidade, quantidade) de cada linha"""
+        for chave, quantidade in self.itens.items():
+            produto_id, unidade = chave.split(':', 1)
+            yield int(produto_id), unidade, quantidade
+
+    def quantidade(self, produto_id, unidade):
+        return self.itens.get(self._chave(produto_id, unidade), 0)
+
+    def unidades_do_produto(self, produto_id):
+        return [unidade for pid, unidade, _quantidade in self if pid == int(produto_id)]
+
+    # ========== ALTERAÇÕES ==========
+
+    def definir(self, produto_id, unidade, quantidade):
+        self.itens[self._chave(produto_id, unidade)] = quantidade
+        self._salvar()
+
+    def adicionar(self, produto_id, unidade, quantidade):
+        self.definir(produto_id, unidade, self.quantidade(produto_id, unidade) + quantidade)
+
+    def remover(self, produto_id, unidade=None):
+        """Remove a linha da unidade informada, ou todas as linhas do produto"""
+        unidades = [unidade] if unidade else self.unidades_do_produto(produto_id)
+        for u in unidades:
+            self.itens.pop(self._chave(produto_id, u), None)
+        self._salvar()
+
+    def limpar(self):
+        self.itens = {}
+        self._salvar()
+
+    # ========== DADOS PARA EXIBIÇÃO E VENDA ==========
+
+    def linhas(self):
+        """
+        Linhas do carrinho com os dados do produto (um único SELECT), no formato
+        usado pelo template e por alocar_fefo. Produtos excluídos saem do carrinho.
+        """
+        if self._linhas is not None:
+            return self._linhas
+
+        produtos = disponibilidade({produto_id for produto_id, _unidade, _quantidade in self})
+
+        linhas = []
+        removidos = []
+        for produto_id, unidade, quantidade in self:
+            produto = produtos.get(produto_id)
+            if produto is None:
+                removidos.append(self._chave(produto_id, unidade))
+                continue
+
+            if unidade == 'caixa':
+                preco = produto.preco_venda
+                estoque = produto.estoque_disponivel // (produto.carteiras_por_caixa or 1)
+            else:
+                preco = produto.preco_carteira_calculado
+                estoque = produto.estoque_disponivel
+            preco = float(preco) if preco else 0.0
+
+            linhas.append({
+                'id': produto.id,
+                'nome': produto.nome,
+                'codigo_barras': produto.codigo_barras,
+                'categoria_nome': produto.categoria.nome if produto.categoria else 'Sem categoria',
+                'categoria_tipo': produto.categoria.tipo if produto.categoria else '',
+                'estoque_total': estoque,
+                'unidade': unidade,
+                'quantidade': quantidade,
+                'controlado': produto.controlado,
+                'preco_venda': preco,
+                'subtotal': preco * quantidade,
+            })
+
+        if removidos:
+            for chave in removidos:
+                del self.itens[chave]
+            self.backend.gravar(self.itens)
+
+        self._linhas = linhas
+        return linhas
+
+    @property
+    def total(self):
+        return sum(linha['subtotal'] for linha in self.linhas())
@@ -0,0 +1,156 @@
+# vendas/escpos.py
+import io
+import re
+
+from PIL import Image, ImageOps
+
+ESC = b'\x1b'
+GS = b'\x1d'
+
+# Colunas da fonte A numa impressora de 80mm (58mm: 32)
+COLUNAS = 48
+CODIFICACAO = 'cp860'  # página de código portuguesa (ESC t 3)
+
+# Linhas do recibo_termico.txt que saem em negrito
+PREFIXOS_NEGRITO = ('FARMACIA', 'Total:', 'VD ')
+
+_SEPARADOR = re.compile(r'^[\s-]+-[\s-]*$')
+_ESPACOS = re.compile(r' {2,}')
+
+
+class ComandosEscPos:
+    """Monta o fluxo de bytes ESC/POS de um recibo"""
+
+    def __init__(self, colunas=COLUNAS):
+        self.colunas = colunas
+        self.buffer = bytearray(ESC + b'@' + ESC + b't\x03')  # inicializar + CP860
+
+    def texto(self, linha=''):
+        self.buffer += linha.encode(CODIFICACAO, errors='replace') + b'\n'
+        return self
+
+    def negrito(self, ativo=True):
+        self.buffer += ESC + b'E' + (b'\x01' if ativo else b'\x00')
+        return self
+
+    def alinhar(self, posicao='esquerda'):
+        self.buffer += ESC + b'a' + bytes([{'esquerda': 0, 'centro': 1, 'direita': 2}[posicao]])
+        return self
+
+    def raster(self, dados):
+        """Imagem já convertida por raster_imagem()"""
+        self.buffer += dados
+        return self
+
+    def avancar(self, linhas=1):
+        self.buffer += ESC + b'd' + bytes([linhas])
+        return self
+
+    def cortar(self, parcial=True):
+        self.buffer += GS + b'V' + (b'\x01' if parcial else b'\x00')
+        return self
+
+    def bytes(self):
+        return bytes(self.buffer)
+
+
+def raster_imagem(img):
+    """Converte uma imagem PIL no comando GS v 0 (bitmap de 1 bit por ponto)"""
+    largura = (img.width + 7) // 8 * 8
+    fundo = Image.new('L', (largura, img.height), 255)
+    fundo.paste(img.convert('L'), (0, 0))
+    # Em GS v 0 o bit 1 é ponto impresso; no modo '1' do PIL, 1 é branco
+    bitmap = ImageOps.invert(fundo).convert('1')
+    x = largura // 8
+    return (
+        GS + b'v0\x00'
+        + bytes([x % 256, x // 256, img.height % 256, img.height // 256])
+        + bitmap.tobytes()
+    )
+
+
+def ajustar_linha(linha, colunas=COLUNAS):
+    """Encaixa a linha na largura do papel: separadores são recortados e os
+    espaços de alinhamento encolhidos, preservando a ordem das colunas"""
+    linha = linha.rstrip()
+    if len(linha) <= colunas:
+        return linha
+    if _SEPARADOR.match(linha):
+        return '-' * colunas
+    while len(linha) > colunas:
+        maior = max(_ESPACOS.finditer(linha), key=lambda m: len(m.group()), default=None)
+        if maior is None:
+            break
+        linha = linha[:maior.start()] + linha[maior.start() + 1:]
+    return linha
+
+
+def texto_para_escpos(texto, logo=b'', colunas=COLUNAS):
+    """Converte o texto do recibo em comandos ESC/POS: logo (raster pronto), negrito e corte"""
+    comandos = ComandosEscPos(colunas)
+    if logo:
+        comandos.alinhar('centro').raster(logo).texto().alinhar('esquerda')
+
+    for linha in texto.replace('\r\n', '\n').strip('\n').split('\n'):
+        linha = ajustar_linha(linha, colunas)
+        if linha.lstrip().startswith(PREFIXOS_NEGRITO):
+            comandos.negrito().texto(linha).negrito(False)
+        else:
+            comandos.texto(linha)
+
+    return comandos.avancar(4).cortar().bytes()
+
+
+class ImpressoraMemoria(io.BytesIO):
+    """
+    Impressora de teste: recebe o mesmo fluxo de bytes que uma impressora
+    térmica (write) e interpreta os comandos usados por ComandosEscPos.
+    """
+
+    # Bytes de parâmetro de cada comando de tamanho fixo
+    PARAMETROS = {ESC + b'@': 0, ESC + b't': 1, ESC + b'E': 1, ESC + b'a': 1, ESC + b'd': 1, GS + b'V': 1}
+
+    def comandos(self):
+        """Lista de ('texto', str) e (comando, parâmetros) na ordem recebida"""
+        dados = self.getvalue()
+        resultado = []
+        texto = bytearray()
+        i = 0
+        while i < len(dados):
+            prefixo = dados[i:i + 2]
+            if (prefixo == GS + b'v' or prefixo in self.PARAMETROS) and texto:
+                resultado.append(('texto', texto.decode(CODIFICACAO)))
+                texto = bytearray()
+
+            if prefixo == GS + b'v':
+                x = dados[i + 4] + dados[i + 5] * 256
+                y = dados[i + 6] + dados[i + 7] * 256
+                resultado.append(('raster', (x * 8, y)))
+                i += 8 + x * y
+            elif prefixo in self.PARAMETROS:
+                n = self.PARAMETROS[prefixo]
+                resultado.append((prefixo, dados[i + 2:i + 2 + n]))
+                i += 2 + n
+            else:
+                texto.append(dados[i])
+                i += 1
+        if texto:
+            resultado.append(('texto', texto.decode(CODIFICACAO)))
+        return resultado
+
+    def texto(self):
+        return ''.join(valor for comando, valor in self.comandos() if comando == 'texto')
+
+    def linhas_negrito(self):
+        linhas = []
+        negrito = False
+        for comando, valor in self.comandos():
+            if comando == ESC + b'E':
+                negrito = valor == b'\x01'
+            elif comando == 'texto' and negrito:
+                linhas.append(valor.rstrip('\n'))
+        return linhas
+
+    @property
+    def cortes(self):
+        return sum(1 for comando, _valor in self.comandos() if comando == GS + b'V')
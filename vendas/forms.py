@@ -3,6 +3,7 @@ from django.core.exceptions import ValidationError
 
 from clientes.models import Cliente
 from productos.models import Produto
+from productos.busca import resolver_codigo_barras
 from vendas.models import ItemVenda, Venda
 
 
@@ -20,9 +21,11 @@ class ItemVendaForm(forms.ModelForm):
     def clean_produto_codigo(self):
         codigo = self.cleaned_data['produto_codigo']
         try:
-            produto = Produto.objects.get(codigo_barras=codigo)
+            produto = Produto.objects.get(pk=resolver_codigo_barras(codigo))
         except Produto.DoesNotExist:
             raise ValidationError("Produto não encontrado")
+        except Produto.MultipleObjectsReturned as e:
+            raise ValidationError(str(e))
 
         return produto
 
@@ -1,70 +1,123 @@
-<<<<<<< HEAD
 # management/commands/limpar_lotes_vencidos.py
+from decimal import Decimal, ROUND_HALF_UP
+
 from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Max, Min, Sum, Value
+from django.db.models.functions import Coalesce, NullIf
 from django.utils import timezone
-from vendas.models import Lote
+
+from productos.models import BaixaVencimento, Lote, ProdutoEstoqueResumo
+
+
+def custo_da_baixa(unidades, preco_compra, carteiras_por_caixa):
+    """Custo das carteiras baixadas, com o mesmo custo por carteira de Produto.custo_por_unidade"""
+    por_carteira = (Decimal(str(preco_compra or 0)) / Decimal(carteiras_por_caixa or 1)).quantize(
+        Decimal("0.0001"), rounding=ROUND_HALF_UP
+    )
+    return (por_carteira * unidades).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
 
 
 class Command(BaseCommand):
-    help = 'Remove do estoque todos os lotes vencidos'
+    help = 'Remove do estoque todos os lotes vencidos, registrando a baixa de cada um'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Mostra o que seria baixado sem alterar nada')
+        parser.add_argument('--lote', type=int, default=10000, help='Faixa de ids de lotes por transação')
 
     def handle(self, *args, **options):
-        hoje = timezone.now().date()
+        hoje = timezone.localdate()
 
-        # Buscar lotes vencidos com estoque
-        lotes_vencidos = Lote.objects.filter(
-            data_validade__lt=hoje,
-            quantidade_disponivel__gt=0
+        vencidos = Lote.objects.filter(data_validade__lt=hoje, quantidade_disponivel__gt=0)
+        resumo = vencidos.aggregate(
+            total_lotes=Count('id'),
+            total_unidades=Sum('quantidade_disponivel'),
+            total_custo=Sum(
+                # carteiras_por_caixa=0 conta como 1, como em custo_da_baixa
+                F('quantidade_disponivel') * F('produto__preco_compra')
+                / Coalesce(NullIf(F('produto__carteiras_por_caixa'), 0), Value(1)),
+                output_field=DecimalField(max_digits=14, decimal_places=2),
+            ),
+            primeiro=Min('id'),
+            ultimo=Max('id'),
         )
 
-        total_lotes = lotes_vencidos.count()
-        total_unidades = sum(lote.quantidade_disponivel for lote in lotes_vencidos)
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(
+                f"🔎 Simulação: {resumo['total_lotes']} lotes vencidos seriam removidos do estoque "
+                f"({resumo['total_unidades'] or 0} unidades, custo aproximado "
+                f"{(resumo['total_custo'] or 0):.2f} MT)."
+            ))
+            return
 
-        # Zerar os lotes vencidos
-        for lote in lotes_vencidos:
-            lote.quantidade_disponivel = 0
-            lote.nr_caixas = 0
-            lote.nr_carteiras = 0
-            lote.save()
+        if not resumo['total_lotes']:
+            self.stdout.write(self.style.SUCCESS("✅ Nenhum lote vencido com estoque."))
+            return
+
+        tamanho = max(options['lote'], 1)
+        total_lotes = total_unidades = 0
+        total_custo = Decimal('0.00')
+        produtos = set()
+
+        for inicio in range(resumo['primeiro'], resumo['ultimo'] + 1, tamanho):
+            lotes, unidades, custo, produto_ids = self._baixar_faixa(vencidos, inicio, inicio + tamanho)
+            total_lotes += lotes
+            total_unidades += unidades
+            total_custo += custo
+            produtos |= produto_ids
+
+        # O UPDATE em massa não passa por Lote.save: atualiza os resumos de uma vez
+        produtos = sorted(produtos)
+        for i in range(0, len(produtos), 500):
+            ProdutoEstoqueResumo.recalcular(produtos[i:i + 500])
 
         self.stdout.write(
             self.style.SUCCESS(
                 f"✅ {total_lotes} lotes vencidos removidos do estoque. "
-                f"Total de {total_unidades} unidades bloqueadas para venda."
+                f"Total de {total_unidades} unidades bloqueadas para venda "
+                f"(custo {total_custo} MT)."
+            )
+        )
+
+    @transaction.atomic
+    def _baixar_faixa(self, vencidos, inicio, fim):
+        """Registra as baixas e zera os lotes vencidos com id em [inicio, fim): um SELECT, um INSERT e um UPDATE"""
+        linhas = list(
+            vencidos.filter(id__gte=inicio, id__lt=fim).select_for_update(of=('self',)).values_list(
+                'id', 'produto_id', 'numero_lote', 'data_validade', 'quantidade_disponivel',
+                'nr_caixas', 'nr_carteiras', 'produto__preco_compra', 'produto__carteiras_por_caixa',
+            )
+        )
+        if not linhas:
+            return 0, 0, Decimal('0.00'), set()
+
+        agora = timezone.now()
+        baixas = [
+            BaixaVencimento(
+                lote_id=lote_id,
+                produto_id=produto_id,
+                numero_lote=numero,
+                data_validade=validade,
+                unidades=unidades,
+                nr_caixas=caixas,
+                nr_carteiras=carteiras,
+                custo=custo_da_baixa(unidades, preco_compra, carteiras_por_caixa),
+                data_baixa=agora,
             )
-=======
-# management/commands/limpar_lotes_vencidos.py
-from django.core.management.base import BaseCommand
-from django.utils import timezone
-from vendas.models import Lote
-
-
-class Command(BaseCommand):
-    help = 'Remove do estoque todos os lotes vencidos'
-
-    def handle(self, *args, **options):
-        hoje = timezone.now().date()
-
-        # Buscar lotes vencidos com estoque
-        lotes_vencidos = Lote.objects.filter(
-            data_validade__lt=hoje,
-            quantidade_disponivel__gt=0
-        )
-
-        total_lotes = lotes_vencidos.count()
-        total_unidades = sum(lote.quantidade_disponivel for lote in lotes_vencidos)
-
-        # Zerar os lotes vencidos
-        for lote in lotes_vencidos:
-            lote.quantidade_disponivel = 0
-            lote.nr_caixas = 0
-            lote.nr_carteiras = 0
-            lote.save()
-
-        self.stdout.write(
-            self.style.SUCCESS(
-                f"✅ {total_lotes} lotes vencidos removidos do estoque. "
-                f"Total de {total_unidades} unidades bloqueadas para venda."
-            )
->>>>>>> 8ee2a60a377de4eaa26bac496a615fc73297c848
-        )
\ No newline at end of file
+            for lote_id, produto_id, numero, validade, unidades, caixas, carteiras, preco_compra, carteiras_por_caixa
+            in linhas
+        ]
+        BaixaVencimento.objects.bulk_create(baixas)
+
+        # Só os lotes travados e registrados acima: um lote que venceu com estoque depois
+        # do SELECT (ex.: estorno) fica para a próxima execução, com a sua baixa
+        Lote.objects.filter(pk__in=[linha[0] for linha in linhas]).update(
+            quantidade_disponivel=0, nr_caixas=0, nr_carteiras=0, data_atualizacao=agora
+        )
+
+        return (
+            len(baixas),
+            sum(baixa.unidades for baixa in baixas),
+            sum((baixa.custo for baixa in baixas), Decimal('0.00')),
+            {baixa.produto_id for baixa in baixas},
+        )
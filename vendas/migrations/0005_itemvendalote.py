@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-17 15:32
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0013_produto_nome_id_idx'),
+        ('vendas', '0004_alter_itemvenda_options_itemvenda_data_criacao_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemVendaLote',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantidade', models.PositiveIntegerField(validators=[django.core.validators.MinValueValidator(1)])),
+                ('item_venda', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alocacoes', to='vendas.itemvenda')),
+                ('lote', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='alocacoes', to='productos.lote')),
+            ],
+            options={
+                'verbose_name': 'Alocação de Lote',
+                'verbose_name_plural': 'Alocações de Lote',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 15:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendas', '0005_itemvendalote'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='itemvenda',
+            name='custo_unitario',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True),
+        ),
+    ]
@@ -0,0 +1,41 @@
+from django.db import migrations
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, NullIf
+
+
+def preencher_custo_unitario(apps, schema_editor):
+    """Itens antigos: usa o preço de compra atual do produto como melhor estimativa do custo"""
+    ItemVenda = apps.get_model('vendas', 'ItemVenda')
+    Produto = apps.get_model('productos', 'Produto')
+    custo = DecimalField(max_digits=12, decimal_places=4)
+
+    produtos = Produto.objects.filter(pk=OuterRef('produto_id'))
+    pendentes = ItemVenda.objects.filter(custo_unitario__isnull=True)
+
+    pendentes.filter(unidade='caixa').update(
+        custo_unitario=Subquery(produtos.values('preco_compra')[:1], output_field=custo)
+    )
+    # carteiras_por_caixa=0 (importações que pulam o clean) conta como 1, igual a custo_por_unidade
+    pendentes.exclude(unidade='caixa').update(
+        custo_unitario=Subquery(
+            produtos.annotate(
+                custo_carteira=ExpressionWrapper(
+                    F('preco_compra') / Coalesce(NullIf(F('carteiras_por_caixa'), 0), Value(1)),
+                    output_field=custo,
+                )
+            ).values('custo_carteira')[:1],
+            output_field=custo,
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vendas', '0006_itemvenda_custo_unitario'),
+        ('productos', '0013_produto_nome_id_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(preencher_custo_unitario, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-17 17:25
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def preencher_categoria(apps, schema_editor):
+    """Itens antigos: a categoria atual do produto é a melhor estimativa da categoria na venda"""
+    ItemVenda = apps.get_model('vendas', 'ItemVenda')
+    Produto = apps.get_model('productos', 'Produto')
+    ItemVenda.objects.filter(categoria__isnull=True).update(
+        categoria=Subquery(Produto.objects.filter(pk=OuterRef('produto_id')).values('categoria')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0017_baixa_vencimento'),
+        ('vendas', '0007_preencher_custo_unitario'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='itemvenda',
+            name='categoria',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='itens_venda', to='productos.categoria'),
+        ),
+        migrations.RunPython(preencher_categoria, migrations.RunPython.noop),
+    ]
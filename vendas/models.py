@@ -5,7 +5,7 @@ from django.db import models
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 from clientes.models import Cliente
-from productos.models import Lote, Produto
+from productos.models import Categoria, Lote, Produto
 
 
 class Venda(models.Model):
@@ -58,6 +58,13 @@ class ItemVenda(models.Model):
     preco_unitario = models.DecimalField(max_digits=10, decimal_places=2)
     unidade = models.CharField(max_length=10, choices=UNIDADE_CHOICES, default="carteira")
 
+    # Custo de compra da unidade vendida no momento da venda (caixa ou carteira)
+    custo_unitario = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True)
+    # Categoria do produto no momento da venda: chave do item no fato diário (VendaDiaria)
+    categoria = models.ForeignKey(
+        Categoria, on_delete=models.SET_NULL, null=True, blank=True, related_name='itens_venda'
+    )
+
     # ✅ SOLUÇÃO SIMPLES: Usar default em vez de auto_now_add
     data_criacao = models.DateTimeField(default=timezone.now)
 
@@ -72,11 +79,38 @@ class ItemVenda(models.Model):
             else:  # carteira
                 self.preco_unitario = self.produto.preco_carteira_calculado
 
+        if self.custo_unitario is None and self.produto:
+            self.custo_unitario = self.produto.custo_por_unidade(self.unidade)
+
+        if self.pk is None and self.categoria_id is None and self.produto:
+            self.categoria_id = self.produto.categoria_id
+
         super().save(*args, **kwargs)
 
     @property
     def subtotal(self):
         return (self.preco_unitario or Decimal('0.00')) * (self.quantidade or 1)
 
+    @property
+    def custo_total(self):
+        return (self.custo_unitario or Decimal('0.00')) * (self.quantidade or 1)
+
+    @property
+    def lucro(self):
+        return self.subtotal - self.custo_total
+
+    def __str__(self):
+        return f"{self.quantidade} {self.unidade}(s) de {self.produto.nome}"
+
+class ItemVendaLote(models.Model):
+    """Quantas unidades (carteiras) de cada lote foram baixadas para um item da venda"""
+    item_venda = models.ForeignKey(ItemVenda, on_delete=models.CASCADE, related_name="alocacoes")
+    lote = models.ForeignKey(Lote, on_delete=models.SET_NULL, null=True, related_name="alocacoes")
+    quantidade = models.PositiveIntegerField(validators=[MinValueValidator(1)])
+
+    class Meta:
+        verbose_name = "Alocação de Lote"
+        verbose_name_plural = "Alocações de Lote"
+
     def __str__(self):
-        return f"{self.quantidade} {self.unidade}(s) de {self.produto.nome}"
\ No newline at end of file
+        return f"{self.quantidade} un. do lote {self.lote_id} para o item {self.item_venda_id}"
@@ -0,0 +1,111 @@
+# vendas/recibos.py
+import io
+import os
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from PIL import Image, ImageDraw, ImageFont
+
+from .escpos import raster_imagem, texto_para_escpos
+
+LARGURA_RECIBO = 400
+LOGO_RECIBO = os.path.join(settings.BASE_DIR, 'core/static/img/logo.png')
+
+# Recibos de vendas finalizadas não mudam: ficam no cache até a venda ser alterada
+TEMPO_CACHE_RECIBO = 60 * 60 * 24 * 7
+
+
+# ========== RECURSOS CARREGADOS UMA VEZ POR PROCESSO ==========
+
+@lru_cache(maxsize=1)
+def _fonte():
+    try:
+        return ImageFont.truetype("Courier", 17)
+    except IOError:
+        return ImageFont.load_default(size=18)
+
+
+@lru_cache(maxsize=1)
+def _logo():
+    """Logo já convertido e reduzido; None se o arquivo não existir"""
+    try:
+        logo = Image.open(LOGO_RECIBO).convert("RGB")
+    except (IOError, OSError):
+        return None
+    logo.thumbnail((200, 200))
+    return logo
+
+
+@lru_cache(maxsize=1)
+def _logo_raster():
+    """Logo convertido para o comando raster da impressora térmica"""
+    logo = _logo()
+    return raster_imagem(logo) if logo else b''
+
+
+# ========== RENDERIZAÇÃO ==========
+
+def texto_recibo(venda):
+    return render_to_string('vendas/recibo_termico.txt', {'venda': venda})
+
+
+def versao_recibo(venda):
+    """Identifica a versão do recibo: id da venda + última alteração"""
+    return f"{venda.pk}-{int(venda.data_atualizacao.timestamp() * 1_000_000)}"
+
+
+def etag_recibo(venda, formato='png'):
+    return f'"recibo-{versao_recibo(venda)}-{formato}"'
+
+
+def renderizar_recibo_png(venda):
+    """Desenha o recibo térmico (logo + texto) e devolve os bytes do PNG"""
+    texto = texto_recibo(venda)
+    fonte = _fonte()
+    logo = _logo()
+
+    topo_texto = logo.height + 20 if logo else 10
+    _, _, _, altura_texto = ImageDraw.Draw(Image.new("RGB", (1, 1))).multiline_textbbox(
+        (0, 0), texto, font=fonte, spacing=4
+    )
+    altura = max(topo_texto + altura_texto + 10, 100)
+
+    img = Image.new("RGB", (LARGURA_RECIBO, altura), "white")
+    if logo:
+        img.paste(logo, ((LARGURA_RECIBO - logo.width) // 2, 10))
+    ImageDraw.Draw(img).multiline_text((10, topo_texto), texto, fill="black", font=fonte, spacing=4)
+
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def recibo_png(venda):
+    """PNG do recibo, gerado apenas na primeira impressão de cada versão da venda"""
+    chave = f"recibo_png:{versao_recibo(venda)}"
+    png = cache.get(chave)
+    if png is None:
+        png = renderizar_recibo_png(venda)
+        cache.set(chave, png, TEMPO_CACHE_RECIBO)
+    return png
+
+
+def recibo_escpos(venda, logo=True):
+    """Recibo como comandos ESC/POS para enviar direto à impressora térmica"""
+    chave = f"recibo_escpos:{versao_recibo(venda)}:{int(logo)}"
+    dados = cache.get(chave)
+    if dados is None:
+        dados = texto_para_escpos(texto_recibo(venda), logo=_logo_raster() if logo else b'')
+        cache.set(chave, dados, TEMPO_CACHE_RECIBO)
+    return dados
+
+
+def imprimir_escpos(venda, impressora, logo=True):
+    """
+    Envia o recibo para qualquer destino com write(): socket.makefile('wb') da
+    impressora de rede, o dispositivo USB aberto em 'wb' ou ImpressoraMemoria.
+    """
+    impressora.write(recibo_escpos(venda, logo))
+    impressora.flush()
@@ -0,0 +1,195 @@
+# vendas/services.py
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from productos.models import Produto, Lote, ProdutoEstoqueResumo
+from .models import ItemVenda, ItemVendaLote
+
+
+def converter_para_unidades(unidade, quantidade, produto):
+    """Converte uma quantidade em caixas ou carteiras para carteiras (unidades)"""
+    if unidade == "caixa":
+        return quantidade * (produto.carteiras_por_caixa or 1)
+    return quantidade
+
+
+def disponibilidade(produto_ids):
+    """
+    Estoque válido, estoque vencido e validade mais próxima de vários produtos numa
+    única consulta. Retorna {produto_id: Produto}; nos produtos retornados
+    estoque_disponivel, estoque_vencido, tem_vencido, validade_proxima e
+    alerta_validade não fazem novas consultas.
+    """
+    return Produto.objects.com_disponibilidade().select_related('categoria').in_bulk(
+        {int(produto_id) for produto_id in produto_ids}
+    )
+
+
+def alocar_fefo(venda, cart):
+    """
+    Baixa o estoque do carrinho por FEFO (primeiro a vencer, primeiro a sair)
+    e cria os itens da venda, registrando em ItemVendaLote de que lote saiu cada unidade.
+
+    Todos os lotes candidatos de todos os produtos são travados num único
+    SELECT ... FOR UPDATE ordenado; a alocação é planejada em memória e gravada
+    com um bulk_update dos lotes e um bulk_create dos itens e das alocações.
+    Deve ser chamada dentro de transaction.atomic(). Retorna os ItemVenda criados.
+    """
+    hoje = timezone.now().date()
+    produto_ids = {int(item["id"]) for item in cart}
+
+    produtos = Produto.objects.in_bulk(produto_ids)
+    if len(produtos) != len(produto_ids):
+        raise ValidationError("❌ Produto não encontrado!")
+
+    lotes = Lote.objects.select_for_update().filter(
+        produto_id__in=produto_ids,
+        quantidade_disponivel__gt=0
+    ).order_by("produto_id", "data_validade", "id")
+
+    lotes_validos = defaultdict(list)
+    estoque_vencido = defaultdict(int)
+    for lote in lotes:
+        if lote.data_validade > hoje:
+            lotes_validos[lote.produto_id].append(lote)
+        else:
+            estoque_vencido[lote.produto_id] += lote.quantidade_disponivel
+
+    # ✅ PASSO 1: Verificar estoque válido de cada produto
+    solicitado = defaultdict(int)
+    for item in cart:
+        produto_id = int(item["id"])
+        solicitado[produto_id] += converter_para_unidades(item["unidade"], item["quantidade"], produtos[produto_id])
+
+    for produto_id, total_unidades in solicitado.items():
+        estoque_valido_total = sum(lote.quantidade_disponivel for lote in lotes_validos[produto_id])
+        if estoque_valido_total < total_unidades:
+            produto = produtos[produto_id]
+            mensagem = f"❌ ESTOQUE INSUFICIENTE PARA {produto.nome.upper()}\n\n"
+            mensagem += f"📦 Solicitado: {total_unidades} unidades\n"
+            mensagem += f"✅ Disponível em lotes válidos: {estoque_valido_total} unidades\n"
+
+            if estoque_vencido[produto_id]:
+                mensagem += f"⚠️ Bloqueado (vencido): {estoque_vencido[produto_id]} unidades\n\n"
+                mensagem += "Os lotes vencidos foram removidos do estoque e não podem ser vendidos!"
+
+            raise ValidationError(mensagem)
+
+    # ✅ PASSO 2: Planejar a baixa em memória, linha a linha, pelos lotes que vencem primeiro
+    lotes_alterados = {}
+    itens = []
+    alocacoes = []
+    for item in cart:
+        produto = produtos[int(item["id"])]
+        restante = converter_para_unidades(item["unidade"], item["quantidade"], produto)
+        item_venda = ItemVenda(
+            venda=venda,
+            produto=produto,
+            quantidade=item["quantidade"],
+            preco_unitario=Decimal(str(item["preco_venda"])),
+            unidade=item["unidade"],
+            custo_unitario=produto.custo_por_unidade(item["unidade"]),
+            categoria_id=produto.categoria_id,
+        )
+
+        for lote in lotes_validos[produto.pk]:
+            if restante == 0:
+                break
+            if lote.quantidade_disponivel == 0:
+                continue
+
+            baixa = min(restante, lote.quantidade_disponivel)
+            lote.quantidade_disponivel -= baixa
+            restante -= baixa
+            lotes_alterados[lote.pk] = lote
+            alocacoes.append((item_venda, lote, baixa))
+
+        itens.append(item_venda)
+
+    # ✅ PASSO 3: Gravar tudo de uma vez
+    agora = timezone.now()
+    for lote in lotes_alterados.values():
+        carteiras_por_caixa = produtos[lote.produto_id].carteiras_por_caixa or 1
+        lote.nr_caixas, lote.nr_carteiras = divmod(lote.quantidade_disponivel, carteiras_por_caixa)
+        lote.data_atualizacao = agora
+
+    Lote.objects.bulk_update(
+        lotes_alterados.values(),
+        ["quantidade_disponivel", "nr_caixas", "nr_carteiras", "data_atualizacao"]
+    )
+    ItemVenda.objects.bulk_create(itens)
+    ItemVendaLote.objects.bulk_create(
+        ItemVendaLote(item_venda=item_venda, lote=lote, quantidade=quantidade)
+        for item_venda, lote, quantidade in alocacoes
+    )
+    ProdutoEstoqueResumo.recalcular(produto_ids)
+
+    return itens
+
+
+def estornar_venda(venda):
+    """
+    Devolve ao estoque as unidades baixadas pela venda, exatamente nos lotes
+    registrados em ItemVendaLote, com um bulk_update.
+
+    Itens sem registro (vendas anteriores ao registro de alocações, ou cujo lote
+    foi excluído) voltam para o primeiro lote válido do produto, como antes.
+    Deve ser chamada dentro de transaction.atomic(), antes de excluir a venda.
+    """
+    hoje = timezone.now().date()
+
+    devolucoes = defaultdict(int)
+    for alocacao in ItemVendaLote.objects.filter(
+        item_venda__venda=venda,
+        lote__isnull=False
+    ).values("lote_id").annotate(unidades=Sum("quantidade")).order_by():
+        devolucoes[alocacao["lote_id"]] += alocacao["unidades"]
+
+    # Unidades de cada item que não têm lote registrado
+    pendentes = defaultdict(int)
+    itens = ItemVenda.objects.filter(venda=venda).select_related("produto").annotate(
+        registrado=Sum("alocacoes__quantidade", filter=Q(alocacoes__lote__isnull=False))
+    )
+    for item in itens:
+        restante = converter_para_unidades(item.unidade, item.quantidade, item.produto)
+        restante -= item.registrado or 0
+        if restante > 0:
+            pendentes[item.produto] += restante
+
+    if pendentes:
+        primeiros_lotes = {}
+        for lote in Lote.objects.filter(
+            produto__in=pendentes,
+            data_validade__gte=hoje
+        ).order_by("produto_id", "data_validade", "id").only("id", "produto_id"):
+            primeiros_lotes.setdefault(lote.produto_id, lote.pk)
+
+        for produto, unidades in pendentes.items():
+            if produto.pk in primeiros_lotes:
+                devolucoes[primeiros_lotes[produto.pk]] += unidades
+            else:
+                # Se não há lote válido, criar um novo
+                Lote(
+                    produto=produto,
+                    nr_caixas=0,
+                    nr_carteiras=unidades,
+                    data_validade=hoje + timezone.timedelta(days=365),
+                    data_fabricacao=hoje
+                ).save()
+
+    lotes = list(
+        Lote.objects.select_for_update(of=("self",)).select_related("produto")
+        .filter(pk__in=devolucoes).order_by("pk")
+    )
+    agora = timezone.now()
+    for lote in lotes:
+        lote.quantidade_disponivel += devolucoes[lote.pk]
+        lote.nr_caixas, lote.nr_carteiras = lote.converter_para_caixas_carteiras(lote.quantidade_disponivel)
+        lote.data_atualizacao = agora
+
+    Lote.objects.bulk_update(lotes, ["quantidade_disponivel", "nr_caixas", "nr_carteiras", "data_atualizacao"])
+    ProdutoEstoqueResumo.recalcular({lote.produto_id for lote in lotes})
@@ -1,3 +1,295 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import transaction
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from productos.models import BaixaVencimento, Lote, Produto, ProdutoEstoqueResumo
+from .escpos import ESC, GS, ImpressoraMemoria
+from .models import ItemVenda, ItemVendaLote, Venda
+from .recibos import imprimir_escpos
+from .services import alocar_fefo, estornar_venda
+from .views import QUANTIDADE_INVALIDA
+
+
+def criar_lote(produto, carteiras, dias_validade):
+    """Lote com `carteiras` unidades vencendo daqui a `dias_validade` dias (negativo: já vencido)"""
+    hoje = timezone.localdate()
+    lote = Lote.objects.create(produto=produto, nr_carteiras=carteiras, data_validade=hoje + timedelta(days=365))
+    # Lote.clean recusa validade no passado: a data real é gravada direto no banco
+    Lote.objects.filter(pk=lote.pk).update(data_validade=hoje + timedelta(days=dias_validade))
+    lote.refresh_from_db()
+    return lote
+
+
+class AlocacaoFefoTests(TestCase):
+    """Baixa do carrinho pelos lotes que vencem primeiro (vendas.services.alocar_fefo)"""
+
+    def setUp(self):
+        self.produto = Produto.objects.create(
+            nome='Amoxicilina 500mg', preco_compra=Decimal('100.00'), preco_venda=Decimal('150.00'),
+            carteiras_por_caixa=10,
+        )
+        self.venda = Venda.objects.create(forma_pagamento='dinheiro')
+
+    def carrinho(self, quantidade, unidade='carteira'):
+        return [{'id': self.produto.pk, 'unidade': unidade, 'quantidade': quantidade, 'preco_venda': '15.00'}]
+
+    def alocacoes(self):
+        return dict(
+            ItemVendaLote.objects.filter(item_venda__venda=self.venda).values_list('lote_id', 'quantidade')
+        )
+
+    def test_usa_primeiro_o_lote_que_vence_antes(self):
+        tardio = criar_lote(self.produto, 10, dias_validade=300)
+        proximo = criar_lote(self.produto, 10, dias_validade=30)
+
+        itens = alocar_fefo(self.venda, self.carrinho(4))
+
+        self.assertEqual(len(itens), 1)
+        self.assertEqual(self.alocacoes(), {proximo.pk: 4})
+        proximo.refresh_from_db()
+        tardio.refresh_from_db()
+        self.assertEqual(proximo.quantidade_disponivel, 6)
+        self.assertEqual(tardio.quantidade_disponivel, 10)
+
+    def test_ignora_lotes_vencidos(self):
+        vencido = criar_lote(self.produto, 10, dias_validade=-5)
+        valido = criar_lote(self.produto, 10, dias_validade=60)
+
+        alocar_fefo(self.venda, self.carrinho(3))
+
+        self.assertEqual(self.alocacoes(), {valido.pk: 3})
+        vencido.refresh_from_db()
+        self.assertEqual(vencido.quantidade_disponivel, 10)
+
+    def test_divide_a_linha_entre_lotes(self):
+        primeiro = criar_lote(self.produto, 4, dias_validade=10)
+        segundo = criar_lote(self.produto, 20, dias_validade=90)
+
+        # 1 caixa = 10 carteiras: 4 do primeiro lote e 6 do segundo
+        itens = alocar_fefo(self.venda, self.carrinho(1, unidade='caixa'))
+
+        self.assertEqual(self.alocacoes(), {primeiro.pk: 4, segundo.pk: 6})
+        primeiro.refresh_from_db()
+        segundo.refresh_from_db()
+        self.assertEqual(primeiro.quantidade_disponivel, 0)
+        self.assertEqual((segundo.quantidade_disponivel, segundo.nr_caixas, segundo.nr_carteiras), (14, 1, 4))
+        self.assertEqual(itens[0].custo_unitario, Decimal('100.00'))
+
+    def test_estoque_insuficiente_nao_altera_nada(self):
+        criar_lote(self.produto, 5, dias_validade=-1)
+        valido = criar_lote(self.produto, 5, dias_validade=30)
+
+        with self.assertRaises(ValidationError) as erro:
+            with transaction.atomic():
+                alocar_fefo(self.venda, self.carrinho(8))
+
+        self.assertIn('Bloqueado (vencido): 5', erro.exception.messages[0])
+        valido.refresh_from_db()
+        self.assertEqual(valido.quantidade_disponivel, 5)
+        self.assertFalse(ItemVenda.objects.filter(venda=self.venda).exists())
+        self.assertFalse(ItemVendaLote.objects.exists())
+
+
+
+class EstornoVendaTests(TestCase):
+    """Devolução ao estoque pelos lotes registrados em ItemVendaLote (vendas.services.estornar_venda)"""
+
+    def setUp(self):
+        self.produto = Produto.objects.create(
+            nome='Ibuprofeno 400mg', preco_compra=Decimal('60.00'), preco_venda=Decimal('90.00'),
+            carteiras_por_caixa=10,
+        )
+        self.venda = Venda.objects.create(forma_pagamento='mpesa')
+
+    def test_devolve_aos_lotes_de_onde_saiu(self):
+        primeiro = criar_lote(self.produto, 4, dias_validade=10)
+        segundo = criar_lote(self.produto, 20, dias_validade=90)
+        alocar_fefo(self.venda, [
+            {'id': self.produto.pk, 'unidade': 'carteira', 'quantidade': 7, 'preco_venda': '9.00'},
+        ])
+
+        estornar_venda(self.venda)
+
+        primeiro.refresh_from_db()
+        segundo.refresh_from_db()
+        self.assertEqual(primeiro.quantidade_disponivel, 4)
+        self.assertEqual(segundo.quantidade_disponivel, 20)
+        self.assertEqual((segundo.nr_caixas, segundo.nr_carteiras), (2, 0))
+        self.assertEqual(Lote.objects.count(), 2)
+
+    def test_item_sem_registro_volta_ao_primeiro_lote_valido(self):
+        vencido = criar_lote(self.produto, 3, dias_validade=-2)
+        proximo = criar_lote(self.produto, 5, dias_validade=20)
+        tardio = criar_lote(self.produto, 5, dias_validade=200)
+        # Venda anterior ao registro de alocações: item sem ItemVendaLote
+        ItemVenda.objects.create(venda=self.venda, produto=self.produto, quantidade=1, unidade='caixa')
+
+        estornar_venda(self.venda)
+
+        for lote in (vencido, proximo, tardio):
+            lote.refresh_from_db()
+        self.assertEqual(proximo.quantidade_disponivel, 15)
+        self.assertEqual(tardio.quantidade_disponivel, 5)
+        self.assertEqual(vencido.quantidade_disponivel, 3)
+
+    def test_item_sem_registro_e_sem_lote_valido_cria_lote(self):
+        ItemVenda.objects.create(venda=self.venda, produto=self.produto, quantidade=3, unidade='carteira')
+
+        estornar_venda(self.venda)
+
+        lote = Lote.objects.get(produto=self.produto)
+        self.assertEqual(lote.quantidade_disponivel, 3)
+        self.assertGreater(lote.data_validade, timezone.localdate())
+
+class LimparLotesVencidosTests(TestCase):
+    """Baixa dos lotes vencidos pelo comando limpar_lotes_vencidos"""
+
+    def setUp(self):
+        # 100.00 / 3 carteiras: custo por carteira arredondado a 33.3333
+        self.produto = Produto.objects.create(
+            nome='Cefalexina 500mg', preco_compra=Decimal('100.00'), preco_venda=Decimal('150.00'),
+            carteiras_por_caixa=3,
+        )
+        self.vencido = criar_lote(self.produto, 7, -2)
+        self.vencido_ontem = criar_lote(self.produto, 2, -1)
+        self.valido = criar_lote(self.produto, 5, 30)
+
+    def limpar(self, *args):
+        saida = StringIO()
+        call_command('limpar_lotes_vencidos', *args, stdout=saida)
+        return saida.getvalue()
+
+    def test_registra_a_baixa_e_zera_os_lotes(self):
+        saida = self.limpar('--lote', '1')
+
+        baixas = {baixa.lote_id: baixa for baixa in BaixaVencimento.objects.all()}
+        self.assertEqual(set(baixas), {self.vencido.pk, self.vencido_ontem.pk})
+        baixa = baixas[self.vencido.pk]
+        self.assertEqual(
+            (baixa.produto, baixa.numero_lote, baixa.unidades), (self.produto, self.vencido.numero_lote, 7)
+        )
+        self.assertEqual(baixa.data_validade, self.vencido.data_validade)
+        self.assertEqual(baixa.custo, Decimal('233.33'))
+        self.assertEqual(baixas[self.vencido_ontem.pk].custo, Decimal('66.67'))
+
+        self.vencido.refresh_from_db()
+        self.valido.refresh_from_db()
+        self.assertEqual((self.vencido.quantidade_disponivel, self.vencido.nr_carteiras), (0, 0))
+        self.assertEqual(self.valido.quantidade_disponivel, 5)
+        self.assertIn('2 lotes vencidos removidos', saida)
+        self.assertIn('custo 300.00 MT', saida)
+
+        # Segunda execução: nada a baixar
+        self.assertIn('Nenhum lote vencido', self.limpar())
+        self.assertEqual(BaixaVencimento.objects.count(), 2)
+
+    def test_recalcula_o_resumo_de_estoque(self):
+        self.limpar()
+
+        resumo = ProdutoEstoqueResumo.objects.get(produto=self.produto)
+        self.assertEqual((resumo.estoque_valido, resumo.estoque_vencido), (5, 0))
+        self.assertEqual((resumo.lotes_ativos, resumo.lotes_vencidos), (1, 0))
+        self.assertEqual(resumo.validade_proxima, self.valido.data_validade)
+
+    def test_carteiras_por_caixa_zero_conta_como_uma(self):
+        Produto.objects.filter(pk=self.produto.pk).update(carteiras_por_caixa=0)
+        self.assertIn('custo aproximado 900.00 MT', self.limpar('--dry-run'))
+
+        self.limpar()
+
+        self.assertEqual(BaixaVencimento.objects.get(lote=self.vencido).custo, Decimal('700.00'))
+
+    def test_simulacao_nao_altera_nada(self):
+        saida = self.limpar('--dry-run')
+
+        self.assertIn('2 lotes vencidos seriam removidos do estoque (9 unidades', saida)
+        self.assertFalse(BaixaVencimento.objects.exists())
+        self.vencido.refresh_from_db()
+        self.assertEqual(self.vencido.quantidade_disponivel, 7)
+
+
+class CarrinhoAdicionarTests(TestCase):
+    """Validação da quantidade e da unidade em carrinho_adicionar (API JSON do PDV)"""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('gerente', 'gerente@example.com', 'senha'))
+        self.produto = Produto.objects.create(
+            nome='Ibuprofeno 400mg', preco_compra=Decimal('60.00'), preco_venda=Decimal('90.00'),
+            carteiras_por_caixa=10,
+        )
+        criar_lote(self.produto, 20, 200)
+
+    def adicionar(self, **dados):
+        return self.client.post(reverse('carrinho_adicionar'), {'produto': self.produto.pk, **dados}, secure=True)
+
+    def test_quantidade_invalida_responde_400(self):
+        for dados in ({'quantidade': 'dois'}, {'quantidade': '0'}, {'quantidade': '-3'},
+                      {'quantidade': '1', 'unidade': 'frasco'}):
+            with self.subTest(**dados):
+                resposta = self.adicionar(**dados)
+                self.assertEqual(resposta.status_code, 400)
+                self.assertEqual(resposta.json()['mensagens'], [{'nivel': 'error', 'texto': QUANTIDADE_INVALIDA}])
+                self.assertEqual(resposta.json()['totais']['itens'], 0)
+
+    def test_quantidade_valida_adiciona(self):
+        resposta = self.adicionar(quantidade='2', unidade='carteira')
+
+        self.assertEqual(resposta.status_code, 200)
+        self.assertTrue(resposta.json()['success'])
+        self.assertEqual(resposta.json()['linha']['quantidade'], 2)
+
+
+class ReciboEscPosTests(TestCase):
+    """Recibo ESC/POS impresso na impressora de teste (ImpressoraMemoria)"""
+
+    def setUp(self):
+        cache.clear()
+        produto = Produto.objects.create(
+            nome='Paracetamol 500mg', preco_compra=Decimal('50.00'), preco_venda=Decimal('80.00'),
+            carteiras_por_caixa=10,
+        )
+        self.venda = Venda.objects.create(forma_pagamento='dinheiro', total=Decimal('160.00'))
+        ItemVenda.objects.create(
+            venda=self.venda, produto=produto, quantidade=2, unidade='carteira',
+            preco_unitario=Decimal('80.00'), custo_unitario=Decimal('5.00'),
+        )
+
+    def imprimir(self, logo):
+        impressora = ImpressoraMemoria()
+        imprimir_escpos(self.venda, impressora, logo=logo)
+        return impressora
+
+    def test_recibo_sem_logo(self):
+        impressora = self.imprimir(logo=False)
+        dados = impressora.getvalue()
+        comandos = [comando for comando, _valor in impressora.comandos() if comando != 'texto']
+
+        self.assertTrue(dados.startswith(ESC + b'@'))
+        self.assertEqual(comandos[-1], GS + b'V')
+        self.assertEqual(impressora.cortes, 1)
+        self.assertNotIn('raster', comandos)
+        self.assertIn('FARMACIA JONDE', impressora.linhas_negrito())
+        self.assertTrue(any(linha.startswith('Total:') for linha in impressora.linhas_negrito()))
+        self.assertIn('Paracetamol 500mg', impressora.texto())
+        # Só texto e comandos: poucas centenas de bytes (o PNG do mesmo recibo tem dezenas de KB)
+        self.assertLess(len(dados), 2000)
+
+    def test_recibo_com_logo(self):
+        impressora = self.imprimir(logo=True)
+        rasters = [valor for comando, valor in impressora.comandos() if comando == 'raster']
 
-# Create your tests here.
+        self.assertIn(GS + b'v0', impressora.getvalue())
+        self.assertEqual(len(rasters), 1)
+        largura, altura = rasters[0]
+        self.assertEqual(largura % 8, 0)
+        self.assertGreater(altura, 0)
+        self.assertEqual(impressora.cortes, 1)
@@ -8,9 +8,14 @@ urlpatterns = [
     path('atualizar-quantidade/<int:produto_id>/', views.atualizar_quantidade, name='atualizar_quantidade'),
     path('finalizar/', views.finalizar_venda, name='finalizar_venda'),
     path('cancelar/', views.cancelar_venda, name='cancelar_venda'),
+    path('carrinho/adicionar/', views.carrinho_adicionar, name='carrinho_adicionar'),
+    path('carrinho/<int:produto_id>/atualizar/', views.carrinho_atualizar, name='carrinho_atualizar'),
+    path('carrinho/<int:produto_id>/remover/', views.carrinho_remover, name='carrinho_remover'),
 
     path("<int:venda_id>/apagar/", views.remover_venda, name="remover_venda"),
     path('<int:venda_id>/detalhes/', views.detalhes_venda, name='detalhes_venda'),
 
     path('imprimir-recibo/<int:venda_id>/', views.imprimir_recibo_imagem, name='imprimir_recibo'),
+    path('recibo/<int:venda_id>/', views.recibo_venda, name='recibo_venda'),
+    path('recibo/<int:venda_id>/escpos/', views.recibo_escpos_venda, name='recibo_escpos'),
 ]
\ No newline at end of file
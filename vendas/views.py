@@ -1,26 +1,25 @@
-import os
-
 from django.core.exceptions import ValidationError
 from django.shortcuts import render, redirect, get_object_or_404
-from django.forms.models import model_to_dict
+from django.http import HttpResponse, JsonResponse
 from django.contrib import messages
-from django.db.models import Q, Sum
+from django.db.models import Q
 from django.core.paginator import Paginator
 from django.db import transaction
-from datetime import date
 from django.contrib.auth.decorators import login_required
-from django.utils import timezone
-import decimal
 
 # libs para imprimir
 from django.template.loader import render_to_string
-from PIL import Image, ImageDraw, ImageFont
-import io
-import base64
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
 
-from pharmaSys import settings
-from .models import Produto, Venda, ItemVenda, Cliente, Lote
-from core.decorators import admin_required, gerente_required, vendedor_required
+from .models import Produto, Venda, ItemVenda, Cliente
+from core.decorators import admin_required, vendedor_required
+from .services import alocar_fefo, estornar_venda, converter_para_unidades, disponibilidade
+from .carrinho import Carrinho
+from .recibos import etag_recibo, recibo_escpos, recibo_png
+from relatorios.services import registrar_venda_diaria
+from core.grupos import pertence_a
+from productos.busca import resolver_codigo_barras
 
 
 @login_required
@@ -70,148 +69,147 @@ def listar_vendas(request):
     return render(request, 'vendas/listar_vendas.html', context)
 
 
+# ========== CARRINHO ==========
+
+def _resolver_produto(produto_id, codigo_barras):
+    """
+    Produto escolhido no select ou lido pelo leitor de código de barras,
+    já com a disponibilidade de estoque (uma consulta)
+    """
+    if codigo_barras and not produto_id:
+        produto_id = resolver_codigo_barras(codigo_barras)
+    if not produto_id:
+        raise ValueError('Selecione um produto ou leia o código de barras!')
+
+    produto = disponibilidade([produto_id]).get(int(produto_id))
+    if produto is None:
+        raise Produto.DoesNotExist
+    return produto
+
+
+QUANTIDADE_INVALIDA = '❌ Quantidade inválida!'
+UNIDADES_VALIDAS = {valor for valor, _nome in ItemVenda.UNIDADE_CHOICES}
+
+
+def _adicionar_ao_carrinho(carrinho, request):
+    """
+    Adiciona o item do formulário ao carrinho, validando o estoque.
+    Retorna (produto_id, unidade, mensagens) com mensagens como [(nível, texto)].
+    Quantidade não numérica, menor que 1 ou unidade desconhecida: ValueError.
+    """
+    unidade = request.POST.get('unidade', 'carteira')
+    quantidade = int(request.POST.get('quantidade', 1))
+    if quantidade < 1 or unidade not in UNIDADES_VALIDAS:
+        raise ValueError(QUANTIDADE_INVALIDA)
+    codigo_barras = request.POST.get('codigo_barras', '').strip()
+
+    try:
+        produto = _resolver_produto(request.POST.get('produto'), codigo_barras)
+    except Produto.DoesNotExist:
+        if codigo_barras:
+            return None, unidade, [('error', f'❌ Nenhum produto com o código de barras {codigo_barras}!')]
+        return None, unidade, [('error', '❌ Produto não encontrado!')]
+    except (Produto.MultipleObjectsReturned, ValueError) as e:
+        return None, unidade, [('error', f'❌ {e}')]
+
+    # ✅ USANDO A PROPERTY DO MODELO
+    estoque_disponivel = produto.estoque_disponivel
+
+    if estoque_disponivel == 0:
+        return produto.id, unidade, [('error', f'❌ Produto {produto.nome} sem estoque válido disponível!')]
+
+    # Quantidade já no carrinho para o mesmo produto e unidade
+    quantidade_atual = carrinho.quantidade(produto.id, unidade)
+    nova_quantidade = quantidade_atual + quantidade
+
+    if converter_para_unidades(unidade, nova_quantidade, produto) > estoque_disponivel:
+        return produto.id, unidade, [(
+            'error',
+            f'❌ Estoque insuficiente! Disponível: {estoque_disponivel} '
+            f'{"⚠️ Lotes vencidos não contabilizados" if produto.tem_vencido else ""}'
+        )]
+
+    carrinho.definir(produto.id, unidade, nova_quantidade)
+
+    if quantidade_atual:
+        return produto.id, unidade, [('success', f'✅ Quantidade de {produto.nome} atualizada para {nova_quantidade}!')]
+
+    mensagens = []
+    # ✅ ALERTA DE VALIDADE PRÓXIMA
+    if produto.alerta_validade:
+        mensagens.append(('info', f"ℹ️ {produto.nome}: {produto.alerta_validade}"))
+    mensagens.append(('success', f'✅ Produto {produto.nome} adicionado ao carrinho!'))
+    return produto.id, unidade, mensagens
+
+
+def _atualizar_no_carrinho(carrinho, produto_id, request):
+    """Altera a quantidade de uma linha do carrinho. Retorna (unidade, mensagens)"""
+    quantidade = max(1, int(request.POST.get('quantidade', 1)))
+
+    unidades = carrinho.unidades_do_produto(produto_id)
+    unidade = request.POST.get('unidade') or (unidades[0] if unidades else None)
+
+    if unidade not in unidades:
+        return unidade, [('error', '❌ Produto não está no carrinho!')]
+
+    # Verificar estoque antes de atualizar
+    produto = disponibilidade([produto_id]).get(produto_id)
+    if produto is None:
+        carrinho.remover(produto_id)
+        return unidade, [('error', '❌ Produto não encontrado!')]
+    estoque_disponivel = produto.estoque_disponivel
+
+    if converter_para_unidades(unidade, quantidade, produto) > estoque_disponivel:
+        return unidade, [('error', f'Estoque insuficiente! Disponível: {estoque_disponivel}')]
+
+    carrinho.definir(produto_id, unidade, quantidade)
+    return unidade, []
+
+
+def _registrar_mensagens(request, mensagens):
+    for nivel, texto in mensagens:
+        getattr(messages, nivel)(request, texto)
+
+
 @login_required
 @vendedor_required
 def criar_venda(request):
     formas_pagamento = Venda.FORMA_PAGAMENTO_CHOICES
     clientes = Cliente.objects.all().order_by('nome')
 
-    # ✅ USANDO AS PROPERTIES DO MODELO
-    # Buscar todos os produtos
-    todos_produtos = Produto.objects.all().order_by('nome')
+    # Os produtos são buscados sob demanda pelo autocomplete (view buscar_produtos)
 
-    # Filtrar apenas os que têm estoque disponível (usando a property)
-    produtos = [p for p in todos_produtos if p.tem_estoque]
-
-
-
-    cart = request.session.get('cart', [])
-    total = 0
-    subtotal = 0
+    carrinho = Carrinho(request)
 
     if request.method == 'POST':
-        produto_id = request.POST.get('produto')
-        unidade = request.POST.get('unidade', 'carteira')
-        quantidade = int(request.POST.get('quantidade', 1))
-
-        if produto_id:
-            try:
-                produto = Produto.objects.get(id=produto_id)
-
-                # ✅ USANDO A PROPERTY DO MODELO
-                estoque_disponivel = produto.estoque_disponivel
-
-                if estoque_disponivel == 0:
-                    messages.error(
-                        request,
-                        f'❌ Produto {produto.nome} sem estoque válido disponível!'
-                    )
-                    return redirect('criar_venda')
-
-                # Verificar se produto já está no carrinho
-                produto_existente_index = None
-                for i, item in enumerate(cart):
-                    if str(item['id']) == str(produto_id) and item.get('unidade') == unidade:
-                        produto_existente_index = i
-                        break
-
-                if produto_existente_index is not None:
-                    # Produto existe - atualizar quantidade
-                    nova_quantidade = cart[produto_existente_index]['quantidade'] + quantidade
-
-                    if nova_quantidade <= estoque_disponivel:
-                        cart[produto_existente_index]['quantidade'] = nova_quantidade
-                        cart[produto_existente_index]['subtotal'] = cart[produto_existente_index][
-                                                                        'preco_venda'] * nova_quantidade
-                        messages.success(request, f'✅ Quantidade de {produto.nome} atualizada para {nova_quantidade}!')
-                    else:
-                        messages.error(
-                            request,
-                            f'❌ Estoque insuficiente! Disponível: {estoque_disponivel} '
-                            f'{"⚠️ Lotes vencidos não contabilizados" if produto.tem_vencido else ""}'
-                        )
-
-                else:
-                    # Produto não existe - adicionar novo
-                    produto_dict = {
-                        'id': produto.id,
-                        'nome': produto.nome,
-                        'categoria_nome': produto.categoria.nome if produto.categoria else 'Sem categoria',
-                        'categoria_tipo': produto.categoria.tipo if produto.categoria else '',
-                        'estoque_total': estoque_disponivel,
-                        'unidade': unidade,
-                        'quantidade': quantidade,
-                        'controlado': produto.controlado,
-                    }
-
-                    # Cálculo do preço
-                    if unidade == 'caixa':
-                        produto_dict['preco_venda'] = float(produto.preco_venda)
-                    else:
-                        preco_carteira = produto.preco_carteira_calculado
-                        produto_dict['preco_venda'] = float(preco_carteira) if preco_carteira else 0.0
-
-                    produto_dict['subtotal'] = produto_dict['preco_venda'] * quantidade
-
-                    if quantidade <= estoque_disponivel:
-                        cart.append(produto_dict)
-
-                        # ✅ ALERTA DE VALIDADE PRÓXIMA
-                        if produto.alerta_validade:
-                            messages.info(
-                                request,
-                                f"ℹ️ {produto.nome}: {produto.alerta_validade}"
-                            )
-
-                        messages.success(request, f'✅ Produto {produto.nome} adicionado ao carrinho!')
-                    else:
-                        messages.error(
-                            request,
-                            f'❌ Estoque insuficiente! Disponível: {estoque_disponivel} '
-                            f'{"⚠️ Lotes vencidos não contabilizados" if produto.tem_vencido else ""}'
-                        )
-
-                # Salvar carrinho
-                request.session['cart'] = cart
-                request.session.modified = True
-
-            except Produto.DoesNotExist:
-                messages.error(request, '❌ Produto não encontrado!')
-            except Exception as e:
-                messages.error(request, f'❌ Erro ao adicionar produto: {e}')
-
-            return redirect('criar_venda')
-
-    # Calcular totais do carrinho
-    for produto in cart:
-        produto['subtotal'] = produto['preco_venda'] * produto.get('quantidade', 1)
-        subtotal += produto['subtotal']
-
-    total = subtotal
+        try:
+            _produto_id, _unidade, mensagens = _adicionar_ao_carrinho(carrinho, request)
+            _registrar_mensagens(request, mensagens)
+        except (TypeError, ValueError):
+            messages.error(request, QUANTIDADE_INVALIDA)
+        except Exception as e:
+            messages.error(request, f'❌ Erro ao adicionar produto: {e}')
 
-    # ✅ Informações adicionais para o template
-    total_produtos = len(produtos)
+        return redirect('criar_venda')
 
+    # Dados dos produtos do carrinho numa única consulta
+    cart = carrinho.linhas()
+    subtotal = carrinho.total
+    total = subtotal
 
     context = {
         'cart': cart,
-        'produtos': produtos,  # Apenas produtos com estoque disponível
         'subtotal': subtotal,
         'total': total,
         'formas_pagamento': formas_pagamento,
         'clientes': clientes,
-        'total_produtos_disponiveis': total_produtos,
         # ✅ Para o template saber se deve mostrar alertas detalhados
-        'is_gerente_ou_admin': request.user.groups.filter(
-            name__in=['Gerente', 'Administrador']
-        ).exists(),
+        'is_gerente_ou_admin': pertence_a(request.user, 'Gerente', 'Administrador'),
     }
 
     return render(request, 'vendas/criar_venda.html', context)
 
 
-
-
 @login_required
 @vendedor_required
 def finalizar_venda(request):
@@ -221,7 +219,8 @@ def finalizar_venda(request):
         atendente = request.user
 
         cliente = get_object_or_404(Cliente, id=int(cliente_id)) if cliente_id else None
-        cart = request.session.get("cart", [])
+        carrinho = Carrinho(request)
+        cart = carrinho.linhas()
 
         if not cart:
             messages.error(request, "Carrinho vazio! Adicione produtos antes de finalizar.")
@@ -238,102 +237,25 @@ def finalizar_venda(request):
                     total=0
                 )
 
-                # Agrupar itens por produto
-                from collections import defaultdict
-                produtos_agrupados = defaultdict(lambda: {'caixas': 0, 'carteiras': 0, 'itens': []})
-
-                for item in cart:
-                    produto_id = item["id"]
-                    if item["unidade"] == "caixa":
-                        produtos_agrupados[produto_id]['caixas'] += item["quantidade"]
-                    else:
-                        produtos_agrupados[produto_id]['carteiras'] += item["quantidade"]
-                    produtos_agrupados[produto_id]['itens'].append(item)
-
-                # Processar cada produto agrupado
-                for produto_id, dados in produtos_agrupados.items():
-                    produto = get_object_or_404(Produto, id=produto_id)
-                    carteiras_por_caixa = produto.carteiras_por_caixa or 1
-
-                    # Total solicitado
-                    total_unidades = dados['caixas'] * carteiras_por_caixa + dados['carteiras']
-
-                    # ✅ PASSO 1: Verificar estoque total em lotes NÃO VENCIDOS
-                    estoque_valido_total = Lote.objects.filter(
-                        produto=produto,
-                        quantidade_disponivel__gt=0,
-                        data_validade__gt=timezone.now().date()  # ✅ FILTRO CRÍTICO
-                    ).aggregate(total=Sum('quantidade_disponivel'))['total'] or 0
-
-                    # Verificar se há lotes vencidos (para informação)
-                    lotes_vencidos = Lote.objects.filter(
-                        produto=produto,
-                        quantidade_disponivel__gt=0,
-                        data_validade__lte=timezone.now().date()
-                    )
-
-                    if lotes_vencidos.exists():
-                        total_vencido = lotes_vencidos.aggregate(total=Sum('quantidade_disponivel'))['total']
-                        # Log ou mensagem interna (não mostrar ao usuário ainda)
-                        print(f"⚠️ ATENÇÃO: {produto.nome} tem {total_vencido} unidades em lotes vencidos")
-
-                    # ✅ PASSO 2: Verificar se há estoque válido suficiente
-                    if estoque_valido_total < total_unidades:
-                        mensagem = f"❌ ESTOQUE INSUFICIENTE PARA {produto.nome.upper()}\n\n"
-                        mensagem += f"📦 Solicitado: {total_unidades} unidades\n"
-                        mensagem += f"✅ Disponível em lotes válidos: {estoque_valido_total} unidades\n"
-
-                        if lotes_vencidos.exists():
-                            total_vencido = lotes_vencidos.aggregate(total=Sum('quantidade_disponivel'))['total']
-                            mensagem += f"⚠️ Bloqueado (vencido): {total_vencido} unidades\n\n"
-                            mensagem += "Os lotes vencidos foram removidos do estoque e não podem ser vendidos!"
-
-                        raise Exception(mensagem)
-
-                    # ✅ PASSO 3: Buscar apenas lotes NÃO VENCIDOS para a venda
-                    lotes = Lote.objects.select_for_update().filter(
-                        produto=produto,
-                        quantidade_disponivel__gt=0,
-                        data_validade__gt=timezone.now().date()  # ✅ FILTRO CRÍTICO
-                    ).order_by("data_validade")
-
-                    quantidade_restante = total_unidades
-
-                    for lote in lotes:
-                        if quantidade_restante <= 0:
-                            break
-
-                        # Usar o método baixar_estoque que já tem validação
-                        try:
-                            if lote.quantidade_disponivel <= quantidade_restante:
-                                lote.baixar_estoque(lote.quantidade_disponivel)
-                                quantidade_restante -= lote.quantidade_disponivel
-                            else:
-                                lote.baixar_estoque(quantidade_restante)
-                                quantidade_restante = 0
-                        except ValidationError as e:
-                            raise Exception(f"Erro ao baixar estoque do lote {lote.numero_lote}: {e}")
-
-                    # Criar itens da venda
-                    for item in dados['itens']:
-                        ItemVenda.objects.create(
-                            venda=venda,
-                            produto=produto,
-                            quantidade=item["quantidade"],
-                            preco_unitario=item["preco_venda"],
-                            unidade=item["unidade"]
-                        )
+                # Baixa FEFO de todos os produtos e criação dos itens
+                itens = alocar_fefo(venda, cart)
 
                 # Calcular total da venda
-                venda.calcular_total()
+                venda.total = sum(item.subtotal for item in itens)
+                venda.save(update_fields=["total"])
+
+                # Fato diário dos relatórios
+                registrar_venda_diaria(venda, itens)
 
                 # Limpar carrinho
-                request.session["cart"] = []
-                request.session.modified = True
+                carrinho.limpar()
 
                 messages.success(request, f"✅ Venda #{venda.id} finalizada com sucesso!")
                 return redirect("detalhes_venda", venda_id=venda.id)
 
+        except ValidationError as e:
+            messages.error(request, " ".join(e.messages))
+            return redirect("criar_venda")
         except Exception as e:
             messages.error(request, str(e))
             return redirect("criar_venda")
@@ -343,14 +265,8 @@ def finalizar_venda(request):
 
 @login_required
 def remover_produto(request, produto_id):
-    cart = request.session.get('cart', [])
-
-    # ✅ CORREÇÃO: Converter para string para comparação segura
-    produto_id_str = str(produto_id)
-    cart = [item for item in cart if str(item['id']) != produto_id_str]
-
-    request.session['cart'] = cart
-    request.session.modified = True
+    # Sem unidade, remove todas as linhas do produto
+    Carrinho(request).remover(produto_id, request.POST.get('unidade'))
     messages.success(request, 'Produto removido do carrinho!')
     return redirect('criar_venda')
 
@@ -358,28 +274,11 @@ def remover_produto(request, produto_id):
 @login_required
 def atualizar_quantidade(request, produto_id):
     if request.method == 'POST':
-        quantidade = int(request.POST.get('quantidade', 1))
-        cart = request.session.get('cart', [])
-
-        # ✅ CORREÇÃO: Converter para string para comparação segura
-        produto_id_str = str(produto_id)
-
-        for item in cart:
-            if str(item['id']) == produto_id_str:
-                # Verificar estoque antes de atualizar
-                produto = Produto.objects.get(id=produto_id)
-                estoque_total = produto.estoque_total  # ✅ CORREÇÃO: Property sem parênteses
-
-                if quantidade > estoque_total:
-                    messages.error(request, f'Estoque insuficiente! Disponível: {estoque_total}')
-                    return redirect('criar_venda')
-
-                item['quantidade'] = max(1, quantidade)
-                item['subtotal'] = item['preco_venda'] * item['quantidade']
-                break
-
-        request.session['cart'] = cart
-        request.session.modified = True
+        try:
+            _unidade, mensagens = _atualizar_no_carrinho(Carrinho(request), produto_id, request)
+        except (TypeError, ValueError):
+            mensagens = [('error', QUANTIDADE_INVALIDA)]
+        _registrar_mensagens(request, mensagens)
 
     return redirect('criar_venda')
 
@@ -387,53 +286,100 @@ def atualizar_quantidade(request, produto_id):
 @login_required
 def cancelar_venda(request):
     if request.method == 'POST':
-        request.session['cart'] = []
-        request.session.modified = True
+        Carrinho(request).limpar()
         messages.info(request, 'Venda cancelada!')
 
     return redirect('criar_venda')
 
 
+# ========== API JSON DO CARRINHO (PDV) ==========
+
+def _resposta_carrinho(request, carrinho, mensagens, produto_id=None, unidade=None, status=200):
+    """Só a linha alterada (com o HTML renderizado), os totais e as mensagens"""
+    linhas = carrinho.linhas()
+    linha = next(
+        (l for l in linhas if l['id'] == produto_id and l['unidade'] == unidade),
+        None
+    )
+    if linha:
+        linha = dict(linha, html=render_to_string(
+            'vendas/linha_carrinho.html', {'produto': linha}, request=request
+        ))
+
+    total = carrinho.total
+    return JsonResponse({
+        'success': not any(nivel == 'error' for nivel, _texto in mensagens),
+        'mensagens': [{'nivel': nivel, 'texto': texto} for nivel, texto in mensagens],
+        'linha_id': f"linha-{produto_id}-{unidade}" if produto_id else None,
+        'linha': linha,
+        'totais': {'subtotal': total, 'total': total, 'itens': len(linhas)},
+    }, status=status)
+
+
+def _metodo_nao_permitido():
+    return JsonResponse({'success': False, 'errors': 'Use POST'}, status=405)
+
+
+@login_required
+@vendedor_required
+def carrinho_adicionar(request):
+    if request.method != 'POST':
+        return _metodo_nao_permitido()
+
+    carrinho = Carrinho(request)
+    try:
+        produto_id, unidade, mensagens = _adicionar_ao_carrinho(carrinho, request)
+    except (TypeError, ValueError):
+        # Quantidade não numérica, menor que 1 ou unidade inválida: carrinho inalterado
+        return _resposta_carrinho(request, carrinho, [('error', QUANTIDADE_INVALIDA)], status=400)
+    except Exception as e:
+        produto_id, unidade, mensagens = None, None, [('error', f'❌ Erro ao adicionar produto: {e}')]
+    return _resposta_carrinho(request, carrinho, mensagens, produto_id, unidade)
+
+
+@login_required
+@vendedor_required
+def carrinho_atualizar(request, produto_id):
+    if request.method != 'POST':
+        return _metodo_nao_permitido()
+
+    carrinho = Carrinho(request)
+    try:
+        unidade, mensagens = _atualizar_no_carrinho(carrinho, produto_id, request)
+    except (TypeError, ValueError):
+        # Quantidade ausente ou não numérica: devolve a linha como estava
+        return _resposta_carrinho(
+            request, carrinho, [('error', QUANTIDADE_INVALIDA)], produto_id, request.POST.get('unidade'), status=400
+        )
+    return _resposta_carrinho(request, carrinho, mensagens, produto_id, unidade)
+
+
+@login_required
+@vendedor_required
+def carrinho_remover(request, produto_id):
+    if request.method != 'POST':
+        return _metodo_nao_permitido()
+
+    carrinho = Carrinho(request)
+    unidade = request.POST.get('unidade')
+    carrinho.remover(produto_id, unidade)
+    return _resposta_carrinho(
+        request, carrinho, [('success', 'Produto removido do carrinho!')], produto_id, unidade
+    )
+
+
 @login_required
 @admin_required
 def remover_venda(request, venda_id):
     venda = get_object_or_404(Venda, pk=venda_id)
-    itens = ItemVenda.objects.filter(venda=venda)
 
     try:
         with transaction.atomic():
-            # Devolver ao estoque
-            for item in itens:
-                produto = item.produto
-
-                # ✅ CORREÇÃO: Converter para unidades
-                if item.unidade == "caixa":
-                    quantidade_em_unidades = item.quantidade * (produto.carteiras_por_caixa or 1)
-                else:
-                    quantidade_em_unidades = item.quantidade
-
-                # Adicionar ao primeiro lote válido
-                lote = Lote.objects.filter(
-                    produto=produto,
-                    data_validade__gte=timezone.now().date()
-                ).order_by('data_validade').first()
-
-                if lote:
-                    lote.quantidade_disponivel += quantidade_em_unidades
-                    lote.save()
-                else:
-                    # Se não há lote válido, criar um novo
-                    lote = Lote.objects.create(
-                        produto=produto,
-                        numero_lote=f"DEV_{venda_id}",
-                        nr_caixas=0,
-                        nr_carteiras=quantidade_em_unidades,
-                        data_validade=timezone.now().date() + timezone.timedelta(days=365),
-                        data_fabricacao=timezone.now().date()
-                    )
-
-            # Remover os itens e a venda
-            itens.delete()
+            # Devolver ao estoque, nos mesmos lotes de onde saiu
+            estornar_venda(venda)
+            registrar_venda_diaria(venda, sinal=-1)
+
+            # Remover a venda (itens e alocações em cascata)
             venda.delete()
 
             messages.success(request, f"Venda #{venda_id} removida e estoque atualizado.")
@@ -461,47 +407,50 @@ def detalhes_venda(request, venda_id):
 
 
 
+@login_required
+@vendedor_required
 def imprimir_recibo_imagem(request, venda_id):
-    venda = get_object_or_404(Venda, id=venda_id)
-    recibo_texto = render_to_string('vendas/recibo_termico.txt', {'venda': venda})
-
-    try:
-        font = ImageFont.truetype("Courier", 17)
-    except IOError:
-        font = ImageFont.load_default(size=18)
+    """Página de impressão; a imagem vem de recibo_venda, que responde do cache"""
+    venda = get_object_or_404(Venda.objects.only('id'), id=venda_id)
+    return render(request, 'vendas/imprimir_recibo.html', {'venda': venda})
 
-    largura = 400
-    altura_texto = 0
-    draw = ImageDraw.Draw(Image.new("RGB", (largura, 1)))
 
-    for linha in recibo_texto.split('\n'):
-        _, _, _, altura_linha = draw.textbbox((0, 0), linha, font=font)
-        altura_texto += altura_linha + 6
+def _etag_recibo(request, venda_id):
+    venda = Venda.objects.only('id', 'data_atualizacao').filter(pk=venda_id).first()
+    return etag_recibo(venda) if venda else None
 
-    # 🔹 CARREGAR LOGO
-    logo_path = os.path.join(settings.BASE_DIR, 'core/static/img/logo.png')
-    logo = Image.open(logo_path).convert("RGB")
-    logo.thumbnail((200, 200))
 
-    # 🔹 Aumentar altura para caber o logo
-    altura = max(altura_texto, 100)
-
-    img = Image.new("RGB", (largura, altura), "white")
-    draw = ImageDraw.Draw(img)
+@login_required
+@vendedor_required
+@condition(etag_func=_etag_recibo)
+def recibo_venda(request, venda_id):
+    """PNG do recibo térmico; reimpressões recebem 304 pelo ETag ou a imagem do cache"""
+    venda = get_object_or_404(Venda.objects.select_related('cliente', 'atendente'), id=venda_id)
+    response = HttpResponse(recibo_png(venda), content_type='image/png')
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
-    # 🔹 Centralizar logo
-    x_logo = (largura - logo.width) // 2
-    img.paste(logo, (x_logo, 10))
 
-    # 🔹 Texto começa abaixo do logo
-    draw.multiline_text((10, logo.height + 20), recibo_texto, fill="black", font=font, spacing=4)
+def _etag_recibo_escpos(request, venda_id):
+    venda = Venda.objects.only('id', 'data_atualizacao').filter(pk=venda_id).first()
+    formato = 'escpos' if request.GET.get('logo') != '0' else 'escpos-sem-logo'
+    return etag_recibo(venda, formato) if venda else None
 
-    buffer = io.BytesIO()
-    img.save(buffer, format="PNG")
-    buffer.seek(0)
-    img_base64 = base64.b64encode(buffer.getvalue()).decode("utf-8")
 
-    return render(request, 'vendas/imprimir_recibo.html', {'img_base64': img_base64})
+@login_required
+@vendedor_required
+@condition(etag_func=_etag_recibo_escpos)
+def recibo_escpos_venda(request, venda_id):
+    """
+    Recibo em comandos ESC/POS (texto, negrito, logo em raster e corte), para
+    enviar direto à impressora térmica. ?logo=0 omite o logo.
+    """
+    venda = get_object_or_404(Venda.objects.select_related('cliente', 'atendente'), id=venda_id)
+    response = HttpResponse(recibo_escpos(venda, logo=request.GET.get('logo') != '0'),
+                            content_type='application/octet-stream')
+    response['Content-Disposition'] = f'attachment; filename="recibo_{venda.id}.bin"'
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 
 